@@ -1,5 +1,4 @@
 import os
-import time
 import streamlit as st
 import pathlib
 import pandas as pd
@@ -7,13 +6,19 @@ import pandas as pd
 from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
 from openai import OpenAI
-import ollama
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from db_pool import warm_pools, pool_stats
 from sql_bot.main import handle_query as handle_sql
-
-from pdf_bot.pdf_utils import extract_text_from_pdf, chunk_text, add_metadata_to_chunks
-from pdf_bot.insert_embeddings_to_db import connect_db, insert_document_chunk
+from sql_bot.schema_catalog import refresh_schema_catalog, schema_catalog_stats
+from sql_bot.sql_cache import sql_cache_stats
+from sql_bot.result_cache import result_cache_stats
+
+from pdf_bot.pdf_utils import save_and_hash
+from pdf_bot.db import connect_db
+from pdf_bot.insert_embeddings_to_db import indexed_doc_hashes, delete_document
+from pdf_bot.jobs import enqueue_job, job_statuses, start_worker, cancel_jobs, JOB_MAX_ATTEMPTS
+from pdf_bot.embedding_cache import cache_stats
+from pdf_bot.answer_cache import answer_cache_stats
 from pdf_bot.genAI import send_pdf_answer
 
 
@@ -36,11 +41,25 @@ os.makedirs(str(PDF_DIR), exist_ok=True)
 st.set_page_config(page_title="PDF Chatbot with Sessions", layout="centered")
 st.title("PDF Chatbot")
 
+@st.cache_resource(show_spinner=False)
+def warm_db_pools():
+    """Open both bots' pooled connections once per server process, not per rerun."""
+    return warm_pools()
+
+warm_db_pools()
+
 st.sidebar.title("Mode")
 mode = st.sidebar.radio("Choose mode", ["PDF Chatbot", "SQL Bot"])
 
 
 # --- SQL Bot (chat UI) ----------------------------------------------------
+def plan_caption(plan):
+    """One line on the planner's estimate for a generated query (and any LIMIT added)."""
+    caption = f"Planner estimate: cost {plan['cost']:,.0f}, ~{plan['rows']:,.0f} rows"
+    if plan.get("action") == "limited":
+        caption += f" — capped at {plan['limit']:,} rows"
+    return caption
+
 if mode == "SQL Bot":
     st.header("🔍 SQL Bot")
 
@@ -49,11 +68,15 @@ if mode == "SQL Bot":
         st.session_state.sql_chat = []
 
     # toolbar
-    left, right = st.columns([1, 1])
+    left, middle, right = st.columns([1, 1, 1])
     with left:
         if st.button("➕ New SQL chat"):
             st.session_state.sql_chat = []
             st.rerun()
+    with middle:
+        if st.button("🔄 Refresh schema", help="Re-read tables and columns (e.g. after a migration)"):
+            refresh_schema_catalog()
+            st.toast(f"Schema reloaded: {schema_catalog_stats()['tables']} tables")
     with right:
         st.caption(f"{len(st.session_state.sql_chat)//2} turns")
 
@@ -95,6 +118,8 @@ if mode == "SQL Bot":
 
             if "error" in resp:
                 st.error(resp["error"])
+                if resp.get("plan"):
+                    st.caption(plan_caption(resp["plan"]))
                 if resp.get("sql"):
                     with st.expander("Generated SQL", expanded=True):
                         st.code(resp["sql"], language="sql")
@@ -107,6 +132,10 @@ if mode == "SQL Bot":
             else:
                 df = resp["table"]
                 st.markdown(resp["summary"])
+                if resp.get("cached"):
+                    st.caption("⚡ Results served from cache (tables unchanged since last run)")
+                elif resp.get("plan"):
+                    st.caption(plan_caption(resp["plan"]))
 
                 with st.expander("Generated SQL", expanded=True):
                     st.code(resp["sql"], language="sql")
@@ -172,6 +201,13 @@ if pdf_list:
         cols = st.sidebar.columns([0.8, 0.2])
         cols[0].write(f"• {fname}")
         if cols[1].button("🗑️", key=f"del_{fname}"):
+            # drop the document row first; its chunks go with it (ON DELETE CASCADE)
+            conn = connect_db()
+            try:
+                cancel_jobs(conn, fname)
+                delete_document(conn, fname)
+            finally:
+                conn.close()
             os.remove(os.path.join(PDF_DIR, fname))
             st.session_state.processed_uploads.discard(fname)
             st.session_state.processed_dragged.discard(fname)
@@ -182,35 +218,56 @@ if pdf_list:
 else:
     st.sidebar.write("_(No PDFs indexed yet)_")
 
+# ─── Sidebar: retrieval filters (applied in SQL) ──────────────────────────
+st.sidebar.header("Search scope")
+search_filters = {
+    "sources": st.sidebar.multiselect("Only these PDFs", pdf_list),
+    "uploaded_after": st.sidebar.date_input("Uploaded since", value=None),
+}
+
+_stats = cache_stats()
+st.sidebar.caption(
+    f"Embedding cache: {_stats['hit_rate']:.0%} hits "
+    f"({_stats['memory_hits']} mem / {_stats['disk_hits']} disk / {_stats['misses']} miss)"
+)
+_answers = answer_cache_stats()
+st.sidebar.caption(
+    f"Answer cache: {_answers['hit_rate']:.0%} hits ({_answers['hits']} of "
+    f"{_answers['hits'] + _answers['misses']}), {_answers['saved_seconds']:.1f}s saved, "
+    f"{_answers['entries']} cached"
+)
+_sql = sql_cache_stats()
+st.sidebar.caption(
+    f"NL→SQL cache: {_sql['hit_rate']:.0%} hits ({_sql['hits']} exact / "
+    f"{_sql['paraphrase_hits']} paraphrase / {_sql['misses']} miss)"
+)
+_results = result_cache_stats()
+st.sidebar.caption(
+    f"SQL result cache: {_results['hit_rate']:.0%} hits, {_results['entries']} results "
+    f"({_results['bytes'] / 1e6:.1f} MB), {_results['saved_seconds']:.1f}s saved"
+)
+for _name, _pool in pool_stats().items():
+    st.sidebar.caption(
+        f"{_name} DB pool: {_pool['checked_out']} in use / {_pool['idle']} idle "
+        f"(size {_pool['size']}+{_pool['max_overflow']}), "
+        f"{_pool['waits']} waits, avg {_pool['avg_wait_ms']:.0f} ms"
+    )
+
 # ─── PDF Processing Helper ─────────────────────────────────────────────────
-def process_pdf_in_parallel(pdf_path: str) -> str:
-    raw_text = extract_text_from_pdf(pdf_path)
-    docs = add_metadata_to_chunks(chunk_text(raw_text), pdf_path)
-    progress = st.sidebar.progress(0)
-    total = len(docs)
-    embeddings = [None] * total
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = {
-            executor.submit(ollama.embeddings,
-                            model=OLLAMA_MODEL,
-                            prompt=doc["content"]): idx
-            for idx, doc in enumerate(docs)
-        }
-        for i, fut in enumerate(as_completed(futures)):
-            embeddings[futures[fut]] = fut.result()["embedding"]
-            progress.progress((i + 1) / total)
+def queue_pdf(pdf_path: str, doc_hash: str):
+    """Queue one PDF for background indexing; returns the job id, or None if this exact file is already indexed."""
+    source = pathlib.Path(pdf_path).name
     conn = connect_db()
-    for embed, doc in zip(embeddings, docs):
-        insert_document_chunk(
-            conn,
-            doc["content"],
-            doc["metadata"],
-            embed
-        )
-    conn.close()
-    return raw_text
-
-# ─── Main: Upload or Drag & Drop + Summarize ───────────────────────────────
+    try:
+        if indexed_doc_hashes(conn, [source]).get(source) == doc_hash:
+            return None
+        return enqueue_job(conn, pdf_path, doc_hash)
+    finally:
+        conn.close()
+
+start_worker()
+
+# ─── Main: Upload or Drag & Drop ───────────────────────────────────────────
 st.markdown("#### Upload / Drag & Drop PDFs")
 uploads = st.file_uploader(
     "Choose PDF(s)", type=["pdf"], accept_multiple_files=True
@@ -221,21 +278,36 @@ if uploads:
             continue
         st.session_state.processed_uploads.add(pdf.name)
         path = os.path.join(PDF_DIR, pdf.name)
-        with open(path, "wb") as f:
-            f.write(pdf.read())
-        with st.sidebar.spinner(f"Processing {pdf.name}…"):
-            raw = process_pdf_in_parallel(path)
-        st.sidebar.success(f"Indexed {pdf.name} ✅")
-        summary = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{
-                "role": "user",
-                "content": f"Please provide a concise summary (6–8 sentences) of:\n{raw[:4000]}"
-            }]
-        ).choices[0].message.content
-        st.session_state.summaries[pdf.name] = summary
-        st.sidebar.markdown("**📑 Summary:**")
-        st.sidebar.write(summary)
+        doc_hash = save_and_hash(pdf, path)
+        if queue_pdf(path, doc_hash) is None:
+            st.sidebar.info(f"{pdf.name} is unchanged; already indexed")
+
+# ─── Sidebar: ingestion jobs (polled, the upload never blocks) ─────────────
+@st.fragment(run_every=2)
+def show_ingest_jobs():
+    conn = connect_db()
+    try:
+        jobs = job_statuses(conn, limit=10)
+    finally:
+        conn.close()
+    if not jobs:
+        return
+    st.markdown("**Ingestion jobs**")
+    for job in jobs:
+        if job["status"] == "done":
+            st.success(f"Indexed {job['source']} ✅ ({job['chunks_done']} chunks)")
+            if job["summary"]:
+                st.session_state.summaries[job["source"]] = job["summary"]
+                with st.expander(f"📑 Summary: {job['source']}"):
+                    st.write(job["summary"])
+        elif job["status"] == "failed":
+            retry = ", will retry" if job["attempts"] < JOB_MAX_ATTEMPTS else ""
+            st.error(f"{job['source']}: {job['error']} (attempt {job['attempts']}{retry})")
+        else:
+            st.caption(f"⏳ {job['source']}: {job['status']}, {job['chunks_done']} chunks indexed…")
+
+with st.sidebar:
+    show_ingest_jobs()
 
 # ─── Main: Chat Interface ─────────────────────────────────────────────────
 # Render history for the selected session
@@ -262,12 +334,8 @@ if user_q:
             placeholder = st.empty()
             placeholder.markdown("🤖 Thinking…")
         try:
-            response = send_pdf_answer(user_q)
-            text = ""
-            for c in response:
-                text += c
-                placeholder.markdown(text)
-                time.sleep(0.01)
+            # render tokens as the model emits them
+            text = placeholder.write_stream(send_pdf_answer(user_q, stream=True, filters=search_filters))
             # Append assistant reply
             st.session_state.chat_sessions[st.session_state.current_chat].append({
                 "role": "assistant", "content": text
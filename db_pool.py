@@ -0,0 +1,88 @@
+# db_pool.py
+"""
+Connection-pool settings and helpers shared by both bots.
+
+pdf_bot.db (psycopg2) and sql_bot.database (SQLAlchemy) each keep their own
+pool, but size it from the DB_POOL_* variables below, record checkout waits
+with WaitStats and register it here, so app.py warms and reports every pool
+through `warm_pools()` / `pool_stats()`.
+"""
+import os
+import threading
+
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv())
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))                # idle connections kept open
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))  # extra connections under burst
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))       # seconds to wait for a free one
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# only ping connections that sat idle at least this long; fresh ones are trusted (pdf_bot)
+DB_POOL_PING_IDLE = float(os.getenv("DB_POOL_PING_IDLE", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))       # seconds; -1 never (sql_bot)
+
+
+class WaitStats:
+    """Checkout and wait counters, kept the same way for every pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"checkouts": 0, "waits": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+                       "timeouts": 0}
+
+    def checkout(self, wait, waited):
+        """Record one checkout that took `wait` seconds (`waited`: it had to queue)."""
+        with self._lock:
+            self.counts["checkouts"] += 1
+            if waited:
+                self.counts["waits"] += 1
+                self.counts["wait_seconds"] += wait
+                self.counts["max_wait_seconds"] = max(self.counts["max_wait_seconds"], wait)
+
+    def timeout(self):
+        with self._lock:
+            self.counts["timeouts"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.counts)
+        stats["avg_wait_ms"] = 1000 * stats["wait_seconds"] / stats["waits"] if stats["waits"] else 0.0
+        return stats
+
+
+def hold_connections(checkout, n, size):
+    """Check out `n` connections at once (default and cap: the pool's `size`), then close them all."""
+    n = size if n is None else min(n, size)
+    conns = []
+    try:
+        for _ in range(n):
+            conns.append(checkout())
+    finally:
+        for conn in conns:
+            conn.close()
+    return len(conns)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def register_pool(name, warm, stats):
+    """Make a bot's pool visible to warm_pools() / pool_stats()."""
+    with _pools_lock:
+        _pools[name] = (warm, stats)
+
+
+def warm_pools(n=None):
+    """Open every registered pool's idle connections; {name: connections opened}."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {name: warm(n) for name, (warm, _) in pools.items()}
+
+
+def pool_stats():
+    """{name: in use / idle counts plus checkout wait times} for every registered pool."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {name: stats() for name, (_, stats) in pools.items()}
@@ -0,0 +1,164 @@
+# answer_cache.py
+"""
+Semantic cache of PDF-chat answers, keyed by the question's embedding.
+
+A question whose embedding is at least ANSWER_CACHE_SIMILARITY (cosine) from
+a cached one gets that answer back without a search or a completion. Each
+entry remembers which sources (and their doc_hash) its context came from; it
+is dropped when one of them is re-indexed or deleted, after
+ANSWER_CACHE_TTL seconds, or when the cache is full (least recently used
+first). Lives in the app process, so it is shared by every chat session.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .db import connect_db
+from .local_index import VectorIndex
+
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))            # seconds
+ANSWER_CACHE_MAX_ITEMS = int(os.getenv("ANSWER_CACHE_MAX_ITEMS", "1000"))  # 0 disables
+# nearest cached questions checked for one asked under the same filters
+SCOPE_CANDIDATES = 5
+
+
+def _scope_key(scope):
+    """Canonical form of a filters dict (None and {} are the same unfiltered scope)."""
+    scope = {key: sorted(value) if isinstance(value, (list, tuple, set)) else value
+             for key, value in (scope or {}).items() if value}
+    return json.dumps(scope, sort_keys=True, default=str) if scope else None
+
+
+def _current_doc_hashes(sources):
+    conn = connect_db()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT source, doc_hash FROM documents WHERE source = ANY(%s)", (list(sources),))
+            return dict(cur.fetchall())
+    finally:
+        conn.close()
+
+
+class AnswerCache:
+    def __init__(self, similarity=ANSWER_CACHE_SIMILARITY, ttl=ANSWER_CACHE_TTL,
+                 max_items=ANSWER_CACHE_MAX_ITEMS, doc_hashes=_current_doc_hashes):
+        self.similarity = similarity
+        self.ttl = ttl
+        self.max_items = max_items
+        self._doc_hashes = doc_hashes
+        self._index = VectorIndex()
+        self._entries = OrderedDict()      # id -> entry, least recently used first
+        self._by_source = {}               # source -> {entry ids}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evictions": 0, "expirations": 0,
+                      "invalidations": 0, "saved_seconds": 0.0}
+
+    # ── internals (lock held) ──
+    def _drop(self, ids, counter):
+        ids = [i for i in ids if i in self._entries]
+        for i in ids:
+            entry = self._entries.pop(i)
+            for source in entry["sources"]:
+                owners = self._by_source.get(source)
+                if owners is not None:
+                    owners.discard(i)
+                    if not owners:
+                        del self._by_source[source]
+        self._index.remove(ids)
+        self.stats[counter] += len(ids)
+
+    def _purge_expired(self, now):
+        expired = [i for i, e in self._entries.items() if now - e["created"] > self.ttl]
+        self._drop(expired, "expirations")
+
+    # ── public API ──
+    def lookup(self, query_embedding, scope=None):
+        """The cached answer for a near-identical question asked with the same `scope` (filters), or None."""
+        if not self.max_items:
+            return None
+        start = time.perf_counter()
+        scope = _scope_key(scope)
+        with self._lock:
+            self._purge_expired(time.time())
+            match = None
+            for score, entry in self._index.search(query_embedding, k=SCOPE_CANDIDATES):
+                if score < self.similarity:
+                    break
+                if entry["scope"] == scope:
+                    match = entry
+                    break
+        if match is not None and match["sources"]:
+            # another process (e.g. `python -m pdf_bot.jobs`) may have re-indexed a source
+            if self._doc_hashes(match["sources"]) != match["sources"]:
+                with self._lock:
+                    self._drop([match["id"]], "invalidations")
+                match = None
+        with self._lock:
+            if match is None or match["id"] not in self._entries:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(match["id"])
+            self.stats["hits"] += 1
+            self.stats["saved_seconds"] += max(0.0, match["latency"] - (time.perf_counter() - start))
+            return match["answer"]
+
+    def store(self, query, query_embedding, answer, sources, latency, scope=None):
+        """
+        Cache `answer`; `sources` are the files its context came from,
+        `latency` is what producing it cost (reported as saved on each hit)
+        and `scope` the retrieval filters it was answered under.
+        """
+        if not self.max_items:
+            return
+        sources = self._doc_hashes(set(sources)) if sources else {}
+        with self._lock:
+            self._purge_expired(time.time())
+            entry = {"query": query, "answer": answer, "sources": sources, "scope": _scope_key(scope),
+                     "latency": latency, "created": time.time()}
+            entry["id"] = self._index.add([query_embedding], [entry])[0]
+            self._entries[entry["id"]] = entry
+            for source in sources:
+                self._by_source.setdefault(source, set()).add(entry["id"])
+            self.stats["stored"] += 1
+            overflow = len(self._entries) - self.max_items
+            if overflow > 0:
+                self._drop(list(self._entries)[:overflow], "evictions")
+
+    def invalidate_source(self, source):
+        """Forget every answer built from `source` (call after it is re-indexed or deleted)."""
+        with self._lock:
+            self._drop(list(self._by_source.get(source, ())), "invalidations")
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache()
+        return _cache
+
+
+def invalidate_source(source):
+    """Drop cached answers that used `source`, if this process has a cache."""
+    if _cache is not None:
+        _cache.invalidate_source(source)
+
+
+def answer_cache_stats():
+    """Hit rate, entries and seconds of generation saved."""
+    return get_answer_cache().snapshot()
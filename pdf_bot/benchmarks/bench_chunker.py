@@ -0,0 +1,63 @@
+# pdf_bot/benchmarks/bench_chunker.py
+"""
+Native chunker vs LangChain's RecursiveCharacterTextSplitter on a multi-MB text.
+
+    python -m pdf_bot.benchmarks.bench_chunker [size_mb]
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from pdf_bot.pdf_utils import chunk_spans
+
+WORDS = ("the sun is a dynamic star whose magnetic field drives flares and coronal "
+         "mass ejections across the solar system planets orbit in ellipses").split()
+
+
+def synthetic_document(size_mb, seed=0):
+    rng = random.Random(seed)
+    pages, size, page_no = [], 0, 1
+    while size < size_mb * 1024 * 1024:
+        paragraphs = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 160)))
+            for _ in range(rng.randint(3, 8))
+        ]
+        page = f"\n--- Page {page_no} ---\n" + "\n\n".join(paragraphs)
+        pages.append(page)
+        size += len(page)
+        page_no += 1
+    return "".join(pages)
+
+
+def measure(fn, text):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = fn(text)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(chunks), seconds, peak
+
+
+def main(size_mb=5.0):
+    text = synthetic_document(size_mb)
+    langchain = RecursiveCharacterTextSplitter(
+        chunk_size=300, chunk_overlap=50, separators=["\n\n", "\n", " ", ""]
+    )
+    rows = [
+        ("langchain", measure(langchain.split_text, text)),
+        ("native", measure(lambda t: chunk_spans(t, 300, 50), text)),
+    ]
+    print(f"text: {len(text) / 1e6:.1f} MB chars")
+    print(f"{'splitter':<10} {'chunks':>8} {'seconds':>8} {'peak MB':>8}")
+    for name, (n, seconds, peak) in rows:
+        print(f"{name:<10} {n:>8} {seconds:>8.2f} {peak / 1e6:>8.1f}")
+    (_, base_s, base_mem), (_, new_s, new_mem) = rows[0][1], rows[1][1]
+    print(f"speed-up x{base_s / new_s:.1f}, memory x{base_mem / new_mem:.1f}")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 5.0)
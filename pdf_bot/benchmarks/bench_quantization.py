@@ -0,0 +1,108 @@
+# pdf_bot/benchmarks/bench_quantization.py
+"""
+Storage, index size, recall@k and latency of compact embedding representations.
+
+    python -m pdf_bot.benchmarks.bench_quantization --rows 200000 --dim 1024 --tolerance 0.02
+
+Compares an HNSW index over the float32 column with indexes over its float16
+(halfvec) and 1-bit (binary_quantize) forms, and a float16 column, each
+re-scored exactly from RESCORE_FACTOR * k candidates. Recall@k is measured
+against exact float32 search; a configuration passes if it loses at most
+`--tolerance` recall versus the plain float32 index.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from pdf_bot.db import connect_db
+from pdf_bot.vector_adapter import Vector
+from pdf_bot.vector_index import (
+    create_vector_index, configure_search, nearest_sql, RESCORE_FACTOR,
+)
+from pdf_bot.benchmarks.bench_vector_index import TABLE, load, synthetic_queries
+
+HALF_TABLE = f"{TABLE}_half"
+
+# label -> (table, storage, quantization)
+CONFIGS = {
+    "float32 column + index":      (TABLE, "vector", "none"),
+    "float32 column, halfvec idx": (TABLE, "vector", "halfvec"),
+    "float32 column, binary idx":  (TABLE, "vector", "binary"),
+    "halfvec column + index":      (HALF_TABLE, "halfvec", "none"),
+    "halfvec column, binary idx":  (HALF_TABLE, "halfvec", "binary"),
+}
+
+
+def sizes(conn, table, index):
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_table_size(%s::regclass), pg_relation_size(%s::regclass)", (table, index))
+        return cur.fetchone()
+
+
+def search(conn, query, k, metric, table, storage, quantization, rescore_factor, exact=False, ef_search=None):
+    with conn.cursor() as cur:
+        configure_search(cur, ef_search=ef_search, exact=exact, table=table)
+        sql = nearest_sql("id", metric, "none" if exact else quantization, table,
+                          len(query), storage)
+        start = time.perf_counter()
+        cur.execute(sql, {"vector": Vector(query), "limit": k, "rescore": k * rescore_factor})
+        ids = [r[0] for r in cur.fetchall()]
+        elapsed = time.perf_counter() - start
+    conn.rollback()
+    return ids, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metric", default="l2")
+    parser.add_argument("--ef-search", type=int, default=100)
+    parser.add_argument("--rescore-factor", type=int, default=RESCORE_FACTOR)
+    parser.add_argument("--tolerance", type=float, default=0.02,
+                        help="max recall@k loss vs the float32 index for a PASS")
+    parser.add_argument("--skip-load", action="store_true")
+    args = parser.parse_args()
+
+    conn = connect_db()
+    if not args.skip_load:
+        print(f"Loading {args.rows} x {args.dim} vectors…")
+        load(conn, args.rows, args.dim)
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {HALF_TABLE}")
+        cur.execute(f"CREATE TABLE {HALF_TABLE} AS "
+                    f"SELECT id, embedding::halfvec({args.dim}) AS embedding FROM {TABLE}")
+        cur.execute(f"ANALYZE {HALF_TABLE}")
+    conn.commit()
+
+    queries = synthetic_queries(args.queries, args.dim)
+    truth = [search(conn, q, args.k, args.metric, TABLE, "vector", "none", 1, exact=True)[0]
+             for q in queries]
+
+    baseline = None
+    print(f"{'configuration':<30} {'table':>9} {'index':>9} {'recall@' + str(args.k):>9} "
+          f"{'p50 ms':>7} {'p95 ms':>7}")
+    for label, (table, storage, quantization) in CONFIGS.items():
+        index = f"{table}_{quantization}_idx"
+        create_vector_index(conn, "hnsw", args.metric, table=table, name=index, concurrently=False,
+                            quantization=quantization, storage=storage, dim=args.dim)
+        table_bytes, index_bytes = sizes(conn, table, index)
+        results = [search(conn, q, args.k, args.metric, table, storage, quantization,
+                          args.rescore_factor, ef_search=args.ef_search) for q in queries]
+        recall = np.mean([len(set(ids) & set(t)) / args.k for (ids, _), t in zip(results, truth)])
+        lat = np.array([t for _, t in results]) * 1000
+        baseline = recall if baseline is None else baseline
+        verdict = "PASS" if baseline - recall <= args.tolerance else "FAIL"
+        print(f"{label:<30} {table_bytes / 1e6:>7.0f}MB {index_bytes / 1e6:>7.0f}MB {recall:>9.3f} "
+              f"{np.percentile(lat, 50):>7.1f} {np.percentile(lat, 95):>7.1f}  {verdict}")
+        with conn.cursor() as cur:
+            cur.execute(f'DROP INDEX "{index}"')
+        conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# pdf_bot/benchmarks/bench_vector_index.py
+"""
+Recall@k and latency of HNSW / IVFFlat vs exact search on a synthetic corpus.
+
+    python -m pdf_bot.benchmarks.bench_vector_index --rows 1000000 --dim 1024
+
+Loads clustered random vectors into a scratch table (bench_vectors) with
+binary COPY, builds the index with pdf_bot.vector_index, then for each
+ef_search / probes value reports recall@k against the exact top-k and
+p50/p95 query latency. Queries are held-out points around the corpus's own
+cluster centres.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from pdf_bot.db import connect_db
+from pdf_bot.vector_adapter import Vector, copy_binary, encode_vector
+from pdf_bot.vector_index import create_vector_index, configure_search, distance_operator
+
+TABLE = "bench_vectors"
+
+
+def _blobs(centres, rng, n):
+    noise = rng.normal(size=(n, centres.shape[1])).astype(np.float32)
+    return centres[rng.integers(0, len(centres), n)] + 0.3 * noise
+
+
+def synthetic_vectors(rows, dim, clusters=256, seed=0):
+    """Gaussian blobs around random centres — closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    for start in range(0, rows, 50_000):
+        yield _blobs(centres, rng, min(50_000, rows - start))
+
+
+def synthetic_queries(n, dim, clusters=256, seed=0, query_seed=1):
+    """`n` held-out points around the same centres as synthetic_vectors(..., seed=seed)."""
+    centres = np.random.default_rng(seed).normal(size=(clusters, dim)).astype(np.float32)
+    return _blobs(centres, np.random.default_rng(query_seed), n)
+
+
+def load(conn, rows, dim):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute(f"CREATE TABLE {TABLE} (id BIGSERIAL PRIMARY KEY, embedding VECTOR({dim}) NOT NULL)")
+        for block in synthetic_vectors(rows, dim):
+            copy_binary(cur, TABLE, ("embedding",), (encode_vector,), ((v,) for v in block))
+        cur.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+
+
+def search(conn, query, k, metric, **settings):
+    op = distance_operator(metric)
+    with conn.cursor() as cur:
+        configure_search(cur, table=TABLE, **settings)
+        start = time.perf_counter()
+        cur.execute(f"SELECT id FROM {TABLE} ORDER BY embedding {op} %s LIMIT %s", (Vector(query), k))
+        ids = [r[0] for r in cur.fetchall()]
+        elapsed = time.perf_counter() - start
+    conn.rollback()  # drop the SET LOCALs
+    return ids, elapsed
+
+
+def run(conn, queries, k, metric, label, **settings):
+    exact = [search(conn, q, k, metric, exact=True) for q in queries]
+    approx = [search(conn, q, k, metric, exact=False, **settings) for q in queries]
+    recall = np.mean([len(set(a) & set(e)) / k for (a, _), (e, _) in zip(approx, exact)])
+    lat = np.array([t for _, t in approx]) * 1000
+    exact_lat = np.array([t for _, t in exact]) * 1000
+    print(f"{label:<22} recall@{k}={recall:.3f}  p50={np.percentile(lat, 50):7.1f} ms  "
+          f"p95={np.percentile(lat, 95):7.1f} ms  (exact p95={np.percentile(exact_lat, 95):.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metric", default="l2")
+    parser.add_argument("--skip-load", action="store_true")
+    args = parser.parse_args()
+
+    conn = connect_db()
+    if not args.skip_load:
+        print(f"Loading {args.rows} x {args.dim} vectors…")
+        load(conn, args.rows, args.dim)
+    queries = synthetic_queries(args.queries, args.dim)
+
+    for method, knob, values in (("hnsw", "ef_search", (20, 40, 100, 200)),
+                                 ("ivfflat", "probes", (1, 10, 40, 100))):
+        start = time.perf_counter()
+        create_vector_index(conn, method, args.metric, table=TABLE, name=f"{TABLE}_{method}_idx",
+                            concurrently=False)
+        print(f"{method}: built in {time.perf_counter() - start:.0f}s")
+        for value in values:
+            run(conn, queries, args.k, args.metric, f"{method} {knob}={value}", **{knob: value})
+        with conn.cursor() as cur:
+            cur.execute(f"DROP INDEX {TABLE}_{method}_idx")
+        conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
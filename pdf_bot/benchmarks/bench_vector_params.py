@@ -0,0 +1,85 @@
+# pdf_bot/benchmarks/bench_vector_params.py
+"""
+Per-call cost of getting a 1024-d embedding to Postgres.
+
+    python -m pdf_bot.benchmarks.bench_vector_params [--db]
+
+Client side it compares the old str()-join literal with the Vector adapter
+(query parameters) and text COPY rows with binary COPY rows (ingestion).
+With --db it also times the server parsing each form.
+"""
+import argparse
+import io
+import json
+import timeit
+
+import numpy as np
+
+from pdf_bot.vector_adapter import Vector, copy_binary, encode_vector, encode_int4
+
+DIM = 1024
+
+
+def old_literal(embedding):
+    return "[" + ",".join([str(x) for x in embedding]) + "]"
+
+
+def client_side(embedding, number=2000):
+    vector = Vector(embedding)
+    rows = {
+        "query literal, str() join": lambda: old_literal(embedding),
+        "query literal, Vector adapter": lambda: Vector(embedding).to_text(),
+        "COPY row, text": lambda: old_literal(embedding) + "\t" + json.dumps({"source": "a.pdf"}),
+        "COPY row, binary": lambda: encode_vector(embedding),
+    }
+    print(f"{'client encoding':<32} {'µs/call':>9} {'bytes':>7}")
+    sizes = {
+        "query literal, str() join": len(old_literal(embedding)),
+        "query literal, Vector adapter": len(vector.to_text()),
+        "COPY row, text": len(old_literal(embedding)),
+        "COPY row, binary": len(vector.to_binary()),
+    }
+    for name, fn in rows.items():
+        usec = timeit.timeit(fn, number=number) / number * 1e6
+        print(f"{name:<32} {usec:>9.1f} {sizes[name]:>7}")
+
+
+def server_side(embedding, rows=2000):
+    from pdf_bot.db import connect_db
+    conn = connect_db()
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TEMP TABLE bench_vec (id INT, embedding VECTOR({DIM}))")
+
+        def param(value):
+            cur.execute("SELECT %s::vector", (value,))
+            cur.fetchone()
+
+        for name, value in (("query, str() literal", old_literal(embedding)),
+                            ("query, Vector adapter", Vector(embedding))):
+            usec = timeit.timeit(lambda: param(value), number=500) / 500 * 1e6
+            print(f"{name:<32} {usec:>9.1f} µs round trip")
+
+        def copy_text():
+            buf = io.StringIO("".join(f"{i}\t{old_literal(embedding)}\n" for i in range(rows)))
+            cur.copy_expert("COPY bench_vec (id, embedding) FROM STDIN", buf)
+
+        def copy_bin():
+            copy_binary(cur, "bench_vec", ("id", "embedding"), (encode_int4, encode_vector),
+                        ((i, embedding) for i in range(rows)))
+
+        for name, fn in (("COPY text", copy_text), ("COPY binary", copy_bin)):
+            seconds = timeit.timeit(fn, number=3) / 3
+            print(f"{name:<32} {seconds / rows * 1e6:>9.1f} µs/row ({rows / seconds:.0f} rows/s)")
+    conn.rollback()
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", action="store_true", help="also time against Postgres")
+    args = parser.parse_args()
+    # what ollama hands back: a list of Python floats
+    embedding = np.random.default_rng(0).normal(size=DIM).tolist()
+    client_side(embedding)
+    if args.db:
+        server_side(embedding)
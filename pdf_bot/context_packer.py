@@ -0,0 +1,109 @@
+# context_packer.py
+"""
+Pack retrieved chunks into a token-bounded context block for the RAG prompt.
+
+Chunks from the same source whose character offsets overlap or touch (the
+chunker overlaps neighbours by chunk_overlap) are merged into one span, so
+shared text is sent once. Spans are then added in order of relevance (a
+span ranks as its best chunk) until CONTEXT_TOKEN_BUDGET is used; the span
+that crosses the budget is cut at a word boundary and packing stops.
+Tokens are counted with token_count (tiktoken, or ~4 characters per token
+when it is not installed).
+"""
+import os
+
+from token_count import DEFAULT_ENCODING, count_tokens, truncate_tokens
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_ENCODING = os.getenv("CONTEXT_ENCODING", DEFAULT_ENCODING)
+# a partial span shorter than this is not worth its label
+MIN_PARTIAL_TOKENS = 40
+# chunks closer than this many characters (the whitespace the chunker trims) are adjacent
+ADJACENT_GAP = 2
+
+
+def merge_chunks(chunks):
+    """
+    Merge (content, metadata, ...) chunks into spans, best first. Each span is
+    a dict with source, text, chunk indexes, pages and its relevance rank.
+    Chunks without offsets (indexed before they were recorded) are only
+    de-duplicated by content.
+    """
+    spans, seen = [], set()
+    for rank, chunk in enumerate(chunks):
+        content, meta = chunk[0], chunk[1]
+        key = (meta.get("source"), content)
+        if key in seen:
+            continue
+        seen.add(key)
+        spans.append({
+            "source": meta.get("source"), "text": content, "rank": rank,
+            "start": meta.get("start"), "end": meta.get("end"),
+            "chunks": [meta.get("chunk_index")],
+            "page_start": meta.get("page_start"), "page_end": meta.get("page_end"),
+        })
+
+    by_source = {}
+    for span in spans:
+        by_source.setdefault(span["source"], []).append(span)
+    merged = []
+    for group in by_source.values():
+        located = sorted((s for s in group if s["start"] is not None), key=lambda s: (s["start"], s["end"]))
+        merged.extend(s for s in group if s["start"] is None)
+        current = None
+        for span in located:
+            if current is None or span["start"] > current["end"] + ADJACENT_GAP:
+                current = dict(span, chunks=list(span["chunks"]))
+                merged.append(current)
+                continue
+            if span["end"] > current["end"]:
+                overlap = current["end"] - span["start"]
+                joiner = "" if overlap >= 0 else " "
+                current["text"] += joiner + span["text"][max(0, overlap):]
+                current["end"] = span["end"]
+                current["page_end"] = span["page_end"]
+            current["chunks"] += span["chunks"]
+            current["rank"] = min(current["rank"], span["rank"])
+    merged.sort(key=lambda s: s["rank"])
+    return merged
+
+
+def span_label(span):
+    chunks = sorted(i for i in span["chunks"] if i is not None)
+    if len(chunks) > 1:
+        where = f"chunks {chunks[0]}-{chunks[-1]}"
+    else:
+        where = f"chunk {chunks[0] if chunks else '?'}"
+    return f"[{span['source']} - {where}]"
+
+
+def pack_context(chunks, budget=CONTEXT_TOKEN_BUDGET, encoding_name=CONTEXT_ENCODING):
+    """
+    (context block, stats) for `chunks` ranked best first, at most `budget`
+    tokens long. stats has tokens, chunks, spans and truncated.
+    """
+    parts, used, packed, truncated = [], 0, [], False
+    for span in merge_chunks(chunks):
+        label = span_label(span)
+        # "\n\n" between spans and "\n" after the label
+        overhead = count_tokens(label, encoding_name) + (2 if parts else 1)
+        remaining = budget - used - overhead
+        if remaining <= 0:
+            truncated = True
+            break
+        text = span["text"]
+        tokens = count_tokens(text, encoding_name)
+        if tokens > remaining:
+            truncated = True
+            if remaining < MIN_PARTIAL_TOKENS:
+                break
+            text = truncate_tokens(text, remaining, encoding_name)
+            tokens = count_tokens(text, encoding_name)
+        parts.append(f"{label}\n{text}")
+        used += overhead + tokens
+        packed.append(span)
+        if truncated:
+            break
+    stats = {"tokens": used, "chunks": sum(len(s["chunks"]) for s in packed),
+             "spans": len(packed), "truncated": truncated}
+    return "\n\n".join(parts), stats
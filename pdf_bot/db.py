@@ -0,0 +1,255 @@
+# db.py
+"""
+Shared, thread-safe psycopg2 connection pool for pdf_bot and app.py.
+
+`connect_db()` checks a connection out of the process-wide pool and returns a
+thin proxy whose `close()` hands it back instead of disconnecting, so callers
+keep the familiar connect → use → close shape without paying a TCP + auth
+handshake per call. Sizing comes from the shared DB_POOL_* settings in
+db_pool; `pool_stats()` reports checkouts, waits and wait time for sizing
+the pool under load.
+"""
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+from db_pool import (
+    DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_PRE_PING, DB_POOL_PING_IDLE,
+    WaitStats, hold_connections, register_pool,
+)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection became free within DB_POOL_TIMEOUT seconds."""
+
+
+def _connect():
+    return psycopg2.connect(
+        dbname=os.getenv("LLM_SQL_DBNAME", "llm_sql_demo"),
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", "postgres"),
+        host=os.getenv("DB_HOST", "localhost")
+    )
+
+
+class ConnectionPool:
+    """
+    At most `size + max_overflow` open connections; up to `size` of them are
+    kept idle between uses. Checkout blocks for up to `timeout` seconds when
+    every connection is busy.
+    """
+
+    def __init__(self, size=DB_POOL_SIZE, max_overflow=DB_POOL_MAX_OVERFLOW, timeout=DB_POOL_TIMEOUT,
+                 pre_ping=DB_POOL_PRE_PING, ping_idle=DB_POOL_PING_IDLE, connect=_connect):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self.ping_idle = ping_idle
+        self._connect = connect
+        self._idle = []            # [(conn, returned_at)], most recently returned last
+        self._open = 0
+        self._checked_out = 0
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self.waits = WaitStats()
+        self.stats = {"connects": 0, "stale_dropped": 0}
+
+    # ── internals (called with the lock held unless noted) ──
+    def _check_fork(self):
+        # a forked child must not share its parent's sockets; start over
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._idle, self._open, self._checked_out = [], 0, 0
+
+    def _alive(self, conn, idle_for):
+        """Not closed, not broken and (after `ping_idle` seconds idle) answering. Lock NOT held."""
+        if conn.closed:
+            return False
+        if not self.pre_ping or idle_for < self.ping_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    # ── public API ──
+    def getconn(self):
+        start = time.perf_counter()
+        waited = False
+        while True:
+            with self._cond:
+                self._check_fork()
+                while not self._idle and self._open >= self.size + self.max_overflow:
+                    remaining = self.timeout - (time.perf_counter() - start)
+                    if remaining <= 0:
+                        self.waits.timeout()
+                        raise PoolTimeout(
+                            f"no database connection free after {self.timeout:.0f}s "
+                            f"({self._open} open, pool size {self.size} + overflow {self.max_overflow})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                else:
+                    conn, returned_at = None, None
+                    self._open += 1
+                self._checked_out += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._checked_out -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.stats["connects"] += 1
+            elif not self._alive(conn, time.monotonic() - returned_at):
+                with self._cond:
+                    self._checked_out -= 1
+                    self.stats["stale_dropped"] += 1
+                self._discard(conn)
+                continue
+            break
+
+        self.waits.checkout(time.perf_counter() - start, waited)
+        return conn
+
+    def putconn(self, conn):
+        """Return a connection: roll back anything uncommitted, then keep or close it."""
+        keep = not conn.closed
+        if keep:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except psycopg2.Error:
+                keep = False
+        with self._cond:
+            self._checked_out -= 1
+            if keep and os.getpid() == self._pid and len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    def warm(self, n=None):
+        """Fill the idle pool with up to `n` (default: pool size) connections; returns how many were opened."""
+        before = self.stats["connects"]
+        hold_connections(lambda: PooledConnection(self, self.getconn()), n, self.size)
+        return self.stats["connects"] - before
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+    def snapshot(self):
+        stats = self.waits.snapshot()
+        with self._cond:
+            stats.update(self.stats)
+            stats.update(size=self.size, max_overflow=self.max_overflow, open=self._open,
+                         idle=len(self._idle), checked_out=self._checked_out)
+        return stats
+
+
+class PooledConnection:
+    """A checked-out psycopg2 connection; `close()` returns it to its pool."""
+
+    def __init__(self, pool, conn):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_conn", conn)
+
+    def __getattr__(self, name):
+        conn = object.__getattribute__(self, "_conn")
+        if conn is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)  # e.g. conn.autocommit = True
+
+    @property
+    def closed(self):
+        conn = object.__getattribute__(self, "_conn")
+        return 1 if conn is None else conn.closed
+
+    def close(self):
+        conn = object.__getattribute__(self, "_conn")
+        if conn is not None:
+            object.__setattr__(self, "_conn", None)
+            self._pool.putconn(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # like psycopg2's `with conn:` (commit / roll back), then back to the pool
+        try:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        finally:
+            self.close()
+
+    def __del__(self):
+        # a caller that forgot close() must not leak a pool slot
+        if object.__getattribute__(self, "__dict__").get("_conn") is not None:
+            self.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def connect_db():
+    """Check out a pooled connection; call `.close()` (or use `with`) to give it back."""
+    pool = get_pool()
+    return PooledConnection(pool, pool.getconn())
+
+
+def warm_pool(n=None):
+    """Open the pool's idle connections up front (e.g. at app start-up)."""
+    return get_pool().warm(n)
+
+
+def pool_stats():
+    """Open / idle / checked-out counts plus checkout wait times."""
+    return get_pool().snapshot()
+
+
+register_pool("PDF", warm_pool, pool_stats)
@@ -0,0 +1,185 @@
+# embedding_cache.py
+"""
+Two-tier cache in front of the embedding model, keyed by (model:format, sha256(text)).
+The format (EMBEDDING_FORMAT, unit-length vectors from /api/embed) keeps
+vectors cached from the unnormalised /api/embeddings endpoint out of reach.
+
+Tier 1 is an in-process LRU; tier 2 is a size-bounded SQLite file on disk that
+survives restarts and is shared by every process on the box. Misses are sent to
+the batched EmbeddingClient.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .pdf_utils import sha256_text
+from .embedding_client import get_client, EMBEDDING_FORMAT
+
+OLLAMA_MODEL = "mxbai-embed-large"
+
+MEMORY_ITEMS = int(os.getenv("EMBED_CACHE_MEMORY_ITEMS", "10000"))
+DISK_PATH = os.getenv(
+    "EMBED_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), ".cache", "embeddings.sqlite"),
+)
+DISK_MAX_BYTES = int(os.getenv("EMBED_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+def _key(text, model=OLLAMA_MODEL):
+    return f"{model}:{EMBEDDING_FORMAT}", sha256_text(text)
+
+
+class EmbeddingCache:
+    def __init__(self, path=DISK_PATH, memory_items=MEMORY_ITEMS, disk_max_bytes=DISK_MAX_BYTES):
+        self.memory_items = memory_items
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model     TEXT NOT NULL,
+                    hash      TEXT NOT NULL,
+                    vector    BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, hash)
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_used)")
+            self._disk_bytes = self._db.execute(
+                "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()[0]
+
+    # ── memory tier ──
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    # ── disk tier ──
+    def _disk_get(self, key):
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT vector FROM embeddings WHERE model = ? AND hash = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+        self._db.execute(
+            "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?", (time.time(), *key)
+        )
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def _disk_put(self, key, vector):
+        if self._db is None:
+            return
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        cur = self._db.execute(
+            "INSERT OR IGNORE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+            (*key, blob, time.time()),
+        )
+        if cur.rowcount:
+            self._disk_bytes += len(blob)
+        if self._disk_bytes > self.disk_max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Drop least-recently-used rows until the file is back under 90% of its bound."""
+        target = int(self.disk_max_bytes * 0.9)
+        while self._disk_bytes > target:
+            rows = self._db.execute(
+                "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 500"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+            self._db.executemany("DELETE FROM embeddings WHERE rowid = ?", [(r,) for r, _ in rows])
+            self._disk_bytes -= sum(n for _, n in rows)
+            self.stats["evictions"] += len(rows)
+
+    # ── public API ──
+    def get(self, text, model=OLLAMA_MODEL):
+        key = _key(text, model)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return vector
+            vector = self._disk_get(key)
+            if vector is not None:
+                self._remember(key, vector)
+                self.stats["disk_hits"] += 1
+                return vector
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, text, vector, model=OLLAMA_MODEL):
+        key = _key(text, model)
+        with self._lock:
+            self._remember(key, vector)
+            self._disk_put(key, vector)
+
+    def embed(self, text, model=OLLAMA_MODEL):
+        return self.embed_many([text], model)[0]
+
+    def embed_many(self, texts, model=OLLAMA_MODEL):
+        """Embed texts in order, sending only the cache misses to the model (in batches)."""
+        vectors = [self.get(text, model) for text in texts]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            # de-duplicate so repeated boilerplate in one batch is embedded once
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            fresh = dict(zip(unique, get_client(model).embed(unique)))
+            for text, vector in fresh.items():
+                self.put(text, vector, model)
+            for i in missing:
+                vectors[i] = fresh[texts[i]]
+        return vectors
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_items"] = len(self._memory)
+            stats["disk_bytes"] = self._disk_bytes if self._db is not None else 0
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (lookups - stats["misses"]) / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
+
+
+def get_embedding(text, model=OLLAMA_MODEL):
+    """Cached replacement for ollama.embeddings(model=..., prompt=text)["embedding"]."""
+    return get_cache().embed(text, model)
+
+
+def get_embeddings(texts, model=OLLAMA_MODEL):
+    """Cached, batched embeddings for a list of texts (input order preserved)."""
+    return get_cache().embed_many(list(texts), model)
+
+
+def cache_stats():
+    """Hit/miss counters for the shared cache."""
+    return get_cache().snapshot()
@@ -0,0 +1,196 @@
+# embedding_client.py
+"""
+Batched embedding client for Ollama's /api/embed.
+
+Unlike the legacy /api/embeddings endpoint, /api/embed returns vectors scaled
+to unit length (EMBEDDING_FORMAT); distance thresholds and cached or stored
+vectors must assume that. Texts are sent `batch_size` at a time; the number of requests in flight is an
+AIMD limit that grows while batches come back fast and shrinks on slow
+responses or errors. Failed batches are retried with exponential backoff.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ollama
+
+OLLAMA_MODEL = "mxbai-embed-large"
+# /api/embed L2-normalises; part of every cache key so unnormalised vectors never mix in
+EMBEDDING_FORMAT = "unit"
+
+EMBED_REQUEST_BATCH = int(os.getenv("EMBED_REQUEST_BATCH", "64"))
+EMBED_MIN_CONCURRENCY = int(os.getenv("EMBED_MIN_CONCURRENCY", "1"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "16"))
+EMBED_TARGET_LATENCY = float(os.getenv("EMBED_TARGET_LATENCY", "2.0"))  # seconds per batch
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+
+
+class AdaptiveLimit:
+    """Additive-increase / multiplicative-decrease concurrency limit."""
+
+    def __init__(self, minimum, maximum, target_latency, initial=None):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.value = float(initial or minimum)
+        self._lock = threading.Lock()
+
+    @property
+    def current(self):
+        return max(self.minimum, int(self.value))
+
+    def on_success(self, latency):
+        with self._lock:
+            if latency > self.target_latency:
+                self.value = max(self.minimum, self.value * 0.75)
+            else:
+                self.value = min(self.maximum, self.value + 1)
+
+    def on_error(self):
+        with self._lock:
+            self.value = max(self.minimum, self.value / 2)
+
+
+class _ThreadGate:
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.in_flight >= self.limit.current:
+                self._cond.wait(0.1)
+            self.in_flight += 1
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+
+class _AsyncGate:
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit.current)
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+
+def _retryable(exc):
+    status = getattr(exc, "status_code", None)
+    # client errors (bad model name, bad input) won't get better on retry
+    return status is None or status == 429 or status >= 500
+
+
+class EmbeddingClient:
+    def __init__(self, model=OLLAMA_MODEL, host=None, batch_size=EMBED_REQUEST_BATCH,
+                 min_concurrency=EMBED_MIN_CONCURRENCY, max_concurrency=EMBED_MAX_CONCURRENCY,
+                 target_latency=EMBED_TARGET_LATENCY, max_retries=EMBED_MAX_RETRIES,
+                 backoff_base=0.25):
+        self.model = model
+        self.host = host
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.limit = AdaptiveLimit(min_concurrency, max_concurrency, target_latency)
+        self._client = ollama.Client(host=host)
+        self._gate = _ThreadGate(self.limit)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "texts": 0, "retries": 0, "errors": 0}
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, n in deltas.items():
+                self.stats[key] += n
+
+    def _backoff(self, attempt):
+        return self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+
+    def _batches(self, texts):
+        return [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+    # ── sync ──
+    def _embed_batch(self, batch):
+        for attempt in range(self.max_retries + 1):
+            with self._gate:
+                start = time.perf_counter()
+                try:
+                    resp = self._client.embed(model=self.model, input=batch)
+                except Exception as exc:
+                    self.limit.on_error()
+                    self._count(requests=1, errors=1)
+                    if attempt == self.max_retries or not _retryable(exc):
+                        raise
+                else:
+                    self.limit.on_success(time.perf_counter() - start)
+                    self._count(requests=1, texts=len(batch))
+                    return list(resp["embeddings"])
+            self._count(retries=1)
+            time.sleep(self._backoff(attempt))
+
+    def embed(self, texts):
+        """Embed a list of texts; results are in input order."""
+        texts = list(texts)
+        results = self._executor.map(self._embed_batch, self._batches(texts))
+        return [vector for batch in results for vector in batch]
+
+    # ── async ──
+    async def _aembed_batch(self, client, gate, batch):
+        for attempt in range(self.max_retries + 1):
+            async with gate:
+                start = time.perf_counter()
+                try:
+                    resp = await client.embed(model=self.model, input=batch)
+                except Exception as exc:
+                    self.limit.on_error()
+                    self._count(requests=1, errors=1)
+                    if attempt == self.max_retries or not _retryable(exc):
+                        raise
+                else:
+                    self.limit.on_success(time.perf_counter() - start)
+                    self._count(requests=1, texts=len(batch))
+                    return list(resp["embeddings"])
+            self._count(retries=1)
+            await asyncio.sleep(self._backoff(attempt))
+
+    async def aembed(self, texts):
+        """Async version of embed(); shares the adaptive limit with sync callers."""
+        texts = list(texts)
+        client = ollama.AsyncClient(host=self.host)
+        gate = _AsyncGate(self.limit)
+        results = await asyncio.gather(
+            *(self._aembed_batch(client, gate, batch) for batch in self._batches(texts))
+        )
+        return [vector for batch in results for vector in batch]
+
+    def snapshot(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["concurrency"] = self.limit.current
+        return stats
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(model=OLLAMA_MODEL):
+    """Process-wide client per model (so the adaptive limit is shared)."""
+    with _clients_lock:
+        if model not in _clients:
+            _clients[model] = EmbeddingClient(model=model)
+        return _clients[model]
@@ -1,7 +1,12 @@
 # genAI.py
 import os
-import re
-from pdf_bot.queryChunks import get_top_k_chunks
+import time
+from pdf_bot.queryChunks import get_top_k_chunks, get_hybrid_chunks
+from pdf_bot.vector_index import max_distance_for
+from pdf_bot.db import connect_db
+from pdf_bot.embedding_cache import get_embedding
+from pdf_bot.answer_cache import get_answer_cache
+from pdf_bot.context_packer import pack_context, CONTEXT_TOKEN_BUDGET
 from openai import OpenAI
 from dotenv import load_dotenv
 from langchain_core.prompts import PromptTemplate
@@ -13,17 +18,17 @@ import pandas as pd
 load_dotenv()
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def connect_db():
-    """Used by tests (and can replace the inline connect in run_sql_query)."""
-    return psycopg2.connect(
-        dbname=os.getenv("LLM_SQL_DBNAME", "llm_sql_demo"),
-        user=os.getenv("DB_USER",        "postgres"),
-        password=os.getenv("DB_PASSWORD", "postgres"),
-        host=os.getenv("DB_HOST",        "localhost")
-    )
+# Adjust this threshold based on similarity scores you've tested. Embeddings
+# are unit length (Ollama's /api/embed), so it is a cosine similarity floor,
+# turned into a distance for VECTOR_METRIC.
+MIN_SIMILARITY = float(os.getenv("MIN_SIMILARITY", "0.5"))
+SIMILARITY_THRESHOLD = max_distance_for(MIN_SIMILARITY)
+
+# "hybrid" (vector + full-text, fused in SQL) or "vector"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
 
-# Adjust this threshold based on similarity scores you've tested
-SIMILARITY_THRESHOLD = 20.0
+# chunks retrieved per question; the context packer keeps what fits CONTEXT_TOKEN_BUDGET
+CONTEXT_CHUNKS = int(os.getenv("CONTEXT_CHUNKS", "6"))
 
 # 🎯 System prompt — includes adaptive tone instructions
 system_prompt_template = """
@@ -51,15 +56,11 @@ PDF Context:
 ---
 """
 
-def build_context_prompt(chunks, query):
-    formatted_chunks = []
-    for chunk in chunks:
-        content = chunk[0][:500]
-        meta = chunk[1]  # metadata dict
-        label = f"[{meta['source']} - chunk {meta['chunk_index']}]"
-        formatted_chunks.append(f"{label}\n{content}")
-    
-    context_block = "\n\n".join(formatted_chunks)
+def build_context_prompt(chunks, query, budget=CONTEXT_TOKEN_BUDGET):
+    """System prompt with `chunks` (best first) packed into at most `budget` context tokens."""
+    context_block, stats = pack_context(chunks, budget)
+    print(f"Context: {stats['tokens']} tokens from {stats['chunks']}/{len(chunks)} chunks "
+          f"in {stats['spans']} spans (budget {budget}{', truncated' if stats['truncated'] else ''})")
     return system_prompt_template.format(context=context_block)
 
 def ask_openai(system_prompt, user_query):
@@ -72,35 +73,108 @@ def ask_openai(system_prompt, user_query):
     )
     return response.choices[0].message.content.strip()
 
-def send_pdf_answer(query):
-    # 1) Semantic search
-    results = get_top_k_chunks(query, k=3)
-
-    # Debug: print scores
-    for r in results:
-        print(f"Score: {r[2]:.3f} | Preview: {r[0][:80]!r}")
-
-    # 2) Similarity filter
-    semantic_hits = [(r[0], r[1]) for r in results if r[2] < SIMILARITY_THRESHOLD]
-
-    # 3) If no semantic match, decline
-    if not semantic_hits:
-        return "I'm sorry, but I couldn't find anything in the documents related to that question."
-
-    # 4) Lexical overlap guard
-    #   extract query words of length >3 (to skip 'the', 'is', etc.)
-    query_terms = [w.lower() for w in re.findall(r"\w+", query) if len(w) > 3]
-    #   check if any term appears in any chunk
-    has_overlap = any(
-        any(term in chunk_text.lower() for term in query_terms)
-        for chunk_text, _ in semantic_hits
+def summarize_document(text):
+    """Short GPT-4o summary of the start of a document (shown after upload)."""
+    return client.chat.completions.create(
+        model="gpt-4o",
+        messages=[{
+            "role": "user",
+            "content": f"Please provide a concise summary (6–8 sentences) of:\n{text[:4000]}"
+        }]
+    ).choices[0].message.content
+
+def retrieve_chunks(query, k=3, mode=None, filters=None):
+    """
+    (content, metadata) chunks relevant to `query`, or [] if nothing is.
+    `filters` (sources, uploaded_after/before, tags) and the distance
+    threshold are applied in SQL.
+
+    "hybrid" fuses vector and full-text rankings: a chunk counts if it is
+    semantically close or shares a keyword with the query, but at least one
+    retrieved chunk must share a keyword (this replaces the old Python
+    substring guard). "vector" uses the distance threshold alone.
+    """
+    mode = mode or RETRIEVAL_MODE
+    if mode == "vector":
+        results = get_top_k_chunks(query, k=k, filters=filters, max_distance=SIMILARITY_THRESHOLD)
+        for r in results:
+            print(f"Score: {r[2]:.3f} | Preview: {r[0][:80]!r}")
+        return [(r[0], r[1]) for r in results]
+
+    results = get_hybrid_chunks(query, k=k, filters=filters, max_distance=SIMILARITY_THRESHOLD)
+    for content, _, score, distance, text_rank in results:
+        print(f"RRF: {score:.4f} | Distance: {distance:.3f} | Text rank: {text_rank or 0:.3f} | "
+              f"Preview: {content[:80]!r}")
+    if not any(r[4] is not None for r in results):
+        return []
+    return [(r[0], r[1]) for r in results]
+
+def ask_openai_stream(system_prompt, user_query):
+    """Like ask_openai, but yields the completion's text deltas as they arrive."""
+    stream = client.chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_query}
+        ],
+        stream=True,
     )
-    if not has_overlap:
-        return "I'm sorry, but I couldn't find anything in the documents related to that question."
-
-    # 5) Build prompt & call OpenAI
-    system_prompt = build_context_prompt(semantic_hits, query)
-    return ask_openai(system_prompt, query)
+    for event in stream:
+        if event.choices and event.choices[0].delta.content:
+            yield event.choices[0].delta.content
+
+def stream_pdf_answer(query, filters=None):
+    """
+    Yield the answer to `query` piece by piece as the model produces it.
+    Cached answers and declines arrive as a single piece. Time to first
+    token (from the question, and from the model request) is printed.
+    """
+    start = time.perf_counter()
+    answers = get_answer_cache()
+
+    # 1) Near-identical question answered recently, over the same filters?
+    #    (the embedding is reused by retrieval)
+    query_embedding = get_embedding(query)
+    cached = answers.lookup(query_embedding, scope=filters)
+    if cached is not None:
+        print(f"Answer cache hit: {1000 * (time.perf_counter() - start):.0f} ms")
+        yield cached
+        return
+
+    # 2) Hybrid (or vector-only) retrieval with the relevance gate
+    hits = retrieve_chunks(query, k=CONTEXT_CHUNKS, filters=filters)
+
+    # 3) If nothing relevant, decline (not cached: a new upload may answer it)
+    if not hits:
+        yield "I'm sorry, but I couldn't find anything in the documents related to that question."
+        return
+
+    # 4) Build prompt & stream from OpenAI
+    system_prompt = build_context_prompt(hits, query)
+    requested = time.perf_counter()
+    parts = []
+    for delta in ask_openai_stream(system_prompt, query):
+        if not parts:
+            now = time.perf_counter()
+            print(f"Time to first token: {1000 * (now - start):.0f} ms "
+                  f"({1000 * (now - requested):.0f} ms after the model request)")
+        parts.append(delta)
+        yield delta
+
+    # only a completed answer is cached (a consumer may stop iterating early)
+    answer = "".join(parts).strip()
+    print(f"Answer complete: {1000 * (time.perf_counter() - start):.0f} ms, {len(parts)} chunks")
+    answers.store(query, query_embedding, answer, {meta["source"] for _, meta in hits},
+                  time.perf_counter() - start, scope=filters)
+
+def send_pdf_answer(query, stream=False, filters=None):
+    """
+    The answer to `query`; with `stream=True`, a generator of text pieces
+    instead. `filters` restrict retrieval (see queryChunks.chunk_filter).
+    """
+    if stream:
+        return stream_pdf_answer(query, filters)
+    return "".join(stream_pdf_answer(query, filters)).strip()
 
 # ─── NL→SQL Setup (LangChain PromptTemplate) ─────────────────────────────
 # template_str = open("prompt_template.sql.j2").read()
@@ -1,29 +1,37 @@
 # generate_embeddings.py
+import argparse
 import os
-import numpy as np
-from .pdf_utils import extract_text_from_pdf, chunk_text, add_metadata_to_chunks
-from sklearn.metrics.pairwise import cosine_similarity
-import ollama
+from pathlib import Path
+from .pipeline import iter_parsed_pdfs, INGEST_WORKERS
+from .embedding_cache import get_embedding, get_embeddings
+from .local_index import VectorIndex
 
 OLLAMA_MODEL = "mxbai-embed-large"
 
-def get_embeddings_from_folder(folder_path):
+# on-disk index for the no-Postgres path (local / edge deployments)
+LOCAL_INDEX_PATH = os.getenv(
+    "LOCAL_INDEX_PATH",
+    os.path.join(os.path.dirname(__file__), ".cache", "local_index"),
+)
+
+def get_embeddings_from_folder(folder_path, workers=INGEST_WORKERS):
     all_documents = []
 
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".pdf"):
-            full_path = os.path.join(folder_path, filename)
-            raw_text = extract_text_from_pdf(full_path)
-            chunks = chunk_text(raw_text)
-            documents = add_metadata_to_chunks(chunks, full_path)
-            all_documents.extend(documents)
+    pdf_paths = [
+        os.path.join(folder_path, filename)
+        for filename in os.listdir(folder_path)
+        if filename.endswith(".pdf")
+    ]
+    # parse/chunk in worker processes; a corrupt PDF is reported and skipped
+    for result in iter_parsed_pdfs(pdf_paths, workers):
+        if result["error"]:
+            print(f"Skipping {result['path']}: {result['error']}")
+            continue
+        all_documents.extend(result["documents"])
 
     texts = [doc["content"] for doc in all_documents]
     
-    embeddings = []
-    for text in texts:
-        response = ollama.embeddings(model=OLLAMA_MODEL, prompt=text)
-        embeddings.append(response["embedding"])
+    embeddings = get_embeddings(texts, OLLAMA_MODEL)
 
     embedded_documents = []
     for i, doc in enumerate(all_documents):
@@ -35,12 +43,56 @@ def get_embeddings_from_folder(folder_path):
 
     return embedded_documents, None  # model is not needed with Ollama
 
+def build_local_index(folder_path, index_path=LOCAL_INDEX_PATH, workers=INGEST_WORKERS):
+    """
+    Sync a folder of PDFs into the on-disk VectorIndex: changed or new files
+    are re-chunked and re-embedded, deleted ones dropped, unchanged ones kept.
+    """
+    index = VectorIndex.load(index_path) if VectorIndex.exists(index_path) else VectorIndex()
+    paths = {
+        filename: os.path.join(folder_path, filename)
+        for filename in os.listdir(folder_path)
+        if filename.endswith(".pdf")
+    }
+    for source in set(index.sources) - set(paths):
+        index.remove_source(source)
+
+    skip_hashes = {path: index.sources.get(filename) for filename, path in paths.items()}
+    for result in iter_parsed_pdfs(list(paths.values()), workers, skip_hashes):
+        if result["error"]:
+            print(f"Skipping {result['path']}: {result['error']}")
+            continue
+        if result["documents"] is None:
+            continue  # unchanged since the last build
+        source = Path(result["path"]).name
+        index.remove_source(source)
+        documents = result["documents"]
+        embeddings = get_embeddings([doc["content"] for doc in documents], OLLAMA_MODEL)
+        index.add(embeddings, documents, source=source, doc_hash=result["doc_hash"])
+
+    index.save(index_path)
+    return index
+
 def find_relevant_chunks(query, embedded_documents, model=None, k=4):
-    response = ollama.embeddings(model=OLLAMA_MODEL, prompt=query)
-    query_embedding = np.array(response["embedding"])
-    
-    doc_embeddings = [np.array(doc["embedding"]) for doc in embedded_documents]
-    scores = cosine_similarity([query_embedding], doc_embeddings)[0]
-    
-    top_k = sorted(zip(scores, embedded_documents), reverse=True)[:k]
-    return [doc for _, doc in top_k]
\ No newline at end of file
+    """Top-k documents for `query`; pass a VectorIndex to avoid rebuilding one per call."""
+    if isinstance(embedded_documents, VectorIndex):
+        index = embedded_documents
+    else:
+        index = VectorIndex.from_documents(embedded_documents)
+    query_embedding = get_embedding(query, OLLAMA_MODEL)
+    return [doc for _, doc in index.search(query_embedding, k)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build / query the local (no-Postgres) vector index.")
+    parser.add_argument("folder", help="folder of PDFs to index")
+    parser.add_argument("--index-path", default=LOCAL_INDEX_PATH)
+    parser.add_argument("--query", help="print the top chunks for this question after building")
+    parser.add_argument("-k", type=int, default=4)
+    args = parser.parse_args()
+
+    index = build_local_index(args.folder, args.index_path)
+    print(f"Local index: {len(index)} chunks from {len(index.sources)} PDFs at {args.index_path}")
+    if args.query:
+        for doc in find_relevant_chunks(args.query, index, k=args.k):
+            print(f"- [{doc['metadata']['source']}] {doc['content'][:200]}")
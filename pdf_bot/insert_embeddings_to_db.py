@@ -1,69 +1,291 @@
 # insert_embeddings_to_db.py
-import os, json, psycopg2, ollama
+import os, json, time
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv, find_dotenv
-from .pdf_utils import extract_text_from_pdf, chunk_text, add_metadata_to_chunks
+from pathlib import Path
+from .pdf_utils import (
+    sha256_text, sha256_file, iter_pdf_pages, iter_chunks, iter_documents,
+)
+from .embedding_cache import get_embeddings
+from .db import connect_db
+from .answer_cache import invalidate_source
+from .pipeline import batched, prefetch, iter_parsed_pdfs, INGEST_WORKERS
+from .vector_adapter import (
+    Vector, copy_binary, encode_text, encode_jsonb, encode_vector, encode_halfvec, encode_int4,
+)
+from .vector_index import EMBEDDING_STORAGE
 
 load_dotenv(find_dotenv())
 
-# PG connection
-def connect_db():
-    return psycopg2.connect(
-        dbname=os.getenv("LLM_SQL_DBNAME", "llm_sql_demo"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD", "postgres"),
-        host=os.getenv("DB_HOST", "localhost")
-    )
+# ─── documents: one row per source file; chunks cascade on delete ──────────
+def upsert_document(cur, source, doc_hash=None):
+    """Id of the documents row for `source`, creating it if needed (and recording doc_hash if given)."""
+    cur.execute("""
+        INSERT INTO documents (source, doc_hash) VALUES (%s, %s)
+        ON CONFLICT (source) DO UPDATE
+            SET doc_hash    = COALESCE(EXCLUDED.doc_hash, documents.doc_hash),
+                uploaded_at = CASE WHEN EXCLUDED.doc_hash IS NULL
+                                   THEN documents.uploaded_at ELSE NOW() END
+        RETURNING id
+    """, (source, doc_hash))
+    return cur.fetchone()[0]
+
+
+def delete_document(conn, source):
+    """Remove a source and (via ON DELETE CASCADE) all of its chunks. Returns True if it existed."""
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM documents WHERE source = %s", (source,))
+        deleted = cur.rowcount > 0
+    conn.commit()
+    invalidate_source(source)
+    return deleted
 
 
 def insert_document_chunk(conn, content, metadata, embedding):
     with conn.cursor() as cur:
+        document_id = upsert_document(cur, metadata["source"])
         cur.execute("""
-            INSERT INTO document_chunks (content, metadata, embedding)
-            VALUES (%s, %s, %s)
-        """, (content, json.dumps(metadata), embedding))
+            INSERT INTO document_chunks (document_id, content, metadata, embedding)
+            VALUES (%s, %s, %s, %s)
+        """, (document_id, content, json.dumps(metadata), Vector(embedding)))
     conn.commit()
 
+
+# Rows per INSERT statement (or per COPY buffer flush) for bulk loads
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+
+
+_COPY_COLUMNS = ("content", "metadata", "embedding", "doc_hash", "chunk_hash", "document_id")
+_COPY_ENCODERS = (encode_text, encode_jsonb,
+                  encode_halfvec if EMBEDDING_STORAGE == "halfvec" else encode_vector,
+                  encode_text, encode_text, encode_int4)
+
+
+def _copy_rows(cur, rows, batch_size):
+    """COPY rows in binary format (vectors travel as float4, not text), `batch_size` rows per COPY."""
+    for batch in batched(rows, batch_size):
+        copy_binary(cur, "document_chunks", _COPY_COLUMNS, _COPY_ENCODERS, batch)
+
+
+def _write_rows(cur, rows, method, batch_size):
+    if method == "copy":
+        _copy_rows(cur, rows, batch_size)
+    elif method == "values":
+        execute_values(
+            cur,
+            "INSERT INTO document_chunks "
+            "(content, metadata, embedding, doc_hash, chunk_hash, document_id) VALUES %s",
+            [(c, json.dumps(m), Vector(e), dh, ch, d) for c, m, e, dh, ch, d in rows],
+            page_size=batch_size,
+        )
+    else:
+        raise ValueError(f"Unknown bulk insert method: {method!r}")
+
+
+def _report(rows, seconds, method):
+    stats = {
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else float("inf"),
+    }
+    print(f"Bulk inserted {rows} chunks via {method} "
+          f"in {seconds:.2f}s ({stats['rows_per_sec']:.0f} rows/s)")
+    return stats
+
+
+def insert_document_chunks(conn, documents, embeddings, batch_size=BULK_BATCH_SIZE, method="copy",
+                           doc_hash=None, replace_source=None):
+    """
+    Bulk-insert a document's chunks in ONE transaction.
+
+    `documents` are the dicts from add_metadata_to_chunks and `embeddings` the
+    matching vectors. `method` is "copy" (binary COPY FROM STDIN) or "values"
+    (multi-row INSERT, `batch_size` rows per statement). Every row is stamped
+    with `doc_hash` and the sha256 of its content; if `replace_source` is set,
+    that source's existing rows are deleted in the same transaction (and its
+    cached answers dropped after commit). Returns a stats dict with rows,
+    seconds and rows_per_sec.
+    """
+    if not documents and replace_source is None:
+        return _report(0, 0.0, method)
+    source = replace_source or documents[0]["metadata"]["source"]
+    start = time.perf_counter()
+    try:
+        with conn.cursor() as cur:
+            document_id = upsert_document(cur, source, doc_hash)
+            if replace_source is not None:
+                cur.execute("DELETE FROM document_chunks WHERE document_id = %s", (document_id,))
+            rows = [
+                (doc["content"], doc["metadata"], emb, doc_hash, sha256_text(doc["content"]), document_id)
+                for doc, emb in zip(documents, embeddings)
+            ]
+            _write_rows(cur, rows, method, batch_size)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if replace_source is not None:
+        invalidate_source(source)
+    return _report(len(rows), time.perf_counter() - start, method)
+
+# ─── Incremental (content-addressed) indexing ──────────────────────────────
+def indexed_doc_hashes(conn, sources):
+    """Map each source file name to the doc_hash it was last indexed with (or None)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT s, d.doc_hash
+            FROM unnest(%s::text[]) AS s
+            LEFT JOIN documents d ON d.source = s
+        """, (list(sources),))
+        return dict(cur.fetchall())
+
+
+def indexed_chunk_embeddings(conn, source, chunk_hashes=None):
+    """
+    Existing {chunk_hash: embedding} for a source, so unchanged chunks aren't
+    re-embedded. Pass `chunk_hashes` to fetch only those.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.chunk_hash, c.embedding::text
+            FROM document_chunks c
+            JOIN documents d ON d.id = c.document_id
+            WHERE d.source = %s AND c.chunk_hash IS NOT NULL
+              AND (%s::text[] IS NULL OR c.chunk_hash = ANY(%s::text[]))
+        """, (source, chunk_hashes, chunk_hashes))
+        return {h: json.loads(e) for h, e in cur.fetchall()}
+
+
+# ─── Streaming extract → chunk → embed → insert ─────────────────────────────
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+
+def _embed_stage(batches, source, model_name, counters):
+    """
+    Embed each batch of documents, reusing vectors already stored for the same
+    chunk text. Uses its own connection: the insert stage's uncommitted
+    DELETE is invisible here, so the old rows stay readable until it commits.
+    """
+    lookup = connect_db()
+    try:
+        for batch in batches:
+            hashes = [sha256_text(doc["content"]) for doc in batch]
+            known = indexed_chunk_embeddings(lookup, source, hashes)
+            missing = [i for i, h in enumerate(hashes) if h not in known]
+            fresh = dict(zip(missing, get_embeddings([batch[i]["content"] for i in missing], model_name)))
+            counters["embedded"] += len(missing)
+            yield [
+                (doc, known[h] if i not in fresh else fresh[i], h)
+                for i, (doc, h) in enumerate(zip(batch, hashes))
+            ]
+    finally:
+        lookup.close()
+
+
+def store_documents(conn, source, documents, doc_hash=None, model_name="mxbai-embed-large",
+                    embed_batch_size=EMBED_BATCH_SIZE, db_batch_size=BULK_BATCH_SIZE,
+                    queue_size=PIPELINE_QUEUE_SIZE, on_batch=None):
+    """
+    Replace `source`'s chunks with `documents` (any iterable of chunk dicts),
+    embedding in a background stage while earlier batches are COPYed.
+
+    At most `queue_size` batches wait between stages, so memory does not grow
+    with the document. The old rows are deleted and the new ones written in a
+    single transaction, so readers see either the old or the new version.
+    `on_batch(rows_written)` is called after every DB batch.
+    """
+    counters = {"embedded": 0}
+    doc_batches = prefetch(batched(documents, embed_batch_size), queue_size)
+    embedded = prefetch(_embed_stage(doc_batches, source, model_name, counters), queue_size)
+
+    written = 0
+    start = time.perf_counter()
+    try:
+        with conn.cursor() as cur:
+            document_id = upsert_document(cur, source, doc_hash)
+            cur.execute("DELETE FROM document_chunks WHERE document_id = %s", (document_id,))
+            for db_batch in batched((row for batch in embedded for row in batch), db_batch_size):
+                rows = [(doc["content"], doc["metadata"], emb, doc_hash, h, document_id)
+                        for doc, emb, h in db_batch]
+                _copy_rows(cur, rows, db_batch_size)
+                written += len(rows)
+                if on_batch:
+                    on_batch(written)
+        conn.commit()
+        invalidate_source(source)
+    except Exception:
+        conn.rollback()
+        raise
+    stats = _report(written, time.perf_counter() - start, "streaming copy")
+    stats["embedded"] = counters["embedded"]
+    return stats
+
+
+def stream_pdf_to_db(conn, pdf_path, doc_hash=None, model_name="mxbai-embed-large", **kwargs):
+    """
+    Replace one PDF's chunks through a bounded, overlapping pipeline:
+    pages → chunks → embedding batches → COPY batches.
+    Extraction/chunking runs in its own thread ahead of store_documents.
+    """
+    documents = iter_documents(iter_chunks(iter_pdf_pages(pdf_path)), pdf_path)
+    return store_documents(conn, Path(pdf_path).name, documents, doc_hash, model_name, **kwargs)
+
+
+def reindex_pdf(conn, pdf_path, doc_hash, model_name="mxbai-embed-large", batch_size=BULK_BATCH_SIZE):
+    """
+    Replace a PDF's chunks, re-embedding only chunks whose text is new.
+    Returns (number_of_chunks, number_embedded).
+    """
+    stats = stream_pdf_to_db(conn, pdf_path, doc_hash, model_name, db_batch_size=batch_size)
+    return stats["rows"], stats["embedded"]
+
+
 # Main ETL
-def embed_and_store_pdfs(folder_path, model_name="mxbai-embed-large"):
+def embed_and_store_pdfs(folder_path, model_name="mxbai-embed-large", batch_size=BULK_BATCH_SIZE,
+                         workers=INGEST_WORKERS):
+    """
+    (Re)index every changed PDF in a folder. Hashing, extraction and chunking
+    fan out over `workers` processes; parsed files stream back to a single
+    embed/insert stage. A file that fails to parse is reported and skipped.
+    """
     conn = connect_db()
-    all_documents = []
-
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".pdf"):
-            full_path = os.path.join(folder_path, filename)
-            raw_text = extract_text_from_pdf(full_path)
-            chunks = chunk_text(raw_text)
-            documents = add_metadata_to_chunks(chunks, full_path)
-            all_documents.extend(documents)
-
-    for doc in all_documents:
-        content = doc["content"]
-        metadata = doc["metadata"]
-        response = ollama.embeddings(model=model_name, prompt=content)
-        embedding = response["embedding"]
-        insert_document_chunk(conn, content, metadata, embedding)
+    paths = {
+        filename: os.path.join(folder_path, filename)
+        for filename in os.listdir(folder_path)
+        if filename.endswith(".pdf")
+    }
+    indexed = indexed_doc_hashes(conn, paths)
+    skip_hashes = {path: indexed.get(filename) for filename, path in paths.items()}
+    total = embedded = skipped = failed = 0
 
-    conn.close()
-    print(f"Inserted {len(all_documents)} chunks into PostgreSQL!")
+    for result in iter_parsed_pdfs(list(paths.values()), workers, skip_hashes):
+        if result["error"]:
+            failed += 1
+            print(f"Skipping {result['path']}: {result['error']}")
+            continue
+        if result["documents"] is None:
+            skipped += 1
+            continue
+        stats = store_documents(conn, Path(result["path"]).name, result["documents"],
+                                result["doc_hash"], model_name, db_batch_size=batch_size)
+        total += stats["rows"]
+        embedded += stats["embedded"]
 
+    conn.close()
+    print(f"Inserted {total} chunks into PostgreSQL "
+          f"({embedded} newly embedded, {skipped} unchanged PDFs skipped, {failed} failed)!")
 
-    # insert_embeddings_to_db.py  (append at bottom)
 
-def embed_and_store_pdf(pdf_path, model_name="mxbai-embed-large"):
+def embed_and_store_pdf(pdf_path, model_name="mxbai-embed-large", doc_hash=None):
     """
     Extracts, chunks, embeds and inserts ONE PDF into your document_chunks table.
+    Does nothing if the file's content hash matches what is already indexed.
     """
     conn = connect_db()
-    # extract & chunk
-    raw_text = extract_text_from_pdf(pdf_path)
-    chunks = chunk_text(raw_text)
-    documents = add_metadata_to_chunks(chunks, pdf_path)
-    # embed & insert
-    for doc in documents:
-        content, metadata = doc["content"], doc["metadata"]
-        resp = ollama.embeddings(model=model_name, prompt=content)
-        embedding = resp["embedding"]
-        insert_document_chunk(conn, content, metadata, embedding)
+    doc_hash = doc_hash or sha256_file(pdf_path)
+    if indexed_doc_hashes(conn, [Path(pdf_path).name]).get(Path(pdf_path).name) != doc_hash:
+        reindex_pdf(conn, pdf_path, doc_hash, model_name)
     conn.close()
 
 
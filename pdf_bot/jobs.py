@@ -0,0 +1,270 @@
+# jobs.py
+"""
+Background PDF ingestion backed by the ingest_jobs table.
+
+The UI only enqueues a job and polls its status; a worker (a daemon thread in
+the Streamlit process, or `python -m pdf_bot.jobs` on its own) claims queued
+jobs, commits chunks in batches together with a `chunks_done` checkpoint, and
+resumes from that checkpoint if a job's worker died mid-way. A job that fails
+has its partial chunks deleted and is retried from scratch after
+JOB_RETRY_SECONDS * attempts, up to JOB_MAX_ATTEMPTS attempts in all. A
+cancelled job (its PDF was deleted) is never claimed again; a worker running
+it notices at its next checkpoint and stops. Database errors do not stop the
+worker: it reconnects and carries on after JOB_POLL_SECONDS.
+"""
+import os
+import threading
+from itertools import islice
+from pathlib import Path
+
+from .db import connect_db
+from .answer_cache import invalidate_source
+from .insert_embeddings_to_db import upsert_document, _copy_rows, _embed_stage, EMBED_BATCH_SIZE
+from .pdf_utils import iter_pdf_pages, iter_chunks, iter_documents, extract_text_head
+from .pipeline import batched, prefetch
+
+OLLAMA_MODEL = "mxbai-embed-large"
+
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "200"))          # chunks per checkpoint
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "300"))    # running but silent → reclaim
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_SECONDS = int(os.getenv("JOB_RETRY_SECONDS", "60"))     # times attempts so far
+
+
+def enqueue_job(conn, pdf_path, doc_hash):
+    """Queue a PDF for ingestion; returns the id of the new (or already pending) job."""
+    source = Path(pdf_path).name
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT id, status FROM ingest_jobs
+            WHERE source = %s AND doc_hash = %s
+              AND (status IN ('queued', 'running') OR (status = 'failed' AND attempts < %s))
+            ORDER BY id DESC LIMIT 1
+        """, (source, doc_hash, JOB_MAX_ATTEMPTS))
+        row = cur.fetchone()
+        if row is not None and row[1] == "failed":
+            # uploaded again while waiting for a retry: retry now
+            cur.execute("UPDATE ingest_jobs SET status = 'queued', updated_at = NOW() WHERE id = %s",
+                        (row[0],))
+        if row is None:
+            cur.execute("""
+                INSERT INTO ingest_jobs (source, path, doc_hash)
+                VALUES (%s, %s, %s) RETURNING id
+            """, (source, str(pdf_path), doc_hash))
+            row = cur.fetchone()
+    conn.commit()
+    return row[0]
+
+
+def _discard_partial(cur, job_id):
+    """Delete chunks a job wrote for a version of its document that never became current."""
+    cur.execute("""
+        DELETE FROM document_chunks c
+        USING ingest_jobs j, documents d
+        WHERE j.id = %s AND d.source = j.source AND c.document_id = d.id
+          AND c.doc_hash = j.doc_hash AND d.doc_hash IS DISTINCT FROM j.doc_hash
+    """, (job_id,))
+
+
+def _still_running(cur, job_id):
+    """Lock the job's row until commit; False once it has been cancelled (or taken off 'running')."""
+    cur.execute("SELECT status FROM ingest_jobs WHERE id = %s FOR UPDATE", (job_id,))
+    row = cur.fetchone()
+    return row is not None and row[0] == "running"
+
+
+def claim_job(conn, stale_seconds=JOB_STALE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS,
+              retry_seconds=JOB_RETRY_SECONDS):
+    """
+    Atomically take the oldest queued job, a running one whose worker went
+    quiet, or a failed one that is due for another attempt. Done and
+    cancelled jobs are never taken.
+    """
+    params = {"stale": stale_seconds, "max_attempts": max_attempts, "retry": retry_seconds}
+    with conn.cursor() as cur:
+        # workers keep dying on these: give up rather than reclaim them forever
+        cur.execute("""
+            UPDATE ingest_jobs
+            SET status = 'failed', error = 'worker stopped responding', chunks_done = 0,
+                updated_at = NOW()
+            WHERE status = 'running' AND attempts >= %(max_attempts)s
+              AND updated_at < NOW() - %(stale)s * INTERVAL '1 second'
+            RETURNING id
+        """, params)
+        for (job_id,) in cur.fetchall():
+            _discard_partial(cur, job_id)
+        cur.execute("""
+            UPDATE ingest_jobs
+            SET status = 'running', attempts = attempts + 1, error = NULL, updated_at = NOW()
+            WHERE id = (
+                SELECT id FROM ingest_jobs
+                WHERE status = 'queued'
+                   OR (status = 'running' AND updated_at < NOW() - %(stale)s * INTERVAL '1 second')
+                   OR (status = 'failed' AND attempts < %(max_attempts)s
+                       AND updated_at < NOW() - %(retry)s * attempts * INTERVAL '1 second')
+                ORDER BY id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING id, source, path, doc_hash, chunks_done
+        """, params)
+        row = cur.fetchone()
+    conn.commit()
+    if row is None:
+        return None
+    return dict(zip(("id", "source", "path", "doc_hash", "chunks_done"), row))
+
+
+def run_job(conn, job, model_name=OLLAMA_MODEL, batch_size=JOB_BATCH_SIZE):
+    """
+    Ingest one claimed job, committing every `batch_size` chunks with its checkpoint.
+
+    New rows carry the new doc_hash; the previous version of the document is
+    only removed (and documents.doc_hash updated) once every chunk is in, so
+    search keeps working meanwhile. On failure the new rows are deleted again
+    and the job is marked failed with its checkpoint reset, so claim_job's
+    retry starts over. Every checkpoint first locks the job's row; if the job
+    was cancelled meanwhile, its uncommitted batch is dropped and it returns.
+    """
+    source, done = job["source"], job["chunks_done"]
+    try:
+        with conn.cursor() as cur:
+            if not _still_running(cur, job["id"]):
+                conn.rollback()
+                return
+            document_id = upsert_document(cur, source)
+            # anything past the checkpoint belongs to a batch that never committed
+            cur.execute("""
+                DELETE FROM document_chunks
+                WHERE document_id = %s AND doc_hash = %s
+                  AND (metadata->>'chunk_index')::int >= %s
+            """, (document_id, job["doc_hash"], done))
+        conn.commit()
+
+        documents = iter_documents(iter_chunks(iter_pdf_pages(job["path"])), job["path"])
+        documents = islice(documents, done, None)  # skip what is already stored
+        counters = {"embedded": 0}
+        doc_batches = prefetch(batched(documents, EMBED_BATCH_SIZE))
+        embedded = prefetch(_embed_stage(doc_batches, source, model_name, counters))
+
+        for db_batch in batched((row for batch in embedded for row in batch), batch_size):
+            rows = [(doc["content"], doc["metadata"], emb, job["doc_hash"], h, document_id)
+                    for doc, emb, h in db_batch]
+            with conn.cursor() as cur:
+                if not _still_running(cur, job["id"]):
+                    conn.rollback()
+                    print(f"Ingest job {job['id']} ({source}) cancelled after {done} chunks")
+                    return
+                _copy_rows(cur, rows, batch_size)
+                done += len(rows)
+                cur.execute("""
+                    UPDATE ingest_jobs SET chunks_done = %s, updated_at = NOW() WHERE id = %s
+                """, (done, job["id"]))
+            conn.commit()
+
+        # local import: genAI pulls in the OpenAI client, which the CLI worker may not need
+        from .genAI import summarize_document
+        summary = summarize_document(extract_text_head(job["path"], 4000))
+        with conn.cursor() as cur:
+            if not _still_running(cur, job["id"]):
+                conn.rollback()
+                return
+            cur.execute("""
+                DELETE FROM document_chunks
+                WHERE document_id = %s AND doc_hash IS DISTINCT FROM %s
+            """, (document_id, job["doc_hash"]))
+            upsert_document(cur, source, job["doc_hash"])
+            cur.execute("""
+                UPDATE ingest_jobs SET status = 'done', summary = %s, updated_at = NOW()
+                WHERE id = %s
+            """, (summary, job["id"]))
+        conn.commit()
+        invalidate_source(source)
+    except Exception as e:
+        conn.rollback()
+        with conn.cursor() as cur:
+            _discard_partial(cur, job["id"])
+            cur.execute("""
+                UPDATE ingest_jobs SET status = 'failed', error = %s, chunks_done = 0, updated_at = NOW()
+                WHERE id = %s AND status = 'running'
+            """, (f"{type(e).__name__}: {e}", job["id"]))
+        conn.commit()
+
+
+def cancel_jobs(conn, source):
+    """
+    Cancel a source's unfinished jobs (e.g. when its PDF is deleted). Waits
+    for a running job's current checkpoint to commit; the job stops at its next one.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE ingest_jobs SET status = 'cancelled', updated_at = NOW()
+            WHERE source = %s AND status IN ('queued', 'running', 'failed')
+        """, (source,))
+    conn.commit()
+
+
+def job_statuses(conn, limit=20):
+    """Most recent jobs, newest first, as dicts for the UI."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT id, source, status, chunks_done, attempts, error, summary, updated_at
+            FROM ingest_jobs ORDER BY id DESC LIMIT %s
+        """, (limit,))
+        cols = [d[0] for d in cur.description]
+        return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+
+def _close_quietly(conn):
+    if conn is None:
+        return
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def work_forever(stop_event=None, poll_seconds=JOB_POLL_SECONDS):
+    """Claim and run jobs until `stop_event` is set; on a database error, reconnect and go on."""
+    stop_event = stop_event or threading.Event()
+    conn = None
+    try:
+        while not stop_event.is_set():
+            try:
+                if conn is None:
+                    conn = connect_db()
+                job = claim_job(conn)
+                if job is None:
+                    stop_event.wait(poll_seconds)
+                    continue
+                run_job(conn, job)
+            except Exception as e:
+                print(f"Ingest worker error, reconnecting in {poll_seconds:g}s: {type(e).__name__}: {e}")
+                _close_quietly(conn)
+                conn = None
+                stop_event.wait(poll_seconds)
+    finally:
+        _close_quietly(conn)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker():
+    """Start the in-process worker thread once (safe to call on every Streamlit rerun)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=work_forever, name="ingest-worker", daemon=True)
+            _worker.start()
+        return _worker
+
+
+if __name__ == "__main__":
+    print("Ingest worker started; Ctrl+C to stop.")
+    try:
+        work_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,244 @@
+# local_index.py
+"""
+In-process cosine-similarity index for running without Postgres.
+
+Vectors live in one contiguous, pre-normalised float32 matrix, so a query is
+a single matrix-vector product followed by an `argpartition` top-k. An index
+is saved as plain `.npy` files; `VectorIndex.load` memory-maps them, so a
+large corpus opens instantly and processes reading the same files share the
+OS page cache. The first add/remove after a mapped load copies the matrix
+into memory; the files on disk only change on `save`.
+
+    <path>/meta.json                    dim, next id, rows, source -> doc_hash, version
+    <path>/v<version>/vectors.npy       float32 (rows, dim), L2-normalised
+    <path>/v<version>/ids.npy           int64 (rows,)
+    <path>/v<version>/documents.jsonl   one {"content", "metadata"} object per row
+
+`save` writes a new version directory and then atomically replaces
+meta.json, which names it; a load therefore sees the old or the new index,
+never a mix. The previous version is kept for readers that opened it.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+
+_DATA_FILES = ("vectors.npy", "ids.npy", "documents.jsonl")
+# versions left on disk after a save (the new one and the one before it)
+KEEP_VERSIONS = 2
+
+
+def _normalise(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0  # leave all-zero vectors as they are
+    return vectors / norms
+
+
+class VectorIndex:
+    def __init__(self, dim=None):
+        self.dim = dim
+        self.sources = {}                  # source file -> doc_hash it was indexed from
+        self._vectors = np.empty((0, dim or 0), dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._n = 0
+        self._documents = []               # row-aligned; None until a mapped index needs them
+        self._documents_path = None
+        self._rows = None                  # id -> row, built on first remove
+        self._next_id = 0
+        self._mapped = False
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def vectors(self):
+        """The live (rows, dim) matrix; a read-only view if memory-mapped."""
+        return self._vectors[:self._n]
+
+    @property
+    def documents(self):
+        if self._documents is None:
+            with open(self._documents_path, encoding="utf-8") as f:
+                documents = [json.loads(line) for line in f]
+            if len(documents) != self._n:
+                raise ValueError(f"{self._documents_path} has {len(documents)} rows, "
+                                 f"the index {self._n}")
+            self._documents = documents
+        return self._documents
+
+    # ── growth / mutation ──
+    def _reserve(self, extra):
+        """Make room for `extra` more rows, copying a mapped matrix into memory first."""
+        needed = self._n + extra
+        capacity = self._vectors.shape[0]
+        if needed <= capacity and not self._mapped:
+            return
+        capacity = max(needed, 2 * capacity, 1024) if needed > capacity else capacity
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:self._n] = self._vectors[:self._n]
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[:self._n] = self._ids[:self._n]
+        self._vectors, self._ids, self._mapped = vectors, ids, False
+
+    def _row_of(self):
+        if self._rows is None:
+            self._rows = {int(i): row for row, i in enumerate(self._ids[:self._n])}
+        return self._rows
+
+    def add(self, embeddings, documents, source=None, doc_hash=None):
+        """Append vectors with their documents; returns the new ids."""
+        vectors = _normalise(np.atleast_2d(embeddings))
+        documents = list(documents)
+        if len(vectors) != len(documents):
+            raise ValueError(f"{len(vectors)} embeddings for {len(documents)} documents")
+        if not len(vectors):
+            return []
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._vectors = np.empty((0, self.dim), dtype=np.float32)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim}-d embeddings, got {vectors.shape[1]}-d")
+
+        self.documents.extend(documents)  # loads a mapped index's documents first
+        self._reserve(len(vectors))
+        start, end = self._n, self._n + len(vectors)
+        ids = np.arange(self._next_id, self._next_id + len(vectors), dtype=np.int64)
+        self._vectors[start:end] = vectors
+        self._ids[start:end] = ids
+        if self._rows is not None:
+            self._rows.update((int(i), row) for row, i in enumerate(ids, start))
+        self._n, self._next_id = end, self._next_id + len(vectors)
+        if source is not None:
+            self.sources[source] = doc_hash
+        return ids.tolist()
+
+    def remove(self, ids):
+        """Drop rows by id (unknown ids are ignored); the last row fills each gap."""
+        rows = self._row_of()
+        documents = self.documents
+        targets = {rows[i] for i in map(int, ids) if i in rows}
+        if not targets:
+            return 0
+        self._reserve(0)
+        for row in sorted(targets, reverse=True):
+            last = self._n - 1
+            del rows[int(self._ids[row])]
+            if row != last:
+                moved = int(self._ids[last])
+                self._vectors[row] = self._vectors[last]
+                self._ids[row] = moved
+                documents[row] = documents[last]
+                rows[moved] = row
+            documents.pop()
+            self._n = last
+        return len(targets)
+
+    def remove_source(self, source):
+        """Drop every chunk of one source file."""
+        ids = [int(self._ids[row]) for row, doc in enumerate(self.documents)
+               if doc["metadata"].get("source") == source]
+        self.sources.pop(source, None)
+        return self.remove(ids)
+
+    # ── search ──
+    def _top_k(self, scores, k):
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def search(self, query, k=4):
+        """[(cosine similarity, document)] for the k nearest rows, best first."""
+        return self.search_batch([query], k)[0]
+
+    def search_batch(self, queries, k=4):
+        """search() for several queries with one matrix-matrix product."""
+        if not self._n:
+            return [[] for _ in queries]
+        scores = _normalise(np.atleast_2d(queries)) @ self.vectors.T
+        documents = self.documents
+        return [
+            [(float(row_scores[i]), documents[i]) for i in self._top_k(row_scores, k)]
+            for row_scores in scores
+        ]
+
+    # ── persistence ──
+    @classmethod
+    def from_documents(cls, embedded_documents):
+        """Build from get_embeddings_from_folder()-style dicts (each with an "embedding")."""
+        index = cls()
+        if embedded_documents:
+            index.add([doc["embedding"] for doc in embedded_documents], embedded_documents)
+        return index
+
+    def save(self, path):
+        """Write the index under `path` as a new version, then switch meta.json to it."""
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        version = _read_meta(path).get("version", 0) + 1 if os.path.exists(meta_path) else 1
+        directory = os.path.join(path, f"v{version}")
+        shutil.rmtree(directory, ignore_errors=True)  # left over from a save that crashed
+        os.makedirs(directory)
+        with open(os.path.join(directory, "vectors.npy"), "wb") as f:
+            np.save(f, np.ascontiguousarray(self.vectors))
+        with open(os.path.join(directory, "ids.npy"), "wb") as f:
+            np.save(f, self._ids[:self._n])
+        with open(os.path.join(directory, "documents.jsonl"), "w", encoding="utf-8") as f:
+            for doc in self.documents:
+                f.write(json.dumps({"content": doc["content"], "metadata": doc["metadata"]}) + "\n")
+        tmp = os.path.join(path, ".meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "next_id": self._next_id, "rows": self._n,
+                       "sources": self.sources, "version": version}, f)
+        os.replace(tmp, meta_path)
+        _prune(path, version)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Open a saved index; with `mmap` the vectors are mapped read-only, not
+        read. Raises ValueError if the files do not describe the same rows.
+        """
+        meta = _read_meta(path)
+        directory = _data_dir(path, meta)
+        index = cls(meta["dim"])
+        index.sources = meta["sources"]
+        index._next_id = meta["next_id"]
+        index._vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r" if mmap else None)
+        index._ids = np.load(os.path.join(directory, "ids.npy"))
+        index._n = len(index._ids)
+        if index._vectors.shape[0] != index._n or meta.get("rows", index._n) != index._n:
+            raise ValueError(f"inconsistent index at {directory}: {index._vectors.shape[0]} vectors, "
+                             f"{index._n} ids, meta.json says {meta.get('rows')} rows")
+        index._mapped = mmap
+        index._documents, index._documents_path = None, os.path.join(directory, "documents.jsonl")
+        return index
+
+    @staticmethod
+    def exists(path):
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return False
+        directory = _data_dir(path, _read_meta(path))
+        return all(os.path.exists(os.path.join(directory, name)) for name in _DATA_FILES)
+
+
+def _read_meta(path):
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _data_dir(path, meta):
+    """Directory holding the data files meta.json refers to (`path` itself for unversioned indexes)."""
+    return os.path.join(path, f"v{meta['version']}") if "version" in meta else path
+
+
+def _prune(path, version):
+    """Delete versions older than the last KEEP_VERSIONS, and an unversioned layout's data files."""
+    for name in os.listdir(path):
+        if name.startswith("v") and name[1:].isdigit() and int(name[1:]) <= version - KEEP_VERSIONS:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        elif name in _DATA_FILES and version >= KEEP_VERSIONS:
+            os.remove(os.path.join(path, name))
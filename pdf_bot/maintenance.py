@@ -0,0 +1,197 @@
+# maintenance.py
+"""
+Index lifecycle housekeeping for document_chunks.
+
+    python -m pdf_bot.maintenance [--reindex] [--dead-ratio 0.2]
+
+Brings a document_chunks table from before the documents table up to date
+(adds document_id, doc_hash and chunk_hash, backfills `documents` rows and
+chunk hashes), adds the search columns (full-text, source, tags) to older tables, scales
+embeddings from the unnormalised /api/embeddings era to unit length,
+VACUUM ANALYZEs the chunk tables, and rebuilds document_chunks' indexes
+(vector index included) when churn has left too many dead rows behind.
+"""
+import argparse
+import os
+
+from .db import connect_db
+
+REINDEX_DEAD_RATIO = float(os.getenv("REINDEX_DEAD_RATIO", "0.2"))
+
+
+def migrate_legacy_chunks(conn):
+    """
+    Add the documents table and the per-document chunk columns if missing,
+    attach chunks that have no document_id to a documents row for their
+    source, and hash chunk text written without one (embedding reuse looks
+    chunks up by hash).
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+              id          SERIAL PRIMARY KEY,
+              source      TEXT        NOT NULL UNIQUE,
+              doc_hash    TEXT,
+              uploaded_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """)
+        cur.execute("""
+            ALTER TABLE document_chunks
+                ADD COLUMN IF NOT EXISTS document_id INT REFERENCES documents(id) ON DELETE CASCADE,
+                ADD COLUMN IF NOT EXISTS doc_hash    TEXT,
+                ADD COLUMN IF NOT EXISTS chunk_hash  TEXT
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS document_chunks_document_idx
+                ON document_chunks (document_id, chunk_hash)
+        """)
+        cur.execute("""
+            INSERT INTO documents (source, doc_hash)
+            SELECT metadata->>'source', MAX(doc_hash)
+            FROM document_chunks
+            WHERE document_id IS NULL
+            GROUP BY metadata->>'source'
+            ON CONFLICT (source) DO NOTHING
+        """)
+        cur.execute("""
+            UPDATE document_chunks c SET document_id = d.id
+            FROM documents d
+            WHERE c.document_id IS NULL AND d.source = c.metadata->>'source'
+        """)
+        migrated = cur.rowcount
+        # same digest as pdf_utils.sha256_text
+        cur.execute("""
+            UPDATE document_chunks SET chunk_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+            WHERE chunk_hash IS NULL
+        """)
+    conn.commit()
+    return migrated
+
+
+def add_generated_columns(conn):
+    """Add the search columns (full-text, source, tags) and their indexes to a pre-existing table."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            ALTER TABLE document_chunks
+                ADD COLUMN IF NOT EXISTS content_tsv TSVECTOR
+                    GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+                ADD COLUMN IF NOT EXISTS source TEXT
+                    GENERATED ALWAYS AS (metadata->>'source') STORED,
+                ADD COLUMN IF NOT EXISTS tags JSONB
+                    GENERATED ALWAYS AS (COALESCE(metadata->'tags', '[]'::jsonb)) STORED
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS document_chunks_content_tsv_idx
+                ON document_chunks USING gin (content_tsv)
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS document_chunks_source_idx ON document_chunks (source)")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS document_chunks_tags_idx
+                ON document_chunks USING gin (tags jsonb_path_ops)
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS documents_uploaded_at_idx ON documents (uploaded_at)")
+    conn.commit()
+
+
+def normalize_embeddings(conn):
+    """
+    Scale chunk embeddings to unit length. Chunks embedded through Ollama's
+    old /api/embeddings endpoint are unnormalised, while /api/embed (used for
+    queries now) returns the same vectors at length 1; without this, L2
+    distances between the two are meaningless.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE document_chunks SET embedding = l2_normalize(embedding)
+            WHERE abs(vector_norm(embedding::vector) - 1) > 1e-3
+        """)
+        normalized = cur.rowcount
+    conn.commit()
+    return normalized
+
+
+def bloat_report(conn):
+    """Live/dead tuple counts and on-disk sizes for document_chunks and its indexes."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT n_live_tup, n_dead_tup, pg_total_relation_size(relid)
+            FROM pg_stat_user_tables WHERE relname = 'document_chunks'
+        """)
+        live, dead, total_bytes = cur.fetchone() or (0, 0, 0)
+        cur.execute("""
+            SELECT indexrelname, pg_relation_size(indexrelid)
+            FROM pg_stat_user_indexes WHERE relname = 'document_chunks'
+            ORDER BY indexrelname
+        """)
+        indexes = dict(cur.fetchall())
+    return {
+        "live_rows": live,
+        "dead_rows": dead,
+        "dead_ratio": dead / live if live else (1.0 if dead else 0.0),
+        "total_bytes": total_bytes,
+        "index_bytes": indexes,
+    }
+
+
+def vacuum(conn):
+    """VACUUM (ANALYZE) the chunk tables; must run outside a transaction."""
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("VACUUM (ANALYZE) document_chunks")
+            cur.execute("VACUUM (ANALYZE) documents")
+    finally:
+        conn.autocommit = autocommit
+
+
+def reindex(conn, indexes):
+    """Rebuild indexes without blocking reads/writes (REINDEX ... CONCURRENTLY)."""
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for name in indexes:
+                cur.execute(f'REINDEX INDEX CONCURRENTLY "{name}"')
+    finally:
+        conn.autocommit = autocommit
+
+
+def run_maintenance(conn, dead_ratio=REINDEX_DEAD_RATIO, force_reindex=False):
+    """Backfill, vacuum and (if warranted) reindex. Returns before/after reports."""
+    migrated = migrate_legacy_chunks(conn)
+    add_generated_columns(conn)
+    normalized = normalize_embeddings(conn)
+    before = bloat_report(conn)
+    vacuum(conn)
+    rebuilt = []
+    if force_reindex or before["dead_ratio"] >= dead_ratio:
+        rebuilt = list(before["index_bytes"])
+        reindex(conn, rebuilt)
+    return {"migrated": migrated, "normalized": normalized, "before": before, "after": bloat_report(conn), "reindexed": rebuilt}
+
+
+def _mb(n):
+    return f"{n / 1e6:.1f} MB"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vacuum and reindex document_chunks.")
+    parser.add_argument("--reindex", action="store_true", help="rebuild indexes unconditionally")
+    parser.add_argument("--dead-ratio", type=float, default=REINDEX_DEAD_RATIO,
+                        help="rebuild indexes when dead/live rows is at least this")
+    args = parser.parse_args()
+
+    conn = connect_db()
+    result = run_maintenance(conn, args.dead_ratio, args.reindex)
+    conn.close()
+
+    before, after = result["before"], result["after"]
+    print(f"Backfilled document_id on {result['migrated']} legacy chunks")
+    print(f"Scaled {result['normalized']} legacy embeddings to unit length")
+    print(f"Rows: {before['live_rows']} live / {before['dead_rows']} dead "
+          f"(ratio {before['dead_ratio']:.2f}) → {after['live_rows']} live / {after['dead_rows']} dead")
+    print(f"Table + indexes: {_mb(before['total_bytes'])} → {_mb(after['total_bytes'])}")
+    for name, size in after["index_bytes"].items():
+        mark = " (rebuilt)" if name in result["reindexed"] else ""
+        print(f"  {name}: {_mb(before['index_bytes'].get(name, 0))} → {_mb(size)}{mark}")
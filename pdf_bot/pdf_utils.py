@@ -1,39 +1,185 @@
 # pdf_utils.py
 
+import hashlib
+import re
+from bisect import bisect_left, bisect_right
 import fitz  # PyMuPDF
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from pathlib import Path
 
+from token_count import CHARS_PER_TOKEN, get_encoding
+
+HASH_BLOCK_SIZE = 1 << 20  # 1 MiB
+
+def iter_pdf_pages(file_path):
+    """Yield each page's text (prefixed with its page marker) one page at a time."""
+    doc = fitz.open(file_path)
+    try:
+        for i, page in enumerate(doc):
+            yield f"\n--- Page {i+1} ---\n" + page.get_text()
+    finally:
+        doc.close()
+
 def extract_text_from_pdf(file_path):
     """Extract text from each page in a PDF."""
-    doc = fitz.open(file_path)
-    text = ""
-    for i, page in enumerate(doc):
-        text += f"\n--- Page {i+1} ---\n"
-        text += page.get_text()
-    doc.close()
-    return text
-
-def chunk_text(text, chunk_size=300, chunk_overlap=50):
+    return "".join(iter_pdf_pages(file_path))
+
+def extract_text_head(file_path, max_chars=4000):
+    """First `max_chars` characters of a PDF, reading only as many pages as needed."""
+    parts, size = [], 0
+    for page in iter_pdf_pages(file_path):
+        parts.append(page)
+        size += len(page)
+        if size >= max_chars:
+            break
+    return "".join(parts)[:max_chars]
+
+# ─── Chunking ──────────────────────────────────────────────────────────────
+PAGE_MARKER = re.compile(r"\n--- Page (\d+) ---\n")
+SEPARATORS = ("\n\n", "\n", " ")
+
+def _char_window(n, chunk_size, chunk_overlap):
+    return (lambda start: min(n, start + chunk_size)), (lambda end: end - chunk_overlap)
+
+def _token_window(text, chunk_size, chunk_overlap, encoding_name):
+    """Map a chunk size/overlap in tokens onto character offsets (~4 chars each without tiktoken)."""
+    enc = get_encoding(encoding_name)
+    if enc is None:
+        return _char_window(len(text), chunk_size * CHARS_PER_TOKEN, chunk_overlap * CHARS_PER_TOKEN)
+    _, offsets = enc.decode_with_offsets(enc.encode(text, disallowed_special=()))
+    offsets.append(len(text))
+
+    def limit(start):
+        i = max(0, bisect_right(offsets, start) - 1)
+        return offsets[min(len(offsets) - 1, i + chunk_size)]
+
+    def back(end):
+        return offsets[max(0, bisect_left(offsets, end) - chunk_overlap)]
+
+    return limit, back
+
+def chunk_spans(text, chunk_size=300, chunk_overlap=50, unit="chars",
+                encoding_name="cl100k_base", base_offset=0, first_page=1):
+    """
+    Split text in one forward pass into overlapping chunks.
+
+    Each chunk ends at the last paragraph, line or word break in the back half
+    of its window (hard cut if there is none). `unit` is "chars" or "tokens".
+    Returns dicts with content, start/end character offsets (content ==
+    text[start:end], shifted by `base_offset`) and the page range taken from
+    the "--- Page N ---" markers; text before the first marker is `first_page`.
+    """
+    n = len(text)
+    markers = [(m.start(), int(m.group(1))) for m in PAGE_MARKER.finditer(text)]
+    marker_pos = [pos for pos, _ in markers]
+    if unit == "tokens":
+        limit, back = _token_window(text, chunk_size, chunk_overlap, encoding_name)
+    else:
+        limit, back = _char_window(n, chunk_size, chunk_overlap)
+
+    def page_at(i):
+        k = bisect_right(marker_pos, i) - 1
+        return markers[k][1] if k >= 0 else first_page
+
+    spans = []
+    start = 0
+    while start < n:
+        hard_end = max(limit(start), start + 1)
+        end = hard_end
+        if hard_end < n:
+            floor = start + (hard_end - start) // 2
+            for sep in SEPARATORS:
+                i = text.rfind(sep, floor, hard_end)
+                if i != -1:
+                    end = i + len(sep)
+                    break
+        s, e = start, end
+        while s < e and text[s].isspace():
+            s += 1
+        while e > s and text[e - 1].isspace():
+            e -= 1
+        if e > s:
+            spans.append({
+                "content": text[s:e],
+                "start": base_offset + s,
+                "end": base_offset + e,
+                "page_start": page_at(s),
+                "page_end": page_at(e - 1),
+            })
+        if end >= n:
+            break
+        nxt = back(end)
+        if nxt <= start:
+            nxt = end
+        else:
+            # begin the overlap on a word boundary
+            j = min((k for k in (text.find(" ", nxt, end), text.find("\n", nxt, end)) if k != -1),
+                    default=-1)
+            if j != -1:
+                nxt = j + 1
+        start = max(nxt, start + 1)
+    return spans
+
+def chunk_text(text, chunk_size=300, chunk_overlap=50, unit="chars"):
     """Split text into overlapping chunks for processing."""
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", " ", ""]
-    )
-    return splitter.split_text(text)
+    return [span["content"] for span in chunk_spans(text, chunk_size, chunk_overlap, unit)]
 
-def add_metadata_to_chunks(chunks, source_path):
-    """Attach source file name and chunk index as metadata."""
+def iter_chunks(pages, chunk_size=300, chunk_overlap=50, window=16, unit="chars"):
+    """
+    Chunk a stream of page texts without holding the whole document; yields
+    chunk_spans dicts with offsets into the full document text.
+    Text is split once roughly `window` chunks have accumulated; the last
+    (possibly partial) chunk is carried over into the next window.
+    """
+    window_chars = window * chunk_size * (CHARS_PER_TOKEN if unit == "tokens" else 1)
+    buffer, base, page = "", 0, 1
+    for piece in pages:
+        buffer += piece
+        if len(buffer) >= window_chars:
+            spans = chunk_spans(buffer, chunk_size, chunk_overlap, unit,
+                                base_offset=base, first_page=page)
+            if not spans:
+                base, buffer = base + len(buffer), ""
+                continue
+            yield from spans[:-1]
+            cut = spans[-1]["start"] - base
+            page = spans[-1]["page_start"]
+            base, buffer = base + cut, buffer[cut:]
+    if buffer:
+        yield from chunk_spans(buffer, chunk_size, chunk_overlap, unit,
+                               base_offset=base, first_page=page)
+
+def iter_documents(chunks, source_path):
+    """Lazy version of add_metadata_to_chunks."""
     filename = Path(source_path).name
-    return [
-        {
-            "content": chunk,
-            "metadata": {
-                "source": filename,
-                "chunk_index": idx
-            }
-        }
-        for idx, chunk in enumerate(chunks)
-    ]
+    for idx, chunk in enumerate(chunks):
+        metadata = {"source": filename, "chunk_index": idx}
+        if isinstance(chunk, dict):
+            # keep offsets and page range from chunk_spans
+            metadata.update((k, v) for k, v in chunk.items() if k != "content")
+            chunk = chunk["content"]
+        yield {"content": chunk, "metadata": metadata}
+
+def add_metadata_to_chunks(chunks, source_path):
+    """Attach source file name and chunk index (plus offsets/pages, if known) as metadata."""
+    return list(iter_documents(chunks, source_path))
+
+def sha256_text(text):
+    """Content hash of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def sha256_file(file_path):
+    """Content hash of a file on disk, read in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
+def save_and_hash(src, dest_path):
+    """Copy a binary file-like object to dest_path, hashing it on the way through."""
+    digest = hashlib.sha256()
+    with open(dest_path, "wb") as f:
+        for block in iter(lambda: src.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+            f.write(block)
+    return digest.hexdigest()
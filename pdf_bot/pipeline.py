@@ -0,0 +1,175 @@
+# pipeline.py
+"""
+Small generator plumbing for the ingestion pipeline.
+
+Each stage is a plain generator; `prefetch` runs a stage in its own thread and
+hands items to the next one through a bounded queue, so stages overlap while
+memory stays capped at `maxsize` items per hop.
+"""
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+from .pdf_utils import sha256_file, iter_pdf_pages, iter_chunks, add_metadata_to_chunks
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def batched(iterable, size):
+    """Yield lists of up to `size` items."""
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def prefetch(iterable, maxsize=4):
+    """
+    Consume `iterable` in a background thread, at most `maxsize` items ahead
+    of the caller. Exceptions raised by the producer are re-raised here.
+    """
+    q = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as exc:
+            put(_Failure(exc))
+            return
+        put(_DONE)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        # unblock the producer if the consumer stopped early
+        stop.set()
+        thread.join()
+
+
+# ─── Process-pool PDF parsing ──────────────────────────────────────────────
+def parse_pdf(pdf_path, skip_hash=None):
+    """
+    Hash, extract and chunk one PDF (runs in a worker process).
+
+    Never raises: a failure is reported in result["error"] so one corrupt
+    file can't take down the batch. If the file's hash equals `skip_hash`
+    it is not parsed and result["documents"] is None.
+    """
+    result = {"path": pdf_path, "doc_hash": None, "documents": None, "error": None}
+    try:
+        result["doc_hash"] = sha256_file(pdf_path)
+        if result["doc_hash"] != skip_hash:
+            chunks = list(iter_chunks(iter_pdf_pages(pdf_path)))
+            result["documents"] = add_metadata_to_chunks(chunks, pdf_path)
+    except Exception as exc:
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    return result
+
+
+def _failed(path, exc):
+    return {"path": path, "doc_hash": None, "documents": None,
+            "error": f"{type(exc).__name__}: {exc}"}
+
+
+def iter_parsed_pdfs(pdf_paths, workers=INGEST_WORKERS, skip_hashes=None):
+    """
+    Yield parse_pdf results as files finish, fanning the CPU-bound work out
+    over `workers` processes. At most 2 * workers files are in flight, so
+    finished results don't pile up faster than the consumer takes them.
+
+    If a worker process dies (e.g. a segfault in the PDF library) the pool
+    is rebuilt and the files that were in flight are re-run one at a time,
+    so only the file that kills a worker on its own is reported as failed.
+    """
+    skip_hashes = skip_hashes or {}
+    if workers <= 1:
+        for path in pdf_paths:
+            yield parse_pdf(path, skip_hashes.get(path))
+        return
+
+    pending_paths = iter(pdf_paths)
+    suspects = deque()   # in flight when the pool broke
+    in_flight = {}
+    executor = ProcessPoolExecutor(max_workers=workers)
+
+    def submit(path):
+        try:
+            fut = executor.submit(parse_pdf, path, skip_hashes.get(path))
+        except BrokenProcessPool as exc:
+            fut = Future()
+            fut.set_exception(exc)
+        in_flight[fut] = path
+
+    def fill():
+        if suspects:
+            if not in_flight:
+                submit(suspects.popleft())
+            return
+        while len(in_flight) < 2 * workers:
+            path = next(pending_paths, None)
+            if path is None:
+                return
+            submit(path)
+
+    try:
+        while True:
+            isolated = bool(suspects)
+            fill()
+            if not in_flight:
+                return
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            if any(isinstance(fut.exception(), BrokenProcessPool) for fut in done):
+                # every other pending future fails with it; collect them all
+                done, _ = wait(in_flight)
+            crashed = []
+            for fut in done:
+                path = in_flight.pop(fut)
+                exc = fut.exception()
+                if isinstance(exc, BrokenProcessPool):
+                    crashed.append(path)
+                else:
+                    yield _failed(path, exc) if exc else fut.result()
+            if not crashed:
+                continue
+            executor.shutdown(wait=True)
+            executor = ProcessPoolExecutor(max_workers=workers)
+            if isolated:
+                print(f"Worker died parsing {crashed[0]}")
+                yield _failed(crashed[0], BrokenProcessPool("worker process died parsing this file"))
+            else:
+                suspects.extend(crashed)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
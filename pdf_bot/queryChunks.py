@@ -1,38 +1,214 @@
 # queryChunks.py
 
-import os, psycopg2, ollama, numpy as np
+import os, json, numpy as np
 from dotenv import load_dotenv, find_dotenv
+from .embedding_cache import get_embedding, get_embeddings
+from .vector_index import (
+    configure_search, distance_operator, nearest_sql, query_param,
+    VECTOR_METRIC, VECTOR_QUANTIZATION, RESCORE_FACTOR,
+)
+from .vector_adapter import Vector
+from .db import connect_db
 load_dotenv(find_dotenv())
 
+# must match the configuration of the generated content_tsv column in schema.sql
+FULLTEXT_CONFIG = "english"
 
-def connect_db():
-    return psycopg2.connect(
-        dbname=os.getenv("LLM_SQL_DBNAME", "llm_sql_demo"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD", "postgres"),
-        host=os.getenv("DB_HOST", "localhost")
-    )
+# Hybrid retrieval: reciprocal-rank fusion of vector and full-text rankings
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))   # rows taken from each ranking
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+HYBRID_TEXT_WEIGHT = float(os.getenv("HYBRID_TEXT_WEIGHT", "1.0"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
 
+# queries searched per statement by get_top_k_chunks_batch (bounds statement size)
+QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", "256"))
 
-def get_top_k_chunks(query, k=3, model_name="mxbai-embed-large"):
+
+def or_tsquery(lexemes_sql):
+    """
+    SQL for a tsquery OR-ing every lexeme in the text[] expression
+    `lexemes_sql` (NULL if it is empty). Each lexeme is quoted by tsquery's
+    own rules (backslash and quote escaped) rather than quote_literal, whose
+    E'...' form the tsquery parser rejects.
+    """
+    quoted = r"'''' || replace(replace(lexeme, '\', '\\'), '''', '''''') || ''''"
+    return f"(SELECT string_agg({quoted}, ' | ') FROM unnest({lexemes_sql}) AS lexeme)::tsquery"
+
+
+def chunk_filter(filters=None):
+    """
+    (SQL condition, params) for retrieval filters over document_chunks, or
+    (None, {}) for no filter. Recognised keys:
+
+        sources         only these source files (indexed generated `source` column)
+        uploaded_after  documents uploaded at or after this date/time
+        uploaded_before documents uploaded before this date/time
+        tags            chunks whose metadata "tags" contain all of these (GIN on `tags`)
+    """
+    filters = {key: value for key, value in (filters or {}).items() if value}
+    unknown = set(filters) - {"sources", "uploaded_after", "uploaded_before", "tags"}
+    if unknown:
+        raise ValueError(f"Unknown retrieval filter(s): {sorted(unknown)}")
+    clauses, params = [], {}
+    if "sources" in filters:
+        clauses.append("source = ANY(%(filter_sources)s)")
+        params["filter_sources"] = list(filters["sources"])
+    if "uploaded_after" in filters or "uploaded_before" in filters:
+        clauses.append("""document_id IN (
+            SELECT id FROM documents
+            WHERE (%(filter_after)s::timestamptz IS NULL OR uploaded_at >= %(filter_after)s::timestamptz)
+              AND (%(filter_before)s::timestamptz IS NULL OR uploaded_at < %(filter_before)s::timestamptz))""")
+        params["filter_after"] = filters.get("uploaded_after")
+        params["filter_before"] = filters.get("uploaded_before")
+    if "tags" in filters:
+        clauses.append("tags @> %(filter_tags)s::jsonb")
+        params["filter_tags"] = json.dumps(list(filters["tags"]))
+    return (" AND ".join(clauses) or None), params
+
+
+def get_top_k_chunks(query, k=3, model_name="mxbai-embed-large",
+                     ef_search=None, probes=None, exact=None, metric=VECTOR_METRIC,
+                     quantization=VECTOR_QUANTIZATION, rescore_factor=RESCORE_FACTOR,
+                     filters=None, max_distance=None):
+    """
+    Top-k chunks for `query` as (content, metadata, score) rows, nearest first.
+    `ef_search` / `probes` tune ANN recall vs speed; `exact` forces (True) or
+    skips (False) exact search, which is otherwise used for small tables (or
+    small filtered subsets). With a quantized index, `rescore_factor * k`
+    candidates are re-ranked by exact distance. `filters` (see chunk_filter)
+    and `max_distance` are applied in SQL, so fewer than k rows may return.
+    """
     conn = connect_db()
     cur = conn.cursor()
 
     # 1. Embed query
-    response = ollama.embeddings(model=model_name, prompt=query)
-    query_embedding = response["embedding"]
+    query_embedding = get_embedding(query, model_name)
 
-    # 2. Convert to Postgres array format
-    embedding_str = "[" + ",".join([str(x) for x in query_embedding]) + "]"
+    # 2. Wrap for the registered pgvector adapter (compact float32 literal)
+    query_vector = Vector(query_embedding)
 
-    # 3. Retrieve top-k with similarity score
-    cur.execute(f"""
-        SELECT content, metadata, embedding <-> %s AS score
-        FROM document_chunks
-        ORDER BY score ASC
-        LIMIT %s
-    """, (embedding_str, k))
+    # 3. Retrieve top-k with similarity score (exact search never goes through the compact form)
+    where, params = chunk_filter(filters)
+    if configure_search(cur, ef_search, probes, exact, where=where, params=params):
+        quantization = "none"
+    cur.execute(nearest_sql("content, metadata", metric, quantization, where=where,
+                            max_distance=max_distance is not None), {
+        **params, "vector": query_vector, "limit": k, "rescore": k * rescore_factor,
+        "max_distance": max_distance,
+    })
 
     results = cur.fetchall()
     conn.close()
     return results  # (content, metadata, score)
+
+
+def get_top_k_chunks_batch(queries, k=3, model_name="mxbai-embed-large",
+                           ef_search=None, probes=None, exact=None, metric=VECTOR_METRIC,
+                           quantization=VECTOR_QUANTIZATION, rescore_factor=RESCORE_FACTOR,
+                           filters=None, max_distance=None, batch_size=QUERY_BATCH_SIZE):
+    """
+    get_top_k_chunks for many queries: a list aligned with `queries`, each
+    entry that query's (content, metadata, score) rows, nearest first.
+
+    Queries are embedded in batched (cached) requests, and each `batch_size`
+    of them is searched in one statement that runs the top-k scan LATERAL
+    over the unnested array of query vectors, on a single connection.
+    """
+    queries = list(queries)
+    results = [[] for _ in queries]
+    if not queries:
+        return results
+    vectors = [Vector(v) for v in get_embeddings(queries, model_name)]
+
+    where, params = chunk_filter(filters)
+    conn = connect_db()
+    try:
+        with conn.cursor() as cur:
+            if configure_search(cur, ef_search, probes, exact, where=where, params=params):
+                quantization = "none"
+            nearest = nearest_sql("content, metadata", metric, quantization, where=where,
+                                  max_distance=max_distance is not None, query="q.vector")
+            sql = f"""
+                SELECT q.ord, r.content, r.metadata, r.distance
+                FROM unnest(%(vectors)s::vector[]) WITH ORDINALITY AS q(vector, ord)
+                CROSS JOIN LATERAL ({nearest}) r
+                ORDER BY q.ord, r.distance
+            """
+            for offset in range(0, len(vectors), batch_size):
+                cur.execute(sql, {
+                    **params, "vectors": vectors[offset:offset + batch_size], "limit": k,
+                    "rescore": k * rescore_factor, "max_distance": max_distance,
+                })
+                for ord, content, metadata, distance in cur.fetchall():
+                    results[offset + ord - 1].append((content, metadata, distance))
+    finally:
+        conn.close()
+    return results
+
+
+def get_hybrid_chunks(query, k=3, model_name="mxbai-embed-large", candidates=HYBRID_CANDIDATES,
+                      vector_weight=HYBRID_VECTOR_WEIGHT, text_weight=HYBRID_TEXT_WEIGHT,
+                      rrf_k=HYBRID_RRF_K, ef_search=None, probes=None, exact=None,
+                      metric=VECTOR_METRIC, quantization=VECTOR_QUANTIZATION,
+                      rescore_factor=RESCORE_FACTOR, filters=None, max_distance=None):
+    """
+    Top-k chunks by reciprocal-rank fusion of vector distance and full-text rank,
+    in one round trip. Rows are (content, metadata, score, distance, text_rank),
+    best first; `text_rank` is None for chunks with no query term in them.
+
+    Each ranking contributes weight / (rrf_k + rank) for its top `candidates`
+    rows. The query's lexemes (stemmed, stop words dropped) are OR-ed, so any
+    one keyword is enough to bring a chunk in through the GIN index. `filters`
+    restrict both rankings; `max_distance` limits the vector ranking, so
+    every returned row is either that close or a keyword match.
+    """
+    query_vector = Vector(get_embedding(query, model_name))
+
+    conn = connect_db()
+    try:
+        with conn.cursor() as cur:
+            where, params = chunk_filter(filters)
+            if configure_search(cur, ef_search, probes, exact, where=where, params=params):
+                quantization = "none"
+            nearest = nearest_sql("id", metric, quantization, where=where,
+                                  max_distance=max_distance is not None)
+            text_filter = f"AND {where}" if where else ""
+            cur.execute(f"""
+                WITH q AS (
+                    -- one quoted lexeme per distinct query term, OR-ed; NULL if none survive
+                    SELECT {or_tsquery("tsvector_to_array(to_tsvector(%(config)s, %(query)s))")} AS tsq
+                ),
+                vec AS (
+                    SELECT id, distance, ROW_NUMBER() OVER (ORDER BY distance) AS rnk
+                    FROM ({nearest}) nearest
+                ),
+                txt AS (
+                    SELECT id, text_rank, ROW_NUMBER() OVER (ORDER BY text_rank DESC) AS rnk
+                    FROM (
+                        SELECT c.id, ts_rank_cd(c.content_tsv, q.tsq) AS text_rank
+                        FROM document_chunks c, q
+                        WHERE c.content_tsv @@ q.tsq {text_filter}
+                        ORDER BY text_rank DESC
+                        LIMIT %(candidates)s
+                    ) matching
+                )
+                SELECT c.content, c.metadata,
+                       COALESCE(%(vector_weight)s::float8 / (%(rrf_k)s + vec.rnk), 0)
+                     + COALESCE(%(text_weight)s::float8 / (%(rrf_k)s + txt.rnk), 0) AS score,
+                       COALESCE(vec.distance, c.embedding {distance_operator(metric)} {query_param()}) AS distance,
+                       txt.text_rank
+                FROM vec
+                FULL JOIN txt ON txt.id = vec.id
+                JOIN document_chunks c ON c.id = COALESCE(vec.id, txt.id)
+                ORDER BY score DESC, distance
+                LIMIT %(k)s
+            """, {
+                **params, "max_distance": max_distance,
+                "config": FULLTEXT_CONFIG, "query": query, "vector": query_vector,
+                "candidates": candidates, "limit": candidates,
+                "rescore": candidates * rescore_factor, "vector_weight": vector_weight,
+                "text_weight": text_weight, "rrf_k": rrf_k, "k": k,
+            })
+            return cur.fetchall()
+    finally:
+        conn.close()
@@ -1,10 +1,11 @@
 import os
 import ollama  # or use openai if you'd rather go cloud
 from .queryChunks import get_top_k_chunks
+from .context_packer import pack_context
 
 
 def build_context_prompt(chunks, query):
-    context = "\n\n".join([chunk[0] for chunk in chunks])  # chunk[0] = content
+    context, _ = pack_context(chunks)  # merged, de-duplicated, within CONTEXT_TOKEN_BUDGET
     return f"""You are a helpful assistant. Use the following PDF content to answer the user's question.
 
 Context:
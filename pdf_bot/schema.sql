@@ -2,6 +2,8 @@ DROP TABLE IF EXISTS order_items     CASCADE;
 DROP TABLE IF EXISTS orders          CASCADE;
 DROP TABLE IF EXISTS products        CASCADE;
 DROP TABLE IF EXISTS document_chunks CASCADE;
+DROP TABLE IF EXISTS documents       CASCADE;
+DROP TABLE IF EXISTS ingest_jobs     CASCADE;
 
 -- schema.sql
 CREATE TABLE products (
@@ -25,9 +27,58 @@ CREATE TABLE order_items (
 
 CREATE EXTENSION IF NOT EXISTS vector;
 
+-- one row per source PDF; deleting it removes its chunks
+CREATE TABLE IF NOT EXISTS documents (
+  id          SERIAL PRIMARY KEY,
+  source      TEXT        NOT NULL UNIQUE,
+  doc_hash    TEXT,                 -- sha256 of the fully indexed version
+  uploaded_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
 CREATE TABLE IF NOT EXISTS document_chunks (
-  id        SERIAL PRIMARY KEY,
-  content   TEXT     NOT NULL,
-  metadata  JSONB    NOT NULL,
-  embedding VECTOR(1024) NOT NULL
+  id          SERIAL PRIMARY KEY,
+  document_id INT      REFERENCES documents(id) ON DELETE CASCADE,
+  content     TEXT     NOT NULL,
+  metadata    JSONB    NOT NULL,
+  embedding   VECTOR(1024) NOT NULL,
+  doc_hash    TEXT,    -- sha256 of the source PDF bytes
+  chunk_hash  TEXT,    -- sha256 of content
+  content_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+  -- retrieval filters (queryChunks.chunk_filter)
+  source      TEXT     GENERATED ALWAYS AS (metadata->>'source') STORED,
+  tags        JSONB    GENERATED ALWAYS AS (COALESCE(metadata->'tags', '[]'::jsonb)) STORED
 );
+
+-- ANN index for get_top_k_chunks (rebuild/retune with `python -m pdf_bot.vector_index`)
+CREATE INDEX IF NOT EXISTS document_chunks_embedding_idx
+  ON document_chunks USING hnsw (embedding vector_l2_ops) WITH (m = 16, ef_construction = 64);
+
+-- full-text side of hybrid retrieval (queryChunks.get_hybrid_chunks)
+CREATE INDEX IF NOT EXISTS document_chunks_content_tsv_idx
+  ON document_chunks USING gin (content_tsv);
+
+-- filtered retrieval: per-source, per-tag and upload-date restrictions
+CREATE INDEX IF NOT EXISTS document_chunks_source_idx ON document_chunks (source);
+CREATE INDEX IF NOT EXISTS document_chunks_tags_idx   ON document_chunks USING gin (tags jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS documents_uploaded_at_idx  ON documents (uploaded_at);
+
+-- replace/delete and embedding reuse look chunks up by document
+CREATE INDEX IF NOT EXISTS document_chunks_document_idx
+  ON document_chunks (document_id, chunk_hash);
+
+-- background ingestion jobs (pdf_bot/jobs.py); chunks_done is the resume checkpoint
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+  id          SERIAL PRIMARY KEY,
+  source      TEXT        NOT NULL,
+  path        TEXT        NOT NULL,
+  doc_hash    TEXT        NOT NULL,
+  status      TEXT        NOT NULL DEFAULT 'queued',  -- queued | running | done | failed | cancelled
+  chunks_done INT         NOT NULL DEFAULT 0,
+  attempts    INT         NOT NULL DEFAULT 0,
+  error       TEXT,
+  summary     TEXT,
+  created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ingest_jobs_status_idx ON ingest_jobs (status, id);
@@ -0,0 +1,79 @@
+# pdf_bot/tests/test_answer_cache.py
+import numpy as np
+
+import pdf_bot.answer_cache as answer_cache
+from pdf_bot.answer_cache import AnswerCache
+from pdf_bot.db import connect_db
+from pdf_bot.insert_embeddings_to_db import insert_document_chunks
+
+
+def _cache(hashes, **kwargs):
+    return AnswerCache(doc_hashes=lambda sources: {s: hashes[s] for s in sources if s in hashes}, **kwargs)
+
+
+def _vec(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_near_identical_question_hits():
+    cache = _cache({"a.pdf": "h1"}, similarity=0.95)
+    cache.store("what is x?", _vec(1, 0, 0), "x is 1", {"a.pdf"}, latency=2.0)
+
+    assert cache.lookup(_vec(0.99, 0.05, 0)) == "x is 1"
+    assert cache.lookup(_vec(0, 1, 0)) is None
+    stats = cache.snapshot()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["saved_seconds"] > 1.9
+
+
+def test_reindexed_or_deleted_source_invalidates():
+    hashes = {"a.pdf": "h1", "b.pdf": "h2"}
+    cache = _cache(hashes)
+    cache.store("q1", _vec(1, 0), "from a", {"a.pdf"}, latency=1.0)
+    cache.store("q2", _vec(0, 1), "from b", {"b.pdf"}, latency=1.0)
+
+    cache.invalidate_source("a.pdf")  # in-process hook
+    assert cache.lookup(_vec(1, 0)) is None
+
+    hashes["b.pdf"] = "h3"  # re-indexed by another process
+    assert cache.lookup(_vec(0, 1)) is None
+    assert cache.snapshot()["invalidations"] == 2
+
+
+def test_replacing_a_source_through_the_loader_invalidates(monkeypatch):
+    cache = _cache({"a.pdf": "h1"})
+    monkeypatch.setattr(answer_cache, "_cache", cache)
+    cache.store("q1", _vec(1, 0), "from a", {"a.pdf"}, latency=1.0)
+
+    doc = {"content": "new text", "metadata": {"source": "a.pdf", "chunk_index": 0}}
+    conn = connect_db()
+    try:
+        insert_document_chunks(conn, [doc], [[1.0] + [0.0] * 1023], doc_hash="h1", replace_source="a.pdf")
+        assert cache.lookup(_vec(1, 0)) is None
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE documents, document_chunks RESTART IDENTITY CASCADE")
+        conn.commit()
+        conn.close()
+
+
+def test_ttl_and_size_eviction(monkeypatch):
+    cache = _cache({}, max_items=2, ttl=60)
+    cache.store("q1", _vec(1, 0, 0), "a1", set(), latency=1.0)
+    cache.store("q2", _vec(0, 1, 0), "a2", set(), latency=1.0)
+    assert cache.lookup(_vec(1, 0, 0)) == "a1"    # q1 is now most recently used
+    cache.store("q3", _vec(0, 0, 1), "a3", set(), latency=1.0)
+    assert cache.lookup(_vec(0, 1, 0)) is None    # q2 evicted
+    assert cache.snapshot()["evictions"] == 1
+
+    import pdf_bot.answer_cache as answer_cache
+    now = answer_cache.time.time()
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now + 120)
+    assert cache.lookup(_vec(1, 0, 0)) is None
+    assert cache.snapshot()["expirations"] == 2
+
+
+def test_answers_are_scoped_by_filters():
+    cache = _cache({"a.pdf": "h1"})
+    cache.store("q", _vec(1, 0), "from a only", {"a.pdf"}, latency=1.0, scope={"sources": ["a.pdf"]})
+    assert cache.lookup(_vec(1, 0)) is None
+    assert cache.lookup(_vec(1, 0), scope={"sources": ["a.pdf"], "tags": []}) == "from a only"
@@ -0,0 +1,68 @@
+# pdf_bot/tests/test_chunker.py
+import pytest
+
+import token_count
+from pdf_bot.pdf_utils import chunk_spans, chunk_text, add_metadata_to_chunks
+
+TEXT = "".join(
+    f"\n--- Page {p} ---\n" + "\n\n".join(
+        f"Paragraph {i} of page {p} talks about planets, moons and the solar wind." * 3
+        for i in range(4)
+    )
+    for p in range(1, 6)
+)
+
+
+def test_offsets_point_back_into_text():
+    spans = chunk_spans(TEXT, chunk_size=300, chunk_overlap=50)
+    assert spans
+    for span in spans:
+        assert TEXT[span["start"]:span["end"]] == span["content"]
+        assert len(span["content"]) <= 300
+
+
+def test_chunks_overlap_and_cover_text():
+    spans = chunk_spans(TEXT, chunk_size=300, chunk_overlap=50)
+    for prev, nxt in zip(spans, spans[1:]):
+        assert nxt["start"] > prev["start"]
+        assert nxt["start"] <= prev["end"]  # no gap between consecutive chunks
+
+
+def test_page_ranges_follow_markers():
+    spans = chunk_spans(TEXT, chunk_size=300, chunk_overlap=50)
+    assert spans[0]["page_start"] == 1
+    assert spans[-1]["page_end"] == 5
+    for span in spans:
+        assert span["page_start"] <= span["page_end"]
+        first = TEXT.rfind("--- Page ", 0, span["start"] + 1)
+        if first != -1 and "--- Page" not in span["content"][:10]:
+            assert int(TEXT[first + 9:].split(" ", 1)[0]) == span["page_start"]
+
+
+def test_breaks_on_word_boundaries():
+    for chunk in chunk_text("alpha beta gamma delta " * 200, chunk_size=50, chunk_overlap=10):
+        assert not chunk.startswith(" ") and not chunk.endswith(" ")
+        assert all(w in {"alpha", "beta", "gamma", "delta"} for w in chunk.split())
+
+
+def test_metadata_keeps_offsets_and_pages():
+    docs = add_metadata_to_chunks(chunk_spans(TEXT), "pdfs/solar.pdf")
+    meta = docs[1]["metadata"]
+    assert meta["source"] == "solar.pdf" and meta["chunk_index"] == 1
+    assert {"start", "end", "page_start", "page_end"} <= set(meta)
+
+
+def test_token_sized_chunks():
+    enc = token_count.get_encoding("cl100k_base")
+    if enc is None:
+        pytest.skip("tiktoken or its cl100k_base encoding is unavailable")
+    spans = chunk_spans(TEXT, chunk_size=64, chunk_overlap=8, unit="tokens")
+    assert all(len(enc.encode(s["content"])) <= 64 for s in spans)
+    assert all(TEXT[s["start"]:s["end"]] == s["content"] for s in spans)
+
+
+def test_token_units_without_an_encoding_estimate_from_characters(monkeypatch):
+    monkeypatch.setattr(token_count, "get_encoding", lambda name: None)
+    monkeypatch.setattr("pdf_bot.pdf_utils.get_encoding", lambda name: None)
+    spans = chunk_spans(TEXT, chunk_size=64, chunk_overlap=8, unit="tokens")
+    assert spans and all(len(s["content"]) <= 64 * token_count.CHARS_PER_TOKEN for s in spans)
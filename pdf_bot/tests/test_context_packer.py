@@ -0,0 +1,53 @@
+# pdf_bot/tests/test_context_packer.py
+import pytest
+
+import token_count
+from pdf_bot.context_packer import count_tokens, merge_chunks, pack_context
+from pdf_bot.pdf_utils import add_metadata_to_chunks, chunk_spans
+
+TEXT = " ".join(f"Sentence number {i} talks about topic {i % 7}." for i in range(200))
+
+
+def _chunks(indexes):
+    docs = add_metadata_to_chunks(chunk_spans(TEXT, chunk_size=300, chunk_overlap=50), "a.pdf")
+    return [(docs[i]["content"], docs[i]["metadata"]) for i in indexes], docs
+
+
+def test_overlapping_neighbours_are_merged_once():
+    chunks, docs = _chunks([3, 4, 5, 3])
+    spans = merge_chunks(chunks)
+    assert len(spans) == 1 and sorted(spans[0]["chunks"]) == [3, 4, 5]
+    start, end = docs[3]["metadata"]["start"], docs[5]["metadata"]["end"]
+    assert spans[0]["text"] == TEXT[start:end]
+
+
+def test_spans_keep_relevance_order():
+    chunks, _ = _chunks([10, 2, 11, 30])
+    spans = merge_chunks(chunks + [("no offsets", {"source": "b.pdf", "chunk_index": 0})])
+    assert [s["chunks"] for s in spans] == [[10, 11], [2], [30], [0]]
+
+
+def test_budget_is_respected():
+    chunks, _ = _chunks(range(0, 30, 3))
+    context, stats = pack_context(chunks, budget=300)
+    assert stats["truncated"] and stats["tokens"] <= 300
+    assert count_tokens(context) <= 300
+    assert context.startswith("[a.pdf - chunk 0]\n")
+
+    context, stats = pack_context(chunks[:2], budget=10_000)
+    assert not stats["truncated"] and stats["spans"] == 2
+
+
+def _offline(name):
+    raise OSError("could not download the encoding")
+
+
+def test_unloadable_encoding_falls_back_to_the_estimate(monkeypatch):
+    tiktoken = pytest.importorskip("tiktoken")
+    monkeypatch.setattr(tiktoken, "get_encoding", _offline)
+    token_count.get_encoding.cache_clear()
+    try:
+        assert count_tokens("x" * 40, "broken") == 10
+        assert token_count.truncate_tokens("word " * 40, 5, "broken") == "word word word word"
+    finally:
+        token_count.get_encoding.cache_clear()
@@ -0,0 +1,96 @@
+# pdf_bot/tests/test_db_pool.py
+import threading
+from types import SimpleNamespace
+
+import pytest
+from psycopg2 import extensions
+
+import db_pool
+from pdf_bot.db import ConnectionPool, PooledConnection, PoolTimeout
+
+
+class _FakeConn:
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.rollbacks = 0
+        self.info = SimpleNamespace(transaction_status=extensions.TRANSACTION_STATUS_IDLE)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+def _pool(**kwargs):
+    opened = []
+
+    def connect():
+        opened.append(_FakeConn())
+        return opened[-1]
+
+    kwargs.setdefault("pre_ping", False)
+    return ConnectionPool(connect=connect, **kwargs), opened
+
+
+def test_connections_are_reused():
+    pool, opened = _pool(size=2, max_overflow=0)
+    for _ in range(5):
+        PooledConnection(pool, pool.getconn()).close()
+    assert len(opened) == 1
+    assert pool.snapshot()["checkouts"] == 5
+
+
+def test_returned_connection_is_rolled_back_and_reset():
+    pool, opened = _pool(size=1, max_overflow=0)
+    conn = PooledConnection(pool, pool.getconn())
+    conn.autocommit = True  # forwarded to the real connection
+    opened[0].info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+    conn.close()
+    assert opened[0].rollbacks == 1 and opened[0].autocommit is False
+    assert conn.closed
+
+
+def test_overflow_connections_are_closed_on_return():
+    pool, opened = _pool(size=1, max_overflow=1)
+    a, b = pool.getconn(), pool.getconn()
+    pool.putconn(a)
+    pool.putconn(b)
+    assert b.closed and not a.closed
+    assert pool.snapshot()["open"] == 1
+
+
+def test_checkout_waits_then_times_out():
+    pool, _ = _pool(size=1, max_overflow=0, timeout=0.05)
+    held = pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+
+    threading.Timer(0.02, pool.putconn, (held,)).start()
+    pool.timeout = 2
+    assert pool.getconn() is held
+    stats = pool.snapshot()
+    assert stats["timeouts"] == 1 and stats["waits"] == 1 and stats["max_wait_seconds"] > 0
+
+
+def test_dead_idle_connection_is_replaced():
+    pool, opened = _pool(size=1, max_overflow=0)
+    pool.putconn(pool.getconn())
+    opened[0].closed = 1  # server went away while idle
+    assert pool.getconn() is opened[1]
+    assert pool.snapshot()["stale_dropped"] == 1
+
+
+def test_warm_opens_pool_size():
+    pool, opened = _pool(size=3, max_overflow=2)
+    assert pool.warm() == 3
+    assert pool.warm() == 0
+    assert pool.snapshot()["idle"] == 3 and len(opened) == 3
+
+
+def test_pdf_pool_is_registered_with_the_shared_stats():
+    stats = db_pool.pool_stats()
+    assert "PDF" in stats
+    assert {"checked_out", "idle", "waits", "avg_wait_ms"} <= set(stats["PDF"])
@@ -0,0 +1,82 @@
+# pdf_bot/tests/test_embedding_cache.py
+from pdf_bot.embedding_cache import EmbeddingCache
+from pdf_bot.pdf_utils import sha256_text
+
+
+class _FakeClient:
+    def __init__(self, model, calls):
+        self.model, self.calls = model, calls
+
+    def embed(self, texts):
+        self.calls.extend((self.model, t) for t in texts)
+        return [[float(len(t)), 1.0, 2.0] for t in texts]
+
+
+def _fake_client(monkeypatch, calls):
+    monkeypatch.setattr("pdf_bot.embedding_cache.get_client", lambda model: _FakeClient(model, calls))
+
+
+def test_repeated_text_hits_memory(monkeypatch, tmp_path):
+    calls = []
+    _fake_client(monkeypatch, calls)
+    cache = EmbeddingCache(path=str(tmp_path / "emb.sqlite"))
+
+    first = cache.embed("repeated header")
+    second = cache.embed("repeated header")
+    assert first == second
+    assert len(calls) == 1
+    assert cache.stats["memory_hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_model_is_part_of_key(monkeypatch, tmp_path):
+    calls = []
+    _fake_client(monkeypatch, calls)
+    cache = EmbeddingCache(path=str(tmp_path / "emb.sqlite"))
+
+    cache.embed("same text", model="a")
+    cache.embed("same text", model="b")
+    assert len(calls) == 2
+
+
+def test_disk_tier_survives_restart(monkeypatch, tmp_path):
+    calls = []
+    _fake_client(monkeypatch, calls)
+    path = str(tmp_path / "emb.sqlite")
+    EmbeddingCache(path=path).embed("persist me")
+
+    reopened = EmbeddingCache(path=path)
+    assert reopened.embed("persist me") == [10.0, 1.0, 2.0]
+    assert len(calls) == 1
+    assert reopened.stats["disk_hits"] == 1
+
+
+def test_disk_tier_is_size_bounded(monkeypatch, tmp_path):
+    _fake_client(monkeypatch, [])
+    # each vector is 3 float32 = 12 bytes
+    cache = EmbeddingCache(path=str(tmp_path / "emb.sqlite"), memory_items=1, disk_max_bytes=60)
+    for i in range(20):
+        cache.embed(f"text {i}")
+    assert cache.snapshot()["disk_bytes"] <= 60
+    assert cache.stats["evictions"] > 0
+
+
+def test_embed_many_only_sends_misses_once(monkeypatch, tmp_path):
+    calls = []
+    _fake_client(monkeypatch, calls)
+    cache = EmbeddingCache(path=str(tmp_path / "emb.sqlite"))
+    cache.embed("seen")
+
+    vectors = cache.embed_many(["seen", "header", "new", "header"])
+    assert [v[0] for v in vectors] == [4.0, 6.0, 3.0, 6.0]
+    assert [t for _, t in calls] == ["seen", "header", "new"]
+
+
+def test_vectors_from_legacy_endpoint_are_not_reused(monkeypatch, tmp_path):
+    calls = []
+    _fake_client(monkeypatch, calls)
+    cache = EmbeddingCache(path=str(tmp_path / "emb.sqlite"))
+    # a row cached before the switch to /api/embed: unnormalised, keyed by the bare model name
+    cache._disk_put(("mxbai-embed-large", sha256_text("old text")), [30.0, 40.0, 0.0])
+
+    assert cache.embed("old text") == [8.0, 1.0, 2.0]
+    assert len(calls) == 1
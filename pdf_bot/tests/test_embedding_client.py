@@ -0,0 +1,106 @@
+# pdf_bot/tests/test_embedding_client.py
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from pdf_bot.embedding_client import EmbeddingClient, AdaptiveLimit
+
+
+class FakeOllama(BaseHTTPRequestHandler):
+    """Minimal stand-in for Ollama's POST /api/embed."""
+    latency = 0.01
+    fail_first = 0
+    requests = 0
+    batch_sizes = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        with FakeOllama.lock:
+            FakeOllama.requests += 1
+            FakeOllama.batch_sizes.append(len(texts))
+            fail = FakeOllama.requests <= FakeOllama.fail_first
+        time.sleep(self.latency)
+        if fail:
+            self.send_response(503)
+            self.end_headers()
+            self.wfile.write(b'{"error": "overloaded"}')
+            return
+        payload = json.dumps({
+            "model": body["model"],
+            "embeddings": [[float(len(t)), float(sum(map(ord, t)) % 97)] for t in texts],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_server():
+    FakeOllama.requests, FakeOllama.fail_first, FakeOllama.batch_sizes = 0, 0, []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllama)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def _texts(n):
+    return [f"chunk number {i}" for i in range(n)]
+
+
+def test_batches_requests_and_keeps_order(fake_server):
+    client = EmbeddingClient(host=fake_server, batch_size=16)
+    texts = _texts(100)
+    vectors = client.embed(texts)
+    assert [v[0] for v in vectors] == [float(len(t)) for t in texts]
+    assert FakeOllama.requests == 7  # ceil(100 / 16)
+
+
+def test_retries_transient_errors(fake_server):
+    FakeOllama.fail_first = 2
+    client = EmbeddingClient(host=fake_server, batch_size=50, backoff_base=0.01)
+    assert len(client.embed(_texts(50))) == 50
+    assert client.stats["retries"] == 2
+
+
+def test_async_matches_sync(fake_server):
+    client = EmbeddingClient(host=fake_server, batch_size=8)
+    texts = _texts(40)
+    assert asyncio.run(client.aembed(texts)) == client.embed(texts)
+
+
+def test_concurrency_grows_when_fast_and_backs_off_on_errors():
+    limit = AdaptiveLimit(minimum=1, maximum=8, target_latency=1.0)
+    for _ in range(10):
+        limit.on_success(0.1)
+    assert limit.current == 8
+    limit.on_error()
+    assert limit.current == 4
+    limit.on_success(5.0)
+    assert limit.current == 3
+
+
+def test_batching_cuts_round_trips_and_raises_concurrency(fake_server):
+    texts = _texts(2000)
+    serial = EmbeddingClient(host=fake_server, batch_size=1, max_concurrency=1)
+    serial.embed(texts[:100])
+    assert FakeOllama.requests == 100
+
+    FakeOllama.requests, FakeOllama.batch_sizes = 0, []
+    batched = EmbeddingClient(host=fake_server, batch_size=64, max_concurrency=8)
+    assert len(batched.embed(texts)) == 2000
+    assert FakeOllama.requests == 32  # ceil(2000 / 64)
+    assert max(FakeOllama.batch_sizes) == 64 and sum(FakeOllama.batch_sizes) == 2000
+    # every batch came back under the target latency, so the limit only grew
+    assert batched.snapshot()["concurrency"] == 8
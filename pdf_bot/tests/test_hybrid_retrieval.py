@@ -0,0 +1,122 @@
+# pdf_bot/tests/test_hybrid_retrieval.py
+import json
+
+import pytest
+
+from pdf_bot import queryChunks
+from pdf_bot.db import connect_db
+from pdf_bot.vector_adapter import Vector
+
+DIM = 1024
+
+
+def _unit(i):
+    v = [0.0] * DIM
+    v[i] = 1.0
+    return v
+
+
+@pytest.fixture
+def chunks(monkeypatch):
+    rows = [
+        ("The sun is a dynamic star.", _unit(0)),
+        ("Photosynthesis converts light into chemical energy.", _unit(1)),
+        ("Invoice number ZX-4411 was paid in March.", _unit(2)),
+    ]
+    conn = connect_db()
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE documents, document_chunks RESTART IDENTITY CASCADE")
+        for i, (content, emb) in enumerate(rows):
+            source = "u.pdf" if i == 2 else "t.pdf"
+            cur.execute("""
+                INSERT INTO documents (source) VALUES (%s)
+                ON CONFLICT (source) DO UPDATE SET source = EXCLUDED.source RETURNING id
+            """, (source,))
+            document_id = cur.fetchone()[0]
+            metadata = {"source": source, "chunk_index": i, "tags": ["finance"] if i == 2 else []}
+            cur.execute(
+                "INSERT INTO document_chunks (document_id, content, metadata, embedding) VALUES (%s, %s, %s, %s)",
+                (document_id, content, json.dumps(metadata), Vector(emb)),
+            )
+    conn.commit()
+    conn.close()
+    # the query embeds closest to the "sun" chunk
+    monkeypatch.setattr(queryChunks, "get_embedding", lambda text, model=None: _unit(0))
+    yield
+    conn = connect_db()
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE documents, document_chunks RESTART IDENTITY CASCADE")
+    conn.commit()
+    conn.close()
+
+
+def test_keyword_match_outside_vector_top_k_is_found(chunks):
+    rows = queryChunks.get_hybrid_chunks("when was invoice ZX-4411 paid", k=2, candidates=1)
+    contents = [r[0] for r in rows]
+    assert any("ZX-4411" in c for c in contents)
+    keyword_row = next(r for r in rows if "ZX-4411" in r[0])
+    assert keyword_row[4] is not None  # text_rank
+
+
+def test_hyphenated_terms_are_ored_not_phrase_matched(chunks):
+    # plainto_tsquery makes this a phrase ('sun-invoic' <-> 'sun' <-> 'invoic')
+    rows = queryChunks.get_hybrid_chunks("sun-invoice", k=3, vector_weight=0.0)
+    matched = {r[0] for r in rows if r[4] is not None}
+    assert matched == {"The sun is a dynamic star.", "Invoice number ZX-4411 was paid in March."}
+
+
+def test_weights_shift_the_fused_order(chunks):
+    query = "invoice"
+    text_first = queryChunks.get_hybrid_chunks(query, k=3, vector_weight=0.0, text_weight=1.0)
+    vector_first = queryChunks.get_hybrid_chunks(query, k=3, vector_weight=1.0, text_weight=0.0)
+    assert "Invoice" in text_first[0][0]
+    assert "sun" in vector_first[0][0]
+
+
+def test_filters_and_threshold_are_applied_in_sql(chunks):
+    only_u = queryChunks.get_top_k_chunks("anything", k=3, filters={"sources": ["u.pdf"]})
+    assert [r[1]["source"] for r in only_u] == ["u.pdf"]
+
+    tagged = queryChunks.get_hybrid_chunks("sun", k=3, filters={"tags": ["finance"]})
+    assert [r[0] for r in tagged] == ["Invoice number ZX-4411 was paid in March."]
+
+    # unit vectors: the "sun" chunk is at distance 0, the others at sqrt(2)
+    close = queryChunks.get_top_k_chunks("anything", k=3, max_distance=1.0)
+    assert [r[0] for r in close] == ["The sun is a dynamic star."]
+
+
+def test_batch_matches_single_queries_in_input_order(chunks, monkeypatch):
+    embeddings = {"sun?": _unit(0), "plants?": _unit(1), "invoice?": _unit(2)}
+    monkeypatch.setattr(queryChunks, "get_embeddings",
+                        lambda texts, model=None: [embeddings[t] for t in texts])
+    queries = ["invoice?", "sun?", "plants?", "sun?"]
+
+    batch = queryChunks.get_top_k_chunks_batch(queries, k=2, batch_size=3)
+    assert [rows[0][0] for rows in batch] == [
+        "Invoice number ZX-4411 was paid in March.", "The sun is a dynamic star.",
+        "Photosynthesis converts light into chemical energy.", "The sun is a dynamic star.",
+    ]
+    assert all(len(rows) == 2 for rows in batch)
+    assert batch[1] == queryChunks.get_top_k_chunks("sun?", k=2)
+    assert queryChunks.get_top_k_chunks_batch([]) == []
+
+
+def test_lexemes_with_backslashes_and_quotes_round_trip():
+    lexemes = ["c:\\temp\\x", "o'brien", "it''s\\", "a:b & !c"]
+    conn = connect_db()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT {queryChunks.or_tsquery('%(lexemes)s::text[]')}", {"lexemes": lexemes})
+            tsq = cur.fetchone()[0]
+            for lexeme in lexemes:
+                cur.execute("SELECT array_to_tsvector(ARRAY[%s]) @@ %s::tsquery", (lexeme, tsq))
+                assert cur.fetchone()[0], lexeme
+            cur.execute(f"SELECT {queryChunks.or_tsquery('ARRAY[]::text[]')}")
+            assert cur.fetchone()[0] is None
+    finally:
+        conn.close()
+
+
+def test_query_with_backslashes_and_quotes_still_matches(chunks):
+    rows = queryChunks.get_hybrid_chunks("invoice \\'ZX-4411\\' o'brien\\", k=3, vector_weight=0.0)
+    assert any("ZX-4411" in r[0] and r[4] is not None for r in rows)
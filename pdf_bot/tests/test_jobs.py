@@ -0,0 +1,145 @@
+# pdf_bot/tests/test_jobs.py
+import threading
+
+import psycopg2
+import pytest
+
+import pdf_bot.genAI as genAI
+import pdf_bot.insert_embeddings_to_db as ingest
+from pdf_bot import jobs
+from pdf_bot.db import connect_db
+from pdf_bot.insert_embeddings_to_db import delete_document
+
+DIM = 1024
+
+
+def _docs(source, n, fail_at=None, on_chunk=None):
+    for i in range(n):
+        if i == fail_at:
+            raise RuntimeError("parser died")
+        if on_chunk:
+            on_chunk(i)
+        yield {"content": f"chunk {i} of {source}", "metadata": {"source": source, "chunk_index": i}}
+
+
+def _job(conn, job_id):
+    with conn.cursor() as cur:
+        cur.execute("SELECT status, chunks_done, attempts FROM ingest_jobs WHERE id = %s", (job_id,))
+        return cur.fetchone()
+
+
+def _chunk_hashes(conn, source):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.doc_hash, COUNT(*) FROM document_chunks c JOIN documents d ON d.id = c.document_id
+            WHERE d.source = %s GROUP BY c.doc_hash
+        """, (source,))
+        return dict(cur.fetchall())
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    monkeypatch.setattr(ingest, "get_embeddings", lambda texts, model=None: [[1.0] + [0.0] * (DIM - 1)] * len(texts))
+    monkeypatch.setattr(genAI, "summarize_document", lambda text: "summary")
+    monkeypatch.setattr(jobs, "extract_text_head", lambda path, n: "")
+    monkeypatch.setattr(jobs, "iter_pdf_pages", lambda path: None)
+    monkeypatch.setattr(jobs, "iter_chunks", lambda pages: None)
+    conn = connect_db()
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE documents, document_chunks, ingest_jobs RESTART IDENTITY CASCADE")
+    conn.commit()
+    yield conn
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE documents, document_chunks, ingest_jobs RESTART IDENTITY CASCADE")
+    conn.commit()
+    conn.close()
+
+
+def test_claim_job_retries_failures_and_skips_cancelled(conn):
+    first = jobs.enqueue_job(conn, "/tmp/a.pdf", "h1")
+    second = jobs.enqueue_job(conn, "/tmp/b.pdf", "h1")
+    assert jobs.enqueue_job(conn, "/tmp/a.pdf", "h1") == first     # already pending
+
+    jobs.cancel_jobs(conn, "b.pdf")
+    job = jobs.claim_job(conn)
+    assert job["id"] == first and _job(conn, first) == ("running", 0, 1)
+    assert jobs.claim_job(conn) is None                              # b.pdf was cancelled
+    assert _job(conn, second)[0] == "cancelled"
+
+    with conn.cursor() as cur:
+        cur.execute("UPDATE ingest_jobs SET status = 'failed' WHERE id = %s", (first,))
+    conn.commit()
+    assert jobs.claim_job(conn, retry_seconds=3600) is None          # not due yet
+    assert jobs.claim_job(conn, retry_seconds=0)["id"] == first      # attempt 2
+    assert jobs.claim_job(conn, stale_seconds=0)["id"] == first      # worker went quiet: attempt 3
+    assert jobs.claim_job(conn, stale_seconds=0) is None             # out of attempts
+    assert _job(conn, first) == ("failed", 0, 3)
+
+
+def test_run_job_checkpoints_and_discards_a_failed_attempt(conn, monkeypatch):
+    monkeypatch.setattr(jobs, "iter_documents", lambda chunks, path: _docs("a.pdf", 5))
+    jobs.enqueue_job(conn, "/tmp/a.pdf", "h1")
+    job = jobs.claim_job(conn)
+    jobs.run_job(conn, job, batch_size=2)
+    assert _job(conn, job["id"]) == ("done", 5, 1)
+    assert _chunk_hashes(conn, "a.pdf") == {"h1": 5}
+
+    # a new version fails half-way: its rows go, the indexed version stays
+    monkeypatch.setattr(jobs, "iter_documents", lambda chunks, path: _docs("a.pdf", 5, fail_at=3))
+    monkeypatch.setattr(jobs, "EMBED_BATCH_SIZE", 1)
+    jobs.enqueue_job(conn, "/tmp/a.pdf", "h2")
+    job = jobs.claim_job(conn)
+    jobs.run_job(conn, job, batch_size=2)
+    status, done, _ = _job(conn, job["id"])
+    assert status == "failed" and done == 0
+    assert _chunk_hashes(conn, "a.pdf") == {"h1": 5}
+
+
+def test_deleting_a_pdf_stops_its_running_job(conn, monkeypatch):
+    other = connect_db()
+
+    def delete_while_running(i):
+        if i == 2:
+            jobs.cancel_jobs(other, "a.pdf")
+            delete_document(other, "a.pdf")
+
+    monkeypatch.setattr(jobs, "iter_documents",
+                        lambda chunks, path: _docs("a.pdf", 5, on_chunk=delete_while_running))
+    try:
+        jobs.enqueue_job(conn, "/tmp/a.pdf", "h1")
+        job = jobs.claim_job(conn, retry_seconds=0)
+        jobs.run_job(conn, job, batch_size=2)
+    finally:
+        other.close()
+    assert _job(conn, job["id"])[0] == "cancelled"
+    assert _chunk_hashes(conn, "a.pdf") == {}
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM documents WHERE source = 'a.pdf'")
+        assert cur.fetchone()[0] == 0                                # not recreated
+    assert jobs.claim_job(conn, stale_seconds=0, retry_seconds=0) is None
+
+
+class _FakeConn:
+    closed = 0
+
+    def close(self):
+        self.closed = 1
+
+
+def test_worker_reconnects_after_a_database_error(monkeypatch):
+    conns, stop = [], threading.Event()
+
+    def connect():
+        conns.append(_FakeConn())
+        return conns[-1]
+
+    def claim(conn):
+        if len(conns) == 1:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        stop.set()
+        return None
+
+    monkeypatch.setattr(jobs, "connect_db", connect)
+    monkeypatch.setattr(jobs, "claim_job", claim)
+    jobs.work_forever(stop, poll_seconds=0)
+    assert len(conns) == 2 and all(c.closed for c in conns)
@@ -0,0 +1,97 @@
+# pdf_bot/tests/test_local_index.py
+import json
+import os
+
+import numpy as np
+import pytest
+
+from pdf_bot.local_index import VectorIndex
+
+
+def _docs(n, source="a.pdf"):
+    return [{"content": f"chunk {i}", "metadata": {"source": source, "chunk_index": i}} for i in range(n)]
+
+
+def _brute_force(vectors, query, k):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(vectors @ (query / np.linalg.norm(query))))[:k])
+
+
+def test_search_matches_brute_force():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 32)).astype(np.float32)
+    index = VectorIndex()
+    index.add(vectors, _docs(500))
+    query = rng.normal(size=32)
+
+    hits = index.search(query, k=5)
+    assert [doc["metadata"]["chunk_index"] for _, doc in hits] == _brute_force(vectors, query, 5)
+    assert [s for s, _ in hits] == sorted((s for s, _ in hits), reverse=True)
+
+
+def test_remove_and_remove_source():
+    rng = np.random.default_rng(1)
+    index = VectorIndex()
+    a_ids = index.add(rng.normal(size=(10, 8)), _docs(10, "a.pdf"), source="a.pdf", doc_hash="h1")
+    index.add(rng.normal(size=(5, 8)), _docs(5, "b.pdf"), source="b.pdf", doc_hash="h2")
+
+    assert index.remove(a_ids[:3] + [999]) == 3
+    assert len(index) == 12
+    assert index.remove_source("b.pdf") == 5
+    assert index.sources == {"a.pdf": "h1"}
+    left = {doc["metadata"]["chunk_index"] for _, doc in index.search(rng.normal(size=8), k=50)}
+    assert left == set(range(3, 10))
+
+
+def test_save_and_mmap_load(tmp_path):
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(50, 16))
+    index = VectorIndex()
+    index.add(vectors, _docs(50), source="a.pdf", doc_hash="h")
+    index.save(tmp_path)
+
+    loaded = VectorIndex.load(tmp_path)
+    assert isinstance(loaded.vectors, np.memmap)
+    query = rng.normal(size=16)
+    assert [d["content"] for _, d in loaded.search(query, 3)] == [d["content"] for _, d in index.search(query, 3)]
+
+    # mutating a mapped index copies it into memory; the file is untouched until save()
+    loaded.remove_source("a.pdf")
+    loaded.add(rng.normal(size=(2, 16)), _docs(2, "c.pdf"), source="c.pdf")
+    assert len(VectorIndex.load(tmp_path)) == 50
+    loaded.save(tmp_path)
+    reloaded = VectorIndex.load(tmp_path)
+    assert len(reloaded) == 2 and reloaded.sources == {"c.pdf": None}
+
+
+def test_save_switches_versions_atomically(tmp_path):
+    rng = np.random.default_rng(3)
+    index = VectorIndex()
+    index.add(rng.normal(size=(4, 8)), _docs(4))
+    index.save(tmp_path)
+    index.add(rng.normal(size=(2, 8)), _docs(2, "b.pdf"))
+    index.save(tmp_path)
+    assert len(VectorIndex.load(tmp_path)) == 6
+
+    # a save that dies before switching meta.json leaves the last good version in place
+    os.makedirs(tmp_path / "v3")
+    np.save(tmp_path / "v3" / "vectors.npy", np.zeros((1, 8), dtype=np.float32))
+    assert len(VectorIndex.load(tmp_path)) == 6
+
+    index.save(tmp_path)                  # reuses v3, drops v1
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_dir()) == ["v2", "v3"]
+    assert len(VectorIndex.load(tmp_path).documents) == 6
+
+
+def test_load_rejects_files_that_disagree(tmp_path):
+    index = VectorIndex()
+    index.add(np.eye(3), _docs(3))
+    index.save(tmp_path)
+    np.save(tmp_path / "v1" / "ids.npy", np.arange(2, dtype=np.int64))
+    with pytest.raises(ValueError, match="inconsistent"):
+        VectorIndex.load(tmp_path)
+
+    index.save(tmp_path)
+    (tmp_path / "v2" / "documents.jsonl").write_text(json.dumps(_docs(1)[0]) + "\n")
+    with pytest.raises(ValueError, match="has 1 rows"):
+        VectorIndex.load(tmp_path).documents
@@ -0,0 +1,64 @@
+# pdf_bot/tests/test_maintenance.py
+import json
+import pathlib
+
+import pytest
+
+from pdf_bot.db import connect_db
+from pdf_bot.maintenance import add_generated_columns, migrate_legacy_chunks
+from pdf_bot.pdf_utils import sha256_text
+from pdf_bot.vector_adapter import Vector
+
+DIM = 1024
+SCHEMA = pathlib.Path(__file__).resolve().parents[1] / "schema.sql"
+
+# document_chunks as it was before the documents table
+BASELINE_DDL = """
+DROP TABLE IF EXISTS document_chunks CASCADE;
+DROP TABLE IF EXISTS documents CASCADE;
+CREATE TABLE document_chunks (
+  id        SERIAL PRIMARY KEY,
+  content   TEXT     NOT NULL,
+  metadata  JSONB    NOT NULL,
+  embedding VECTOR(1024) NOT NULL
+);
+"""
+
+
+@pytest.fixture
+def legacy_conn():
+    conn = connect_db()
+    with conn.cursor() as cur:
+        cur.execute(BASELINE_DDL)
+        for i, (source, content) in enumerate([("a.pdf", "Solar panels"), ("a.pdf", "Wind farms"),
+                                               ("b.pdf", "Tidal power")]):
+            cur.execute("INSERT INTO document_chunks (content, metadata, embedding) VALUES (%s, %s, %s)",
+                        (content, json.dumps({"source": source, "chunk_index": i}),
+                         Vector([1.0] + [0.0] * (DIM - 1))))
+    conn.commit()
+    yield conn
+    conn.rollback()
+    with conn.cursor() as cur:
+        cur.execute(open(SCHEMA).read())   # back to the current schema for the other tests
+    conn.commit()
+    conn.close()
+
+
+def test_migrates_a_baseline_chunk_table(legacy_conn):
+    assert migrate_legacy_chunks(legacy_conn) == 3
+    add_generated_columns(legacy_conn)
+
+    with legacy_conn.cursor() as cur:
+        cur.execute("""
+            SELECT d.source, c.content, c.chunk_hash, c.source
+            FROM document_chunks c JOIN documents d ON d.id = c.document_id ORDER BY c.id
+        """)
+        rows = cur.fetchall()
+        cur.execute("SELECT COUNT(*) FROM document_chunks WHERE content_tsv @@ to_tsquery('english', 'tidal')")
+        assert cur.fetchone()[0] == 1
+    assert [r[0] for r in rows] == ["a.pdf", "a.pdf", "b.pdf"]
+    assert all(chunk_hash == sha256_text(content) for _, content, chunk_hash, _ in rows)
+    assert all(r[3] == r[0] for r in rows)
+
+    assert migrate_legacy_chunks(legacy_conn) == 0  # idempotent
+    add_generated_columns(legacy_conn)
@@ -0,0 +1,67 @@
+# pdf_bot/tests/test_pipeline.py
+import os
+import time
+import pytest
+
+from pdf_bot import pipeline
+from pdf_bot.pipeline import batched, prefetch, iter_parsed_pdfs
+from pdf_bot.pdf_utils import iter_chunks, chunk_text
+
+
+def test_batched_keeps_order_and_remainder():
+    assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_prefetch_is_bounded():
+    produced = []
+    def source():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    stream = prefetch(source(), maxsize=2)
+    assert next(stream) == 0
+    time.sleep(0.2)
+    # one item handed out, at most `maxsize` queued, one blocked in put()
+    assert len(produced) <= 4
+    assert list(stream) == list(range(1, 100))
+
+
+def test_prefetch_reraises_producer_errors():
+    def source():
+        yield 1
+        raise ValueError("corrupt page")
+
+    with pytest.raises(ValueError, match="corrupt page"):
+        list(prefetch(source()))
+
+
+def test_iter_chunks_matches_whole_text_offsets():
+    pages = [f"\n--- Page {i} ---\n" + ("lorem ipsum dolor sit amet " * 40) for i in range(1, 30)]
+    text = "".join(pages)
+    streamed = list(iter_chunks(pages, chunk_size=300, chunk_overlap=50, window=4))
+    assert all(len(c["content"]) <= 300 for c in streamed)
+    assert all(text[c["start"]:c["end"]] == c["content"] for c in streamed)
+    assert streamed[-1]["page_end"] == 29
+    # same order of magnitude as splitting the whole string at once
+    assert abs(len(streamed) - len(chunk_text(text))) <= len(pages)
+
+
+def _flaky_parse(path, skip_hash=None):
+    if "crash" in path:
+        os._exit(1)
+    if "raise" in path:
+        raise RuntimeError("bad worker")
+    return {"path": path, "doc_hash": path, "documents": [], "error": None}
+
+
+def test_iter_parsed_pdfs_survives_dead_and_failing_workers(monkeypatch):
+    monkeypatch.setattr(pipeline, "parse_pdf", _flaky_parse)
+    paths = [f"doc{i}.pdf" for i in range(6)] + ["crash.pdf", "raise.pdf"] + [f"doc{i}.pdf" for i in range(6, 12)]
+
+    results = {r["path"]: r for r in iter_parsed_pdfs(paths, workers=2)}
+
+    assert set(results) == set(paths)
+    assert "BrokenProcessPool" in results["crash.pdf"]["error"]
+    assert "bad worker" in results["raise.pdf"]["error"]
+    assert all(results[p]["error"] is None for p in paths if p.startswith("doc"))
@@ -0,0 +1,42 @@
+# pdf_bot/tests/test_stream_answer.py
+import pdf_bot.genAI as genAI
+from pdf_bot.answer_cache import AnswerCache
+
+
+def _setup(monkeypatch, pieces):
+    cache = AnswerCache(doc_hashes=lambda sources: {s: "h" for s in sources})
+    calls = []
+
+    def fake_stream(system_prompt, query):
+        calls.append(query)
+        yield from pieces
+
+    monkeypatch.setattr(genAI, "get_answer_cache", lambda: cache)
+    monkeypatch.setattr(genAI, "get_embedding", lambda text, model=None: [1.0, 0.0])
+    monkeypatch.setattr(genAI, "retrieve_chunks",
+                        lambda q, k=3, filters=None: [("ctx", {"source": "a.pdf", "chunk_index": 0})])
+    monkeypatch.setattr(genAI, "ask_openai_stream", fake_stream)
+    return cache, calls
+
+
+def test_tokens_are_yielded_as_they_arrive(monkeypatch):
+    _, calls = _setup(monkeypatch, ["The ", "answer", "."])
+    stream = genAI.send_pdf_answer("q?", stream=True)
+    assert next(stream) == "The "          # before the model has finished
+    assert list(stream) == ["answer", "."]
+    assert calls == ["q?"]
+
+
+def test_completed_stream_is_cached(monkeypatch):
+    cache, calls = _setup(monkeypatch, ["The ", "answer."])
+    assert genAI.send_pdf_answer("q?") == "The answer."
+    assert list(genAI.send_pdf_answer("q?", stream=True)) == ["The answer."]
+    assert calls == ["q?"] and cache.snapshot()["hits"] == 1
+
+
+def test_abandoned_stream_is_not_cached(monkeypatch):
+    cache, _ = _setup(monkeypatch, ["The ", "answer."])
+    stream = genAI.send_pdf_answer("q?", stream=True)
+    next(stream)
+    stream.close()
+    assert cache.snapshot()["entries"] == 0
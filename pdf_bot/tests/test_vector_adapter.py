@@ -0,0 +1,48 @@
+# pdf_bot/tests/test_vector_adapter.py
+import io
+import struct
+
+import numpy as np
+
+from pdf_bot.vector_adapter import Vector, copy_binary, encode_text, encode_vector, encode_int4
+
+
+def test_text_literal_round_trips_float32():
+    values = np.random.default_rng(0).normal(size=1024).astype(np.float32)
+    text = Vector(values.tolist()).to_text()
+    parsed = np.array([float(x) for x in text.strip("[]").split(",")], dtype=np.float32)
+    assert np.array_equal(parsed, values)
+
+
+def test_binary_layout_matches_pgvector_recv():
+    payload = Vector([1.0, -2.5, 0.25]).to_binary()
+    dim, unused = struct.unpack(">HH", payload[:4])
+    assert (dim, unused) == (3, 0)
+    assert struct.unpack(">3f", payload[4:]) == (1.0, -2.5, 0.25)
+
+
+class _FakeCursor:
+    def copy_expert(self, sql, buf):
+        self.sql, self.data = sql, buf.read()
+
+
+def test_copy_binary_framing():
+    cur = _FakeCursor()
+    copy_binary(cur, "t", ("id", "name", "embedding"), (encode_int4, encode_text, encode_vector),
+                [(7, None, [1.0, 2.0])])
+    assert "FORMAT binary" in cur.sql
+    data = io.BytesIO(cur.data)
+    assert data.read(11) == b"PGCOPY\n\xff\r\n\x00"
+    data.read(8)  # flags + header extension
+    assert struct.unpack(">h", data.read(2))[0] == 3
+    assert struct.unpack(">i", data.read(4))[0] == 4 and struct.unpack(">i", data.read(4))[0] == 7
+    assert struct.unpack(">i", data.read(4))[0] == -1  # NULL name
+    assert struct.unpack(">i", data.read(4))[0] == 4 + 2 * 4
+    data.read(12)
+    assert struct.unpack(">h", data.read(2))[0] == -1  # trailer
+
+
+def test_halfvec_binary_layout():
+    payload = Vector([1.0, -2.5]).to_binary(half=True)
+    assert struct.unpack(">HH", payload[:4]) == (2, 0)
+    assert np.frombuffer(payload[4:], dtype=">f2").tolist() == [1.0, -2.5]
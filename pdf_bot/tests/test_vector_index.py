@@ -0,0 +1,44 @@
+# pdf_bot/tests/test_vector_index.py
+import math
+
+import pytest
+
+from pdf_bot.vector_index import index_expression, operator_class, nearest_sql, max_distance_for
+
+
+def test_compact_index_expressions():
+    assert index_expression("none", storage="vector") == "embedding"
+    assert index_expression("halfvec", dim=8, storage="vector") == "(embedding::halfvec(8))"
+    assert index_expression("halfvec", dim=8, storage="halfvec") == "embedding"
+    assert index_expression("binary", dim=8) == "(binary_quantize(embedding)::bit(8))"
+    assert operator_class("none", "cosine", "halfvec") == "halfvec_cosine_ops"
+    assert operator_class("binary", "l2", "vector") == "bit_hamming_ops"
+    with pytest.raises(ValueError):
+        index_expression("int4")
+
+
+def test_quantized_search_rescores_exactly():
+    sql = nearest_sql("id", "l2", "binary", dim=8, storage="vector")
+    coarse, rescore = sql.split(") candidates) scored")
+    # the coarse scan orders by the indexed expression, over %(rescore)s candidates...
+    assert "ORDER BY (binary_quantize(embedding)::bit(8)) <~> binary_quantize(%(vector)s)" in coarse
+    assert "LIMIT %(rescore)s" in coarse
+    # ...which are re-ranked by exact float distance
+    assert sql.startswith("SELECT * FROM (SELECT id, embedding <-> %(vector)s AS distance")
+    assert rescore.strip() == "ORDER BY distance LIMIT %(limit)s"
+
+    plain = nearest_sql("id", "cosine", "none", storage="halfvec")
+    assert "embedding <=> %(vector)s::halfvec" in plain and "%(rescore)s" not in plain
+
+
+def test_filter_and_threshold_are_pushed_down():
+    sql = nearest_sql("id", "l2", "none", where="source = ANY(%(filter_sources)s)", max_distance=True)
+    assert "FROM document_chunks WHERE source = ANY(%(filter_sources)s) ORDER BY" in sql
+    assert "scored WHERE distance < %(max_distance)s ORDER BY distance" in sql
+
+
+def test_similarity_floor_as_distance_between_unit_vectors():
+    a, b = [1.0, 0.0], [0.6, 0.8]   # cosine 0.6
+    assert max_distance_for(0.6, "l2") == pytest.approx(math.dist(a, b))
+    assert max_distance_for(0.6, "cosine") == pytest.approx(0.4)
+    assert max_distance_for(0.6, "ip") == pytest.approx(-0.6)
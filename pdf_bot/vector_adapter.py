@@ -0,0 +1,89 @@
+# vector_adapter.py
+"""
+psycopg2 adapters for pgvector values.
+
+psycopg2 can only bind parameters as text, so a query vector wrapped in
+Vector(...) is rendered in one C-level %-format call with float32 round-trip
+precision ("%.9g") instead of str() on every element. Only Vector is
+adapted; plain lists and arrays keep psycopg2's own handling. Bulk loads skip text entirely: `copy_binary`
+writes COPY ... (FORMAT binary) rows, and vectors go over the wire in
+pgvector's binary representation (int16 dim, int16 unused, float4[] BE;
+float2[] for halfvec columns).
+"""
+import io
+import json
+import struct
+
+import numpy as np
+from psycopg2.extensions import AsIs, register_adapter
+
+_TEXT_FORMATS = {}
+
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_COPY_TRAILER = struct.pack(">h", -1)
+_NULL = struct.pack(">i", -1)
+
+
+class Vector:
+    """A float32 vector to be sent to Postgres as a pgvector `vector`."""
+    __slots__ = ("array",)
+
+    def __init__(self, values):
+        self.array = np.asarray(values, dtype=np.float32).ravel()
+
+    def to_text(self):
+        n = len(self.array)
+        fmt = _TEXT_FORMATS.get(n)
+        if fmt is None:
+            fmt = _TEXT_FORMATS[n] = "[" + ",".join(["%.9g"] * n) + "]"
+        return fmt % tuple(self.array.tolist())
+
+    def to_binary(self, half=False):
+        """pgvector's binary (recv) form; `half` gives halfvec's float16 layout."""
+        return struct.pack(">HH", len(self.array), 0) + self.array.astype(">f2" if half else ">f4").tobytes()
+
+
+def _adapt_vector(vector):
+    return AsIs("'" + vector.to_text() + "'::vector")
+
+
+register_adapter(Vector, _adapt_vector)
+
+
+# ─── COPY (FORMAT binary) ──────────────────────────────────────────────────
+def _field(payload):
+    return _NULL if payload is None else struct.pack(">i", len(payload)) + payload
+
+
+def encode_text(value):
+    return None if value is None else value.encode("utf-8")
+
+
+def encode_jsonb(value):
+    return b"\x01" + json.dumps(value).encode("utf-8")  # jsonb binary = version byte + text
+
+
+def encode_int4(value):
+    return None if value is None else struct.pack(">i", value)
+
+
+def encode_vector(value):
+    return (value if isinstance(value, Vector) else Vector(value)).to_binary()
+
+
+def encode_halfvec(value):
+    return (value if isinstance(value, Vector) else Vector(value)).to_binary(half=True)
+
+
+def copy_binary(cur, table, columns, encoders, rows):
+    """COPY `rows` into `table` in binary format; `encoders` turn each column value into bytes."""
+    buf = io.BytesIO()
+    buf.write(_COPY_HEADER)
+    ncols = struct.pack(">h", len(columns))
+    for row in rows:
+        buf.write(ncols)
+        for encode, value in zip(encoders, row):
+            buf.write(_field(encode(value)))
+    buf.write(_COPY_TRAILER)
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT binary)", buf)
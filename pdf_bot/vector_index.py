@@ -0,0 +1,245 @@
+# vector_index.py
+"""
+Approximate nearest-neighbour (pgvector HNSW / IVFFlat) index management for
+document_chunks.embedding, plus the per-query recall/speed settings.
+
+    python -m pdf_bot.vector_index hnsw --metric cosine --m 16 --ef-construction 64
+    python -m pdf_bot.vector_index ivfflat --lists 1000
+    python -m pdf_bot.vector_index hnsw --quantization binary --storage halfvec
+
+Compact representations (see benchmarks/bench_quantization.py):
+- storage "halfvec" keeps the column itself in float16 (half the table size);
+- quantization "halfvec" / "binary" index a float16 / 1-bit copy of each
+  vector (2x / 32x smaller index). Searches then take RESCORE_FACTOR * k
+  candidates from the compact index and re-rank them by exact distance.
+"""
+import argparse
+import math
+import os
+
+from .db import connect_db
+
+# metric name -> (operator class, distance operator)
+METRICS = {
+    "l2":     ("vector_l2_ops", "<->"),
+    "cosine": ("vector_cosine_ops", "<=>"),
+    "ip":     ("vector_ip_ops", "<#>"),
+}
+
+# quantization -> {metric: operator class} for the compact index expression
+QUANTIZATIONS = {
+    "none":    {"l2": "vector_l2_ops", "cosine": "vector_cosine_ops", "ip": "vector_ip_ops"},
+    "halfvec": {"l2": "halfvec_l2_ops", "cosine": "halfvec_cosine_ops", "ip": "halfvec_ip_ops"},
+    "binary":  {"l2": "bit_hamming_ops", "cosine": "bit_hamming_ops", "ip": "bit_hamming_ops"},
+}
+STORAGE_TYPES = ("vector", "halfvec")
+
+VECTOR_METRIC = os.getenv("VECTOR_METRIC", "l2")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1024"))
+# column type of document_chunks.embedding; must match the database (see set_embedding_storage)
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "vector")
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", "10"))   # candidates per result when quantized
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+# below this many rows a sequential scan is cheap and exact, so skip the index
+EXACT_SEARCH_MAX_ROWS = int(os.getenv("EXACT_SEARCH_MAX_ROWS", "20000"))
+# filtered ANN scans keep going until enough rows pass the filter (pgvector >= 0.8; "off" before)
+ITERATIVE_SCAN = os.getenv("VECTOR_ITERATIVE_SCAN", "relaxed_order")
+
+INDEX_NAME = "document_chunks_embedding_idx"
+
+
+def distance_operator(metric=VECTOR_METRIC):
+    if metric not in METRICS:
+        raise ValueError(f"Unknown vector metric {metric!r}; expected one of {sorted(METRICS)}")
+    return METRICS[metric][1]
+
+
+def max_distance_for(similarity, metric=VECTOR_METRIC):
+    """Distance under `metric` matching cosine `similarity` between unit-length vectors."""
+    distance_operator(metric)  # validates the metric name
+    if metric == "l2":
+        return math.sqrt(max(0.0, 2.0 - 2.0 * similarity))
+    if metric == "cosine":
+        return 1.0 - similarity
+    return -similarity  # <#> is the negative inner product
+
+
+def _check_quantization(quantization, storage):
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantization!r}; expected one of {sorted(QUANTIZATIONS)}")
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Unknown embedding storage {storage!r}; expected one of {STORAGE_TYPES}")
+
+
+def index_expression(quantization=VECTOR_QUANTIZATION, column="embedding", dim=EMBEDDING_DIM,
+                     storage=EMBEDDING_STORAGE):
+    """What the ANN index is built over (and coarse searches must ORDER BY)."""
+    _check_quantization(quantization, storage)
+    if quantization == "binary":
+        return f"(binary_quantize({column})::bit({dim}))"
+    if quantization == "halfvec" and storage != "halfvec":
+        return f"({column}::halfvec({dim}))"
+    return column
+
+
+def operator_class(quantization=VECTOR_QUANTIZATION, metric=VECTOR_METRIC, storage=EMBEDDING_STORAGE):
+    distance_operator(metric)  # validates the metric name
+    _check_quantization(quantization, storage)
+    if quantization == "none" and storage == "halfvec":
+        quantization = "halfvec"  # the column itself is float16
+    return QUANTIZATIONS[quantization][metric]
+
+
+def query_param(param="%(vector)s", storage=EMBEDDING_STORAGE):
+    """A query-vector placeholder cast to the column's type (the adapter sends ::vector)."""
+    return f"{param}::halfvec" if storage == "halfvec" else param
+
+
+def nearest_sql(columns="id", metric=VECTOR_METRIC, quantization=VECTOR_QUANTIZATION,
+                table="document_chunks", dim=EMBEDDING_DIM, storage=EMBEDDING_STORAGE,
+                where=None, max_distance=False, query="%(vector)s"):
+    """
+    A SELECT of `columns` plus the exact `distance` for the %(limit)s rows
+    nearest %(vector)s, nearest first. With a quantized index the ANN scan
+    orders by the compact expression, takes %(rescore)s rows and re-scores
+    them exactly; %(rescore)s is ignored otherwise.
+
+    `where` (SQL over `table`'s columns) restricts the candidates; with
+    `max_distance` only rows closer than %(max_distance)s are returned.
+    `query` replaces the %(vector)s placeholder, e.g. with an outer column
+    inside a LATERAL join.
+    """
+    op = distance_operator(metric)
+    vector = query_param(query, storage=storage)
+    if quantization == "none":
+        order, limit = f"embedding {op} {vector}", "%(limit)s"
+    else:
+        expr = index_expression(quantization, "embedding", dim, storage)
+        if quantization == "binary":
+            order = f"{expr} <~> binary_quantize({vector})"
+        else:
+            order = f"{expr} {op} {query}::halfvec({dim})"
+        limit = "%(rescore)s"
+    filtered = f" WHERE {where}" if where else ""
+    threshold = " WHERE distance < %(max_distance)s" if max_distance else ""
+    # the outer ORDER BY also restores exact order after a relaxed iterative scan
+    return (f"SELECT * FROM (SELECT {columns}, embedding {op} {vector} AS distance FROM ("
+            f"SELECT {columns}, embedding FROM {table}{filtered} ORDER BY {order} LIMIT {limit}"
+            f") candidates) scored{threshold} ORDER BY distance LIMIT %(limit)s")
+
+
+def set_embedding_storage(conn, storage, table="document_chunks", dim=EMBEDDING_DIM, name=INDEX_NAME):
+    """
+    Convert the embedding column to `storage` ("vector" or "halfvec"). The ANN
+    index is dropped first (its operator class is type-specific); rebuild it
+    with create_vector_index afterwards. Rewrites the table.
+    """
+    _check_quantization("none", storage)
+    with conn.cursor() as cur:
+        cur.execute(f'DROP INDEX IF EXISTS "{name}"')
+        cur.execute(f"ALTER TABLE {table} ALTER COLUMN embedding TYPE {storage}({dim}) "
+                    f"USING embedding::{storage}({dim})")
+    conn.commit()
+
+
+def estimated_rows(cur, table="document_chunks"):
+    """Planner row estimate (pg_class.reltuples) — free, unlike COUNT(*)."""
+    cur.execute("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = %s::regclass", (table,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def create_vector_index(conn, method="hnsw", metric=VECTOR_METRIC, m=16, ef_construction=64,
+                        lists=None, table="document_chunks", column="embedding", name=INDEX_NAME,
+                        concurrently=True, quantization=VECTOR_QUANTIZATION, storage=EMBEDDING_STORAGE,
+                        dim=EMBEDDING_DIM):
+    """
+    (Re)build the ANN index on `table.column`, or on its float16 / binary
+    form when `quantization` is "halfvec" / "binary".
+
+    HNSW takes `m` / `ef_construction`; IVFFlat takes `lists` (default
+    rows/1000, or sqrt(rows) above a million rows, per the pgvector docs).
+    """
+    opclass = operator_class(quantization, metric, storage)
+    expr = index_expression(quantization, column, dim, storage)
+    if method == "hnsw":
+        options = f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+    elif method == "ivfflat":
+        if lists is None:
+            with conn.cursor() as cur:
+                rows = estimated_rows(cur, table)
+            lists = max(1, rows // 1000 if rows <= 1_000_000 else int(rows ** 0.5))
+        options = f"WITH (lists = {int(lists)})"
+    else:
+        raise ValueError(f"Unknown index method {method!r}; expected 'hnsw' or 'ivfflat'")
+
+    concurrent = "CONCURRENTLY " if concurrently else ""
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f'DROP INDEX {concurrent}IF EXISTS "{name}"')
+            cur.execute(
+                f'CREATE INDEX {concurrent}"{name}" ON {table} '
+                f"USING {method} ({expr} {opclass}) {options}"
+            )
+    finally:
+        conn.autocommit = autocommit
+
+
+def configure_search(cur, ef_search=None, probes=None, exact=None, table="document_chunks",
+                     where=None, params=None):
+    """
+    Apply per-query ANN settings for the current transaction.
+
+    `ef_search` (HNSW) and `probes` (IVFFlat) trade speed for recall. With
+    `exact=None` small tables (< EXACT_SEARCH_MAX_ROWS) are searched exactly;
+    `exact=True/False` forces it either way. Returns True if exact.
+
+    With a filter (`where` + its `params`), the size of the matching subset
+    decides instead: a small one is read through its own indexes and scored
+    exactly, a large one uses the ANN index with iterative scans so the
+    filter doesn't starve the result.
+    """
+    if exact is None:
+        if where:
+            cur.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM {table} WHERE {where} LIMIT %(cap)s) s",
+                        {**(params or {}), "cap": EXACT_SEARCH_MAX_ROWS})
+            exact = cur.fetchone()[0] < EXACT_SEARCH_MAX_ROWS
+        else:
+            exact = estimated_rows(cur, table) < EXACT_SEARCH_MAX_ROWS
+    if exact:
+        # bitmap scans (e.g. on the filter's indexes) stay available
+        cur.execute("SELECT set_config('enable_indexscan', 'off', true)")
+    else:
+        cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(ef_search or HNSW_EF_SEARCH),))
+        cur.execute("SELECT set_config('ivfflat.probes', %s, true)", (str(probes or IVFFLAT_PROBES),))
+        if where and ITERATIVE_SCAN != "off":
+            cur.execute("SELECT set_config('hnsw.iterative_scan', %s, true)", (ITERATIVE_SCAN,))
+            # IVFFlat only has the relaxed mode
+            cur.execute("SELECT set_config('ivfflat.iterative_scan', 'relaxed_order', true)")
+    return exact
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the ANN index on document_chunks.embedding.")
+    parser.add_argument("method", choices=["hnsw", "ivfflat"])
+    parser.add_argument("--metric", choices=sorted(METRICS), default=VECTOR_METRIC)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--quantization", choices=sorted(QUANTIZATIONS), default=VECTOR_QUANTIZATION)
+    parser.add_argument("--storage", choices=STORAGE_TYPES, default=None,
+                        help="convert the embedding column first (set EMBEDDING_STORAGE to match)")
+    args = parser.parse_args()
+
+    conn = connect_db()
+    storage = args.storage or EMBEDDING_STORAGE
+    if args.storage:
+        set_embedding_storage(conn, args.storage)
+    create_vector_index(conn, args.method, args.metric, args.m, args.ef_construction, args.lists,
+                        quantization=args.quantization, storage=storage)
+    conn.close()
+    print(f"Built {args.method} index {INDEX_NAME} ({args.metric}, {args.quantization} over {storage})")
@@ -1,8 +1,15 @@
 # sql_bot/database.py
 import os
+import time
 from dotenv import load_dotenv, find_dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, exc, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from db_pool import (
+    DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_PRE_PING, DB_POOL_RECYCLE,
+    WaitStats, hold_connections, register_pool,
+)
 
 # Load env
 load_dotenv(find_dotenv())
@@ -12,9 +19,57 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL not set in .env")
 
-engine = create_engine(DATABASE_URL, echo=False, future=True)
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = WaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        busy = self.checkedout() >= self.size() + max(self._max_overflow, 0)
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.waits.timeout()
+            raise
+        finally:
+            self.waits.checkout(time.perf_counter() - start, busy)
+
+
+engine = create_engine(
+    DATABASE_URL, echo=False, future=True,
+    poolclass=TimedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_POOL_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_use_lifo=True,  # keep reusing warm connections; idle extras can time out server-side
+)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+
+def warm_pool(n=None):
+    """Open up to `n` (default: pool size) connections ahead of the first request; returns how many were opened."""
+    before = engine.pool.checkedin()
+    hold_connections(engine.connect, n, DB_POOL_SIZE)
+    return max(engine.pool.checkedin() - before, 0)
+
+
+def pool_stats():
+    """Open / idle / checked-out counts plus checkout wait times, like pdf_bot.db.pool_stats()."""
+    pool = engine.pool
+    stats = pool.waits.snapshot()
+    stats.update(size=pool.size(), max_overflow=DB_POOL_MAX_OVERFLOW, idle=pool.checkedin(),
+                 checked_out=pool.checkedout(), overflow=max(pool.overflow(), 0))
+    return stats
+
+
+register_pool("SQL", warm_pool, pool_stats)
+
 def bootstrap_indexes():
     """Create helpful extensions/indexes if possible."""
     with engine.begin() as conn:
@@ -1,5 +1,6 @@
 # sql_bot/main.py
 import re
+import time
 import pandas as pd
 from sqlalchemy import text
 
@@ -7,6 +8,11 @@ from .nlp_to_sql import generate_sql
 from .summarizer import summarize
 from .database import SessionLocal
 from .web_qa import answer_from_web
+from .sql_cache import get_sql_cache
+from .result_cache import get_result_cache
+from .query_guard import (
+    QueryRejected, begin_read_only, check as check_plan, is_timeout, SQL_STATEMENT_TIMEOUT_MS,
+)
 
 
 def _cleanup_sql(raw_sql: str) -> str:
@@ -25,21 +31,50 @@ def _is_safe_select(sql: str) -> bool:
     return re.search(banned, sql, flags=re.IGNORECASE) is None
 
 
+def _run_select(session, sql: str):
+    """
+    (DataFrame, cached, plan) for a validated SELECT, run read-only under the
+    statement timeout after the planner check (which may add a LIMIT or raise
+    QueryRejected). Served from the result cache if no table it reads changed,
+    together with the plan of the run that filled it.
+    """
+    begin_read_only(session)
+    try:
+        results = get_result_cache()
+        key = results.key(session, sql)
+        hit = results.get(key)
+        if hit is not None:
+            df, plan = hit
+            return df, True, plan
+        sql, plan = check_plan(session, sql)
+        start = time.perf_counter()
+        result = session.execute(text(sql))
+        df = pd.DataFrame(result.fetchall(), columns=result.keys())
+        results.put(key, df, time.perf_counter() - start, plan)
+        return df, False, plan
+    finally:
+        session.rollback()  # end the read-only transaction; nothing in it needs keeping
+
+
 def handle_query(question: str):
-    # 1) LLM → SQL
-    raw_sql = generate_sql(question)
-    clean_sql = _cleanup_sql(raw_sql)
+    # 1) LLM → SQL, unless this question (or, optionally, a paraphrase) was translated before
+    sql_cache = get_sql_cache()
+    clean_sql = sql_cache.lookup(question)
+    from_cache = clean_sql is not None
+    if not from_cache:
+        raw_sql = generate_sql(question)
+        clean_sql = _cleanup_sql(raw_sql)
     if not _is_safe_select(clean_sql):
         return {"error": "Generated SQL was not a single safe SELECT.", "sql": clean_sql}
 
     session = SessionLocal()
     df = pd.DataFrame()
+    cached, plan = False, None
     try:
-        # 2) Try DB first
-        result = session.execute(text(clean_sql))
-        rows = result.fetchall()
-        cols = result.keys()
-        df = pd.DataFrame(rows, columns=cols)
+        # 2) Try DB first (or the cached result of the same SQL over unchanged tables)
+        df, cached, plan = _run_select(session, clean_sql)
+        if not df.empty and not from_cache:
+            sql_cache.store(question, clean_sql)
 
         if df.empty:
             # 2a) Web fallback
@@ -50,19 +85,20 @@ def handle_query(question: str):
                     {"q": question, "a": ans, "u": src}
                 )
                 session.commit()
+                get_result_cache().invalidate_table("web_facts")
 
                 # 2b) Re-run LLM SQL now that web_facts has data
                 raw_sql2 = generate_sql(question)
                 clean_sql2 = _cleanup_sql(raw_sql2)
                 if _is_safe_select(clean_sql2):
-                    result2 = session.execute(text(clean_sql2))
-                    rows2 = result2.fetchall()
-                    cols2 = result2.keys()
-                    df = pd.DataFrame(rows2, columns=cols2)
+                    df, cached, plan = _run_select(session, clean_sql2)
                     clean_sql = clean_sql2  # show the SQL that produced rows
+                    if not df.empty:
+                        sql_cache.store(question, clean_sql2)
 
                 # 2c) Safety net: if still empty, do robust direct select or return scraped
                 if df.empty:
+                    cached = False
                     result3 = session.execute(text("""
                         SELECT answer, source_url, fetched_at
                         FROM web_facts
@@ -111,14 +147,19 @@ def handle_query(question: str):
                             # broadcast the latest source_url to the current df
                             df["source_url"] = r["source_url"]
 
+    except QueryRejected as e:
+        return {"error": str(e), "sql": clean_sql, "plan": e.plan}
     except Exception as e:
+        if is_timeout(e):
+            return {"error": f"Query cancelled after the {SQL_STATEMENT_TIMEOUT_MS / 1000:g}s statement timeout.",
+                    "sql": clean_sql, "plan": plan}
         return {"error": str(e), "sql": clean_sql}
     finally:
         session.close()
 
     # 3) Summarize
     summary = summarize(question, df.to_dict(orient="records"))
-    return {"table": df, "summary": summary, "sql": clean_sql}
+    return {"table": df, "summary": summary, "sql": clean_sql, "cached": cached, "plan": plan}
 
 # # sql_bot/main.py
 # import re
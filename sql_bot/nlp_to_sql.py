@@ -1,14 +1,14 @@
 # sql_bot/nlp_to_sql.py
 
 import os
+import time
 from dotenv import load_dotenv
-from sqlalchemy import inspect
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
-from .database import engine
 from .prompt_templates import SQL_PROMPT
+from .schema_selector import select_schema
 
 load_dotenv()
 
@@ -30,20 +30,21 @@ chain = prompt | llm | StrOutputParser()
 
 def generate_sql(question: str) -> str:
     """
-    Introspect the DB schema, feed it to the LangChain pipeline,
-    and return a single SQL query string.
+    Feed the tables relevant to `question` (from the cached schema) to the
+    LangChain pipeline and return a single SQL query string.
     """
-    # Reflect schema
-    inspector = inspect(engine)
-    table_info_lines = []
-    for table_name in inspector.get_table_names():
-        cols = inspector.get_columns(table_name)
-        col_defs = ", ".join(f"{c['name']} {c['type']}" for c in cols)
-        table_info_lines.append(f"{table_name}({col_defs})")
-    table_info = "\n".join(table_info_lines)
+    start = time.perf_counter()
+
+    # Only the relevant tables (plus FK neighbours) of the cached schema
+    table_info, stats = select_schema(question)
 
     # Invoke the chain
     sql = chain.invoke({"table_info": table_info, "question": question}).strip()
+
+    saved = 1 - stats["tokens"] / stats["full_tokens"] if stats["full_tokens"] else 0.0
+    print(f"NL→SQL: {stats['tables']}/{stats['total_tables']} tables, {stats['tokens']} schema tokens "
+          f"(full schema {stats['full_tokens']}, {saved:.0%} saved), selection {stats['select_ms']:.0f} ms, "
+          f"total {1000 * (time.perf_counter() - start):.0f} ms")
     return sql
 
 
@@ -0,0 +1,90 @@
+# sql_bot/query_guard.py
+"""
+Planner-based limits for generated SQL, checked before it runs.
+
+Each generated SELECT runs in its own read-only transaction with a
+`SET LOCAL statement_timeout`, so nothing it does can write and the limit
+never leaks into the pooled connection. Before execution, EXPLAIN
+(no ANALYZE) estimates its cost and row count:
+
+- above SQL_MAX_ROWS estimated rows, the query is wrapped in
+  `LIMIT SQL_AUTO_LIMIT` (SQL_OVER_LIMIT="limit") or rejected ("reject");
+- above SQL_MAX_COST planner cost units (after any added LIMIT), it is
+  rejected.
+
+The estimate and the action taken are returned so callers can show them.
+"""
+import json
+import os
+
+from sqlalchemy import text
+
+SQL_MAX_COST = float(os.getenv("SQL_MAX_COST", "1e7"))                     # 0 disables
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "100000"))                    # 0 disables
+SQL_OVER_LIMIT = os.getenv("SQL_OVER_LIMIT", "limit")                      # "limit" or "reject"
+SQL_AUTO_LIMIT = int(os.getenv("SQL_AUTO_LIMIT", "1000"))
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "15000"))
+
+QUERY_CANCELED = "57014"   # SQLSTATE raised when statement_timeout fires
+
+
+class QueryRejected(Exception):
+    """The planner's estimate for a generated query is over the configured limits."""
+
+    def __init__(self, message, plan):
+        super().__init__(message)
+        self.plan = plan
+
+
+def begin_read_only(session):
+    """Start the session's next transaction as read-only with the statement timeout."""
+    session.rollback()  # SET TRANSACTION must be the first statement of a transaction
+    session.execute(text("SET TRANSACTION READ ONLY"))
+    session.execute(text("SELECT set_config('statement_timeout', :ms, true)"),
+                    {"ms": str(SQL_STATEMENT_TIMEOUT_MS)})
+
+
+def explain(session, sql):
+    """Planner estimate for `sql`: dict with cost and rows."""
+    plan = session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    top = plan[0]["Plan"]
+    return {"cost": top["Total Cost"], "rows": top["Plan Rows"]}
+
+
+def with_limit(sql, limit):
+    return f"SELECT * FROM ({sql}) AS limited LIMIT {int(limit)}"
+
+
+def check(session, sql):
+    """
+    (sql to run, plan) for a generated SELECT; `sql` gains a LIMIT if the
+    row estimate is too high. plan has cost, rows, action ("ok" or
+    "limited") and, if limited, limit. Raises QueryRejected.
+    """
+    plan = explain(session, sql)
+    plan["action"] = "ok"
+    if SQL_MAX_ROWS and plan["rows"] > SQL_MAX_ROWS:
+        if SQL_OVER_LIMIT == "reject":
+            plan["action"] = "rejected"
+            raise QueryRejected(
+                f"Query rejected: the planner expects about {plan['rows']:,.0f} rows "
+                f"(limit {SQL_MAX_ROWS:,}). Try narrowing the question.", plan)
+        sql = with_limit(sql, SQL_AUTO_LIMIT)
+        limited = explain(session, sql)
+        plan.update(action="limited", limit=SQL_AUTO_LIMIT, limited_cost=limited["cost"],
+                    limited_rows=limited["rows"])
+    cost = plan.get("limited_cost", plan["cost"])
+    if SQL_MAX_COST and cost > SQL_MAX_COST:
+        plan["action"] = "rejected"
+        raise QueryRejected(
+            f"Query rejected: estimated cost {cost:,.0f} is above the limit of {SQL_MAX_COST:,.0f}. "
+            f"Try narrowing the question.", plan)
+    return sql, plan
+
+
+def is_timeout(exc):
+    """Whether `exc` (a DBAPI or SQLAlchemy error) was raised by statement_timeout."""
+    orig = getattr(exc, "orig", exc)
+    return getattr(orig, "pgcode", None) == QUERY_CANCELED
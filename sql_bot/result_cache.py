@@ -0,0 +1,290 @@
+# sql_bot/result_cache.py
+"""
+In-process cache of SELECT results, keyed by the normalised SQL text and
+the current version of every table it reads.
+
+A table's version is the number of write statements logged for it in
+table_changes by a statement-level trigger on INSERT/UPDATE/DELETE/TRUNCATE,
+installed per table (`python -m sql_bot.result_cache --install-counters
+orders products`). The log is insert-only, so writers never wait on each
+other, and a statement's row only becomes visible when its transaction
+commits. The versions of all tables a query uses are read in one query per
+request, so a committed write to any of them changes the key. Only tables
+carrying the trigger are tracked: SQL that reads a table without it is
+never cached. As a backstop (writes bypassing the trigger, e.g. a replica
+or a restore), entries also expire after RESULT_CACHE_TTL seconds.
+
+Results are stored column by column, pickled and zlib-compressed, and the
+cache holds at most RESULT_CACHE_MAX_BYTES of them (least recently used
+dropped first). SQL that reads no known table, reads an untracked one or
+calls a volatile function (now(), random(), ...) is never cached.
+"""
+import argparse
+import os
+import pickle
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import pandas as pd
+from sqlalchemy import text
+
+from .database import engine
+from .schema_catalog import get_schema_catalog
+
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 << 20)))  # 0 disables
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))                    # seconds
+# one result may take at most this share of the budget
+MAX_ENTRY_SHARE = 0.25
+
+VOLATILE = re.compile(
+    r"\b(now|random|clock_timestamp|statement_timestamp|timeofday|gen_random_uuid|nextval|"
+    r"current_date|current_time|current_timestamp|localtime|localtimestamp)\b", re.IGNORECASE)
+# string literals and quoted identifiers keep their case
+QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+TRIGGER_NAME = "bump_table_version"
+
+# (name, version, has the trigger) per table
+VERSIONS_SQL = text("""
+    SELECT t.name,
+           COALESCE((SELECT SUM(c.changes) FROM table_changes c WHERE c.table_name = t.name), 0),
+           EXISTS (SELECT 1 FROM pg_trigger tg
+                   JOIN pg_class c ON c.oid = tg.tgrelid
+                   JOIN pg_namespace n ON n.oid = c.relnamespace
+                   WHERE c.relname = t.name AND n.nspname = current_schema()
+                     AND tg.tgname = :trigger AND tg.tgenabled <> 'D')
+    FROM unnest(CAST(:tables AS text[])) AS t(name)
+    ORDER BY t.name
+""")
+
+# one row per table; concurrent inserts are outside the DELETE's snapshot and survive
+COMPACT_SQL = text("""
+    WITH gone AS (DELETE FROM table_changes RETURNING table_name, changes)
+    INSERT INTO table_changes (table_name, changes)
+    SELECT table_name, SUM(changes) FROM gone GROUP BY table_name
+""")
+
+
+def normalize_sql(sql):
+    """Whitespace collapsed, trailing ';' dropped, lower-cased outside quotes."""
+    parts = QUOTED.split(re.sub(r"\s+", " ", sql).strip().rstrip(";").strip())
+    return "".join(p if i % 2 else p.lower() for i, p in enumerate(parts))
+
+
+def tables_in(sql, known_tables):
+    """Known tables named in `sql` (a superset is fine: it only costs extra invalidation)."""
+    words = set(re.findall(r"[a-z_][a-z0-9_$]*", sql.lower()))
+    return sorted(t for t in known_tables if t.lower() in words)
+
+
+def _pack(df):
+    """Column names plus one list per column (by position, so duplicate names survive), compressed."""
+    columns = (list(df.columns), [df.iloc[:, i].tolist() for i in range(df.shape[1])])
+    return zlib.compress(pickle.dumps(columns, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _unpack(blob):
+    names, data = pickle.loads(zlib.decompress(blob))
+    df = pd.DataFrame(dict(enumerate(data)), columns=range(len(names)))
+    df.columns = names
+    return df
+
+
+class ResultCache:
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES, ttl=RESULT_CACHE_TTL, known_tables=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._known_tables = known_tables or (lambda: get_schema_catalog().current()["tables"])
+        self._entries = OrderedDict()      # key -> (blob, created, seconds to compute, plan)
+        self._bytes = 0
+        self._warned = set()               # untracked tables already reported
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "uncacheable": 0, "stored": 0, "evictions": 0,
+                      "saved_seconds": 0.0}
+
+    def key(self, session, sql):
+        """Cache key for `sql` at the current table versions, or None if it must not be cached."""
+        if not self.max_bytes:
+            return None
+        normalized = normalize_sql(sql)
+        tables = tables_in(normalized, self._known_tables()) if not VOLATILE.search(normalized) else []
+        if not tables:
+            with self._lock:
+                self.stats["uncacheable"] += 1
+            return None
+        try:
+            with session.begin_nested():  # a failure here must not end the caller's transaction
+                versions = session.execute(VERSIONS_SQL, {"tables": tables,
+                                                          "trigger": TRIGGER_NAME}).fetchall()
+        except Exception as e:
+            print(f"Result cache disabled for this query (table versions unavailable): {e}")
+            with self._lock:
+                self.stats["uncacheable"] += 1
+            return None
+        untracked = [name for name, _, tracked in versions if not tracked]
+        if untracked:
+            with self._lock:
+                self.stats["uncacheable"] += 1
+                new = set(untracked) - self._warned
+                self._warned |= new
+            if new:
+                print(f"Result cache skips queries on {', '.join(sorted(new))}: no change counter "
+                      f"(python -m sql_bot.result_cache --install-counters TABLE ...)")
+            return None
+        return normalized, tuple((name, version) for name, version, _ in versions)
+
+    def get(self, key):
+        """(DataFrame, plan it was computed under) cached for `key`, or None."""
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            self.stats["saved_seconds"] += entry[2]
+            blob, plan = entry[0], entry[3]
+        return _unpack(blob), plan
+
+    def put(self, key, df, seconds, plan=None):
+        """
+        Store `df` (which took `seconds` to compute) if it fits the budget,
+        with the query-guard `plan` it ran under (e.g. an added LIMIT).
+        """
+        if key is None:
+            return
+        blob = _pack(df)
+        if len(blob) > self.max_bytes * MAX_ENTRY_SHARE:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (blob, time.monotonic(), seconds, plan)
+            self._bytes += len(blob)
+            self.stats["stored"] += 1
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def invalidate_table(self, table):
+        """Forget results that read `table` (for writes this process just made)."""
+        with self._lock:
+            stale = [key for key in self._entries if any(row[0] == table for row in key[1])]
+            for key in stale:
+                self._drop(key)
+
+    def _drop(self, key):
+        blob = self._entries.pop(key)[0]
+        self._bytes -= len(blob)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
+
+
+def result_cache_stats():
+    """Hits, misses, entries, bytes used and query seconds saved."""
+    return get_result_cache().snapshot()
+
+
+# ─── Change counters ───────────────────────────────────────────────────────
+def install_change_counters(tables, bind=engine):
+    """
+    Add the change-logging trigger to `tables` (opt-in: only their queries
+    become cacheable). Cost to writers: one extra row inserted into
+    table_changes per write statement. Inserts take no row locks, so
+    concurrent writers are not serialised, but the log grows until
+    compact_change_counters() runs. Needs table ownership, not superuser;
+    idempotent.
+    """
+    with bind.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS table_changes (
+              table_name TEXT   NOT NULL,
+              changes    BIGINT NOT NULL DEFAULT 1
+            )
+        """))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS table_changes_table_idx ON table_changes (table_name)"))
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {TRIGGER_NAME}() RETURNS trigger AS $$
+            BEGIN
+              INSERT INTO table_changes (table_name) VALUES (TG_TABLE_NAME);
+              RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """))
+        for table in tables:
+            conn.execute(text(f'DROP TRIGGER IF EXISTS {TRIGGER_NAME} ON "{table}"'))
+            conn.execute(text(
+                f'CREATE TRIGGER {TRIGGER_NAME} AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE '
+                f'ON "{table}" FOR EACH STATEMENT EXECUTE FUNCTION {TRIGGER_NAME}()'
+            ))
+    print(f"Change counters installed on {len(tables)} tables")
+    return tables
+
+
+def remove_change_counters(tables, bind=engine):
+    """Drop the trigger from `tables`; their queries stop being cached."""
+    with bind.begin() as conn:
+        for table in tables:
+            conn.execute(text(f'DROP TRIGGER IF EXISTS {TRIGGER_NAME} ON "{table}"'))
+    print(f"Change counters removed from {len(tables)} tables")
+    return tables
+
+
+def compact_change_counters(bind=engine):
+    """
+    Fold each table's change rows into one, keeping the sums (so no cache
+    key changes). Rows written meanwhile are outside the statement's
+    snapshot and stay; writers are never blocked. Run it periodically.
+    """
+    with bind.begin() as conn:
+        folded = conn.execute(COMPACT_SQL).rowcount
+    print(f"Change counters compacted to {folded} rows")
+    return folded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Result-cache maintenance")
+    parser.add_argument("--install-counters", action="store_true",
+                        help="add change-logging triggers to the given tables")
+    parser.add_argument("--remove-counters", action="store_true",
+                        help="drop the triggers from the given tables")
+    parser.add_argument("--compact", action="store_true", help="fold the change log")
+    parser.add_argument("tables", nargs="*", help="tables to (un)track")
+    args = parser.parse_args()
+    if (args.install_counters or args.remove_counters) and not args.tables:
+        parser.error("name the tables to (un)track")
+    if args.install_counters:
+        install_change_counters(args.tables)
+    elif args.remove_counters:
+        remove_change_counters(args.tables)
+    elif args.compact:
+        compact_change_counters()
+    else:
+        parser.print_help()
@@ -0,0 +1,153 @@
+# sql_bot/schema_catalog.py
+"""
+Process-wide cache of the reflected database schema used in NL→SQL prompts.
+
+Reflecting every table's columns costs a catalog query per table, so it is
+done once and shared by all threads. Before the cached copy is reused, a
+single catalog query fingerprints the schema (tables, columns, types and
+foreign keys); the schema is reflected again only when that fingerprint has
+changed. The check itself runs at most every SCHEMA_CHECK_SECONDS, so DDL
+is picked up within that window. Call refresh_schema_catalog() to force a
+rebuild, e.g. right after a migration.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import inspect, text
+
+from .database import engine
+
+SCHEMA_CHECK_SECONDS = float(os.getenv("SCHEMA_CHECK_SECONDS", "30"))  # 0 checks every call
+# the bot's own bookkeeping tables, never offered to the LLM
+INTERNAL_TABLES = {"nl2sql_cache", "table_changes", "table_versions"}  # table_versions: older counters
+
+# md5 over everything the prompt depends on, in the schema the inspector reflects
+FINGERPRINT_SQL = text("""
+    SELECT md5(
+        COALESCE((
+            SELECT string_agg(c.relname || '.' || a.attname || ':' || format_type(a.atttypid, a.atttypmod),
+                              ',' ORDER BY c.relname, a.attnum)
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+            WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p')
+        ), '') || '|' ||
+        COALESCE((
+            SELECT string_agg(con.conrelid::regclass || '>' || con.confrelid::regclass || ':' ||
+                              pg_get_constraintdef(con.oid), ',' ORDER BY con.conrelid::regclass::text, con.conname)
+            FROM pg_constraint con
+            JOIN pg_namespace n ON n.oid = con.connamespace
+            WHERE n.nspname = current_schema() AND con.contype = 'f'
+        ), '')
+    )
+""")
+
+
+class SchemaCatalog:
+    def __init__(self, bind=engine, check_seconds=SCHEMA_CHECK_SECONDS):
+        self.bind = bind
+        self.check_seconds = check_seconds
+        self.fingerprint = None
+        self.tables = {}                   # table -> [(column, type, comment), ...]
+        self.foreign_keys = {}             # table -> {tables it references or is referenced by}
+        self.lines = {}                    # table -> "table(col type, ...)"
+        self._checked = 0.0
+        self._lock = threading.Lock()      # guards the cached state
+        self._build_lock = threading.Lock()  # one reflection at a time
+        self.stats = {"hits": 0, "checks": 0, "refreshes": 0, "reflect_seconds": 0.0}
+
+    def _fingerprint(self, conn):
+        return conn.execute(FINGERPRINT_SQL).scalar()
+
+    def _reflect(self, conn):
+        inspector = inspect(conn)
+        tables, foreign_keys = {}, {}
+        for table in inspector.get_table_names():
+            if table in INTERNAL_TABLES:
+                continue
+            tables[table] = [(c["name"], str(c["type"]), c.get("comment"))
+                             for c in inspector.get_columns(table)]
+            foreign_keys.setdefault(table, set())
+            for fk in inspector.get_foreign_keys(table):
+                other = fk["referred_table"]
+                if other in INTERNAL_TABLES:
+                    continue
+                foreign_keys[table].add(other)
+                foreign_keys.setdefault(other, set()).add(table)
+        return tables, foreign_keys
+
+    def _rebuild(self, force):
+        with self._build_lock:
+            with self.bind.connect() as conn:
+                fingerprint = self._fingerprint(conn)
+                with self._lock:
+                    self.stats["checks"] += 1
+                    self._checked = time.monotonic()
+                    if not force and fingerprint == self.fingerprint:
+                        return
+                start = time.perf_counter()
+                tables, foreign_keys = self._reflect(conn)
+                elapsed = time.perf_counter() - start
+            lines = {
+                table: f"{table}({', '.join(f'{name} {type_}' for name, type_, _ in cols)})"
+                for table, cols in tables.items()
+            }
+            with self._lock:
+                self.tables, self.foreign_keys, self.lines = tables, foreign_keys, lines
+                self.fingerprint = fingerprint
+                self.stats["refreshes"] += 1
+                self.stats["reflect_seconds"] += elapsed
+            print(f"Schema catalog refreshed: {len(tables)} tables in {1000 * elapsed:.0f} ms")
+
+    def current(self):
+        """
+        The up-to-date schema as a dict of fingerprint, tables, foreign_keys
+        and lines (treat as read-only; a refresh swaps in new objects).
+        """
+        with self._lock:
+            fresh = (self.fingerprint is not None
+                     and time.monotonic() - self._checked < self.check_seconds)
+            if fresh:
+                self.stats["hits"] += 1
+        if not fresh:
+            self._rebuild(force=False)
+        with self._lock:
+            return {"fingerprint": self.fingerprint, "tables": self.tables,
+                    "foreign_keys": self.foreign_keys, "lines": self.lines}
+
+    def table_info(self):
+        """One `table(col type, ...)` line per table, as the SQL prompt expects."""
+        return "\n".join(self.current()["lines"].values())
+
+    def refresh(self):
+        """Reflect the schema now, whether or not the fingerprint changed."""
+        self._rebuild(force=True)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["tables"] = len(self.tables)
+            stats["fingerprint"] = self.fingerprint
+        return stats
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_schema_catalog():
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = SchemaCatalog()
+        return _catalog
+
+
+def refresh_schema_catalog():
+    """Manual refresh hook (e.g. after migrations); rebuilds the shared catalog."""
+    get_schema_catalog().refresh()
+
+
+def schema_catalog_stats():
+    return get_schema_catalog().snapshot()
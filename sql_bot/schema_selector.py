@@ -0,0 +1,195 @@
+# sql_bot/schema_selector.py
+"""
+Pick the tables an NL→SQL prompt needs instead of sending the whole schema.
+
+Each table is described by its name, column names and comments. A question
+is ranked against those descriptions twice — lexically (IDF-weighted term
+overlap, table-name hits counting double) and by embedding similarity — and
+the two rankings are fused with reciprocal-rank fusion, as in pdf_bot's
+hybrid retrieval. Only tables sharing a term with the question, or at least
+SCHEMA_MIN_SIMILARITY (cosine) from it, are ranked. The SCHEMA_TOP_TABLES
+best are kept, then their foreign-key neighbours (so joins stay possible) up
+to SCHEMA_MAX_TABLES, plus SCHEMA_ALWAYS_TABLES. Schemas with no more than
+SCHEMA_TOP_TABLES tables, and questions no table matches, get the whole
+schema. The index is rebuilt when the catalog's fingerprint changes; if
+embeddings are unavailable, selection is lexical only.
+"""
+import math
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from token_count import count_tokens
+from .schema_catalog import get_schema_catalog
+
+SCHEMA_TOP_TABLES = int(os.getenv("SCHEMA_TOP_TABLES", "8"))
+SCHEMA_MAX_TABLES = int(os.getenv("SCHEMA_MAX_TABLES", "16"))      # incl. foreign-key neighbours
+SCHEMA_ALWAYS_TABLES = [t for t in os.getenv("SCHEMA_ALWAYS_TABLES", "web_facts").split(",") if t]
+SCHEMA_EMBED_MODEL = os.getenv("SCHEMA_EMBED_MODEL", "text-embedding-3-small")
+SCHEMA_MIN_SIMILARITY = float(os.getenv("SCHEMA_MIN_SIMILARITY", "0.25"))
+SCHEMA_RRF_K = 60
+
+
+def _terms(text):
+    """Lower-case word stems: snake_case and camelCase split, trailing plural 's' dropped."""
+    words = re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+", text)
+    return {w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+            for w in (w.lower() for w in words)}
+
+
+def describe(table, columns):
+    """Text that stands for a table in both rankings."""
+    columns = ", ".join(name.replace("_", " ") + (f" ({comment})" if comment else "")
+                        for name, _, comment in columns)
+    return f"{table.replace('_', ' ')}: {columns}"
+
+
+_embeddings_client = None
+
+
+def _openai_embed(texts):
+    global _embeddings_client
+    if _embeddings_client is None:
+        from langchain_openai import OpenAIEmbeddings
+        _embeddings_client = OpenAIEmbeddings(model=SCHEMA_EMBED_MODEL, api_key=os.getenv("OPENAI_API_KEY"))
+    return _embeddings_client.embed_documents(list(texts))
+
+
+@lru_cache(maxsize=1024)
+def _question_embedding(question):
+    return tuple(_openai_embed([question])[0])
+
+
+def embed_question(question, embed=_openai_embed):
+    """Embedding of one question; with the default model, repeats (selector, SQL cache) embed once."""
+    if embed is _openai_embed:
+        return list(_question_embedding(question))
+    return embed([question])[0]
+
+
+def _normalized(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class SchemaIndex:
+    """Lexical + embedding index over one version of the schema."""
+
+    def __init__(self, schema, embed=_openai_embed):
+        self.schema = schema
+        self.names = list(schema["tables"])
+        self._embed = embed
+        self._name_terms = [_terms(t) for t in self.names]
+        self._terms = [_terms(describe(t, schema["tables"][t])) for t in self.names]
+        df = {}
+        for terms in self._terms:
+            for term in terms:
+                df[term] = df.get(term, 0) + 1
+        self._idf = {term: math.log(1 + len(self.names) / n) for term, n in df.items()}
+        self.full_tokens = count_tokens("\n".join(schema["lines"].values()))
+        self._vectors = None
+        if embed is not None and len(self.names) > SCHEMA_TOP_TABLES:
+            try:
+                self._vectors = _normalized(embed([describe(t, schema["tables"][t]) for t in self.names]))
+            except Exception as e:
+                print(f"Schema embeddings unavailable, using lexical selection only: {e}")
+
+    def lexical_ranking(self, question):
+        terms = _terms(question)
+        scores = []
+        for i, table_terms in enumerate(self._terms):
+            score = sum(self._idf[t] * (2 if t in self._name_terms[i] else 1) for t in terms & table_terms)
+            if score > 0:
+                scores.append((score, i))
+        return [i for _, i in sorted(scores, key=lambda s: -s[0])]
+
+    def vector_ranking(self, question, min_similarity=SCHEMA_MIN_SIMILARITY):
+        if self._vectors is None:
+            return []
+        try:
+            query = _normalized(embed_question(question, self._embed))
+        except Exception as e:
+            print(f"Question embedding failed, using lexical selection only: {e}")
+            return []
+        scores = self._vectors @ query
+        return [int(i) for i in np.argsort(-scores) if scores[i] >= min_similarity]
+
+    def select(self, question, top_n=SCHEMA_TOP_TABLES, max_tables=SCHEMA_MAX_TABLES,
+               always=SCHEMA_ALWAYS_TABLES):
+        """Table names for `question`, most relevant first."""
+        if len(self.names) <= top_n:
+            return list(self.names)
+        fused = {}
+        for ranking in (self.lexical_ranking(question), self.vector_ranking(question)):
+            for rank, i in enumerate(ranking, start=1):
+                fused[i] = fused.get(i, 0.0) + 1.0 / (SCHEMA_RRF_K + rank)
+        if not fused:
+            return list(self.names)  # nothing to go on; better too much schema than none
+        best = [self.names[i] for i in sorted(fused, key=lambda i: -fused[i])[:top_n]]
+
+        chosen = list(best)
+        foreign_keys = self.schema["foreign_keys"]
+        for table in best:
+            for neighbour in sorted(foreign_keys.get(table, ())):
+                if len(chosen) >= max_tables:
+                    break
+                if neighbour not in chosen and neighbour in self.schema["tables"]:
+                    chosen.append(neighbour)
+        chosen += [t for t in always if t in self.schema["tables"] and t not in chosen]
+        return chosen
+
+
+class SchemaSelector:
+    def __init__(self, catalog=None, embed=_openai_embed):
+        self._catalog = catalog
+        self._embed = embed
+        self._index = None
+        self._lock = threading.Lock()
+
+    def index(self):
+        schema = (self._catalog or get_schema_catalog()).current()
+        with self._lock:
+            index = self._index
+        if index is None or index.schema["fingerprint"] != schema["fingerprint"]:
+            # embeds every table: build without the lock so selection for the
+            # current index isn't blocked (concurrent rebuilds are harmless)
+            index = SchemaIndex(schema, self._embed)
+            with self._lock:
+                if self._index is None or self._index.schema["fingerprint"] != schema["fingerprint"]:
+                    self._index = index
+                index = self._index
+        return index
+
+    def table_info(self, question):
+        """(table_info for the prompt, stats) with only the tables relevant to `question`."""
+        start = time.perf_counter()
+        index = self.index()
+        lines = index.schema["lines"]
+        tables = index.select(question)
+        table_info = "\n".join(lines[t] for t in tables)
+        stats = {"tables": len(tables), "total_tables": len(lines),
+                 "tokens": count_tokens(table_info), "full_tokens": index.full_tokens,
+                 "select_ms": 1000 * (time.perf_counter() - start)}
+        return table_info, stats
+
+
+_selector = None
+_selector_lock = threading.Lock()
+
+
+def get_schema_selector():
+    global _selector
+    with _selector_lock:
+        if _selector is None:
+            _selector = SchemaSelector()
+        return _selector
+
+
+def select_schema(question):
+    """table_info for `question` from the shared catalog, plus selection stats."""
+    return get_schema_selector().table_info(question)
@@ -0,0 +1,205 @@
+# sql_bot/sql_cache.py
+"""
+Persistent cache of NL→SQL translations (the nl2sql_cache table).
+
+Entries are keyed by the normalised question plus the schema fingerprint
+from the schema catalog, so any DDL that changes the fingerprint makes old
+translations unreachable (they are pruned on the next store). Only SQL
+that passed the safety gate and returned rows is stored. An exact hit
+skips the LLM call entirely.
+
+With NL2SQL_PARAPHRASE_SIMILARITY set (e.g. 0.95), a miss is also compared
+by embedding cosine against this process's view of the cached questions,
+so "how many orders last month" can reuse "number of orders last month".
+A paraphrase only counts if both questions carry the same numbers and
+quoted values, in the same order: "orders over 15" never reuses the SQL
+for "orders over 20".
+Entries expire after NL2SQL_CACHE_TTL seconds; beyond NL2SQL_CACHE_MAX_ITEMS
+the least recently used are deleted. Cache errors never fail a query.
+"""
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+from sqlalchemy import text
+
+from .database import engine
+from .schema_catalog import get_schema_catalog
+from .schema_selector import embed_question
+
+NL2SQL_CACHE_TTL = float(os.getenv("NL2SQL_CACHE_TTL", str(7 * 24 * 3600)))       # seconds
+NL2SQL_CACHE_MAX_ITEMS = int(os.getenv("NL2SQL_CACHE_MAX_ITEMS", "5000"))         # 0 disables
+NL2SQL_PARAPHRASE_SIMILARITY = float(os.getenv("NL2SQL_PARAPHRASE_SIMILARITY", "0"))  # 0 = exact only
+
+# numbers (incl. decimals, dates, times) and single- or double-quoted values
+LITERAL = re.compile(r"'[^']*'|\"[^\"]*\"|\d+(?:[.,:/-]\d+)*")
+
+
+def normalize_question(question):
+    """Case, width, whitespace and trailing punctuation folded; numbers and quoted values kept."""
+    question = unicodedata.normalize("NFKC", question).casefold()
+    question = re.sub(r"\s+", " ", question).strip()
+    return question.rstrip("?!. ").strip()
+
+
+def question_key(question):
+    return hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()
+
+
+def question_literals(question):
+    """The numbers and quoted values in `question`, in order; paraphrases must agree on them."""
+    return tuple(LITERAL.findall(normalize_question(question)))
+
+
+class SQLCache:
+    def __init__(self, bind=engine, ttl=NL2SQL_CACHE_TTL, max_items=NL2SQL_CACHE_MAX_ITEMS,
+                 paraphrase_similarity=NL2SQL_PARAPHRASE_SIMILARITY, fingerprint=None, embed=embed_question):
+        self.bind = bind
+        self.ttl = ttl
+        self.max_items = max_items
+        self.paraphrase_similarity = paraphrase_similarity
+        self._fingerprint = fingerprint or (lambda: get_schema_catalog().current()["fingerprint"])
+        self._embed = embed
+        self._lock = threading.Lock()
+        # paraphrase index for one fingerprint: keys, question literals and normalised embeddings
+        self._para_fingerprint = None
+        self._para_keys = []
+        self._para_literals = []
+        self._para_vectors = None
+        self.stats = {"hits": 0, "paraphrase_hits": 0, "misses": 0, "stored": 0, "evictions": 0,
+                      "errors": 0}
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, n in deltas.items():
+                self.stats[key] += n
+
+    # ── paraphrase index ──
+    def _question_vector(self, question):
+        vector = np.asarray(self._embed(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _paraphrase_index(self, conn, fingerprint):
+        with self._lock:
+            if self._para_fingerprint == fingerprint:
+                return self._para_keys, self._para_literals, self._para_vectors
+        rows = conn.execute(text("""
+            SELECT question_key, question, embedding FROM nl2sql_cache
+            WHERE schema_fingerprint = :fp AND embedding IS NOT NULL
+        """), {"fp": fingerprint}).fetchall()
+        keys = [r[0] for r in rows]
+        literals = [question_literals(r[1]) for r in rows]
+        vectors = np.array([r[2] for r in rows], dtype=np.float32) if rows else None
+        if vectors is not None:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            self._para_fingerprint = fingerprint
+            self._para_keys, self._para_literals, self._para_vectors = keys, literals, vectors
+        return keys, literals, vectors
+
+    def _remember_vector(self, fingerprint, key, question, vector):
+        with self._lock:
+            if self._para_fingerprint != fingerprint or key in self._para_keys:
+                return
+            row = vector[None, :]
+            self._para_keys = self._para_keys + [key]
+            self._para_literals = self._para_literals + [question_literals(question)]
+            self._para_vectors = row if self._para_vectors is None else np.vstack([self._para_vectors, row])
+
+    # ── public API ──
+    def lookup(self, question):
+        """Cached SQL for `question` under the current schema, or None."""
+        if not self.max_items:
+            return None
+        try:
+            fingerprint = self._fingerprint()
+            touch = text("""
+                UPDATE nl2sql_cache SET last_used_at = NOW(), hits = hits + 1
+                WHERE question_key = :key AND schema_fingerprint = :fp
+                  AND created_at > NOW() - make_interval(secs => :ttl)
+                RETURNING sql
+            """)
+            with self.bind.begin() as conn:
+                sql = conn.execute(touch, {"key": question_key(question), "fp": fingerprint,
+                                           "ttl": self.ttl}).scalar()
+                if sql is not None:
+                    self._count(hits=1)
+                    return sql
+                if self.paraphrase_similarity > 0:
+                    keys, literals, vectors = self._paraphrase_index(conn, fingerprint)
+                    wanted = question_literals(question)
+                    same = np.array([lits == wanted for lits in literals], dtype=bool)
+                    if same.any():
+                        scores = np.where(same, vectors @ self._question_vector(question), -np.inf)
+                        best = int(np.argmax(scores))
+                        if scores[best] >= self.paraphrase_similarity:
+                            sql = conn.execute(touch, {"key": keys[best], "fp": fingerprint,
+                                                       "ttl": self.ttl}).scalar()
+                            if sql is not None:
+                                self._count(paraphrase_hits=1)
+                                return sql
+        except Exception as e:
+            print(f"NL→SQL cache lookup failed: {e}")
+            self._count(errors=1)
+        self._count(misses=1)
+        return None
+
+    def store(self, question, sql):
+        """Remember validated `sql` for `question`, then enforce TTL, schema version and size."""
+        if not self.max_items:
+            return
+        try:
+            fingerprint = self._fingerprint()
+            key = question_key(question)
+            vector = self._question_vector(question) if self.paraphrase_similarity > 0 else None
+            with self.bind.begin() as conn:
+                conn.execute(text("""
+                    INSERT INTO nl2sql_cache (question_key, schema_fingerprint, question, sql, embedding)
+                    VALUES (:key, :fp, :question, :sql, :embedding)
+                    ON CONFLICT (question_key, schema_fingerprint) DO UPDATE
+                    SET sql = EXCLUDED.sql, question = EXCLUDED.question,
+                        embedding = COALESCE(EXCLUDED.embedding, nl2sql_cache.embedding),
+                        created_at = NOW(), last_used_at = NOW()
+                """), {"key": key, "fp": fingerprint, "question": question, "sql": sql,
+                       "embedding": vector.tolist() if vector is not None else None})
+                evicted = conn.execute(text("""
+                    DELETE FROM nl2sql_cache
+                    WHERE schema_fingerprint <> :fp
+                       OR created_at <= NOW() - make_interval(secs => :ttl)
+                       OR ctid IN (SELECT ctid FROM nl2sql_cache
+                                   ORDER BY last_used_at DESC OFFSET :max_items)
+                """), {"fp": fingerprint, "ttl": self.ttl, "max_items": self.max_items}).rowcount
+            self._count(stored=1, evictions=max(evicted, 0))
+            if vector is not None:
+                self._remember_vector(fingerprint, key, question, vector)
+        except Exception as e:
+            print(f"NL→SQL cache store failed: {e}")
+            self._count(errors=1)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["paraphrase_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["paraphrase_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_sql_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLCache()
+        return _cache
+
+
+def sql_cache_stats():
+    """Exact / paraphrase hits, misses and hit rate of the shared NL→SQL cache."""
+    return get_sql_cache().snapshot()
@@ -16,3 +16,28 @@ CREATE TABLE IF NOT EXISTS orders (
   quantity   INT      NOT NULL,
   order_date DATE     NOT NULL
 );
+
+-- NL→SQL translation cache (sql_bot/sql_cache.py)
+CREATE TABLE IF NOT EXISTS nl2sql_cache (
+  question_key       TEXT        NOT NULL,
+  schema_fingerprint TEXT        NOT NULL,
+  question           TEXT        NOT NULL,
+  sql                TEXT        NOT NULL,
+  embedding          REAL[],
+  hits               INT         NOT NULL DEFAULT 0,
+  created_at         TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  last_used_at       TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (question_key, schema_fingerprint)
+);
+
+CREATE INDEX IF NOT EXISTS nl2sql_cache_last_used_idx ON nl2sql_cache (last_used_at);
+
+-- Change log for the result cache (sql_bot/result_cache.py): one row per write
+-- statement on tables given to `python -m sql_bot.result_cache --install-counters`.
+-- A table's version is SUM(changes). Insert-only, so it never blocks writers.
+CREATE TABLE IF NOT EXISTS table_changes (
+  table_name TEXT   NOT NULL,
+  changes    BIGINT NOT NULL DEFAULT 1
+);
+
+CREATE INDEX IF NOT EXISTS table_changes_table_idx ON table_changes (table_name);
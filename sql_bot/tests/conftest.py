@@ -97,6 +97,7 @@ def seed_db(setup_schema):
     with engine.begin() as conn:
         _exec_multi(conn, SEED_SQL)
         conn.execute(text("TRUNCATE web_facts RESTART IDENTITY"))
+        conn.execute(text("TRUNCATE nl2sql_cache"))
     yield
     with engine.begin() as conn:
         conn.execute(text("TRUNCATE web_facts RESTART IDENTITY"))
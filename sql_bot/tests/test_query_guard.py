@@ -0,0 +1,54 @@
+# sql_bot/tests/test_query_guard.py
+import pytest
+
+import sql_bot.query_guard as query_guard
+from sql_bot.main import handle_query
+from sql_bot.result_cache import install_change_counters
+
+CROSS_JOIN = "SELECT a.name, b.name AS other FROM products a CROSS JOIN products b CROSS JOIN orders c"
+
+
+@pytest.fixture
+def ask(monkeypatch):
+    monkeypatch.setattr("sql_bot.main.summarize", lambda q, rows: "ok")
+    monkeypatch.setattr("sql_bot.main.answer_from_web", lambda q: (None, None))
+
+    def ask(sql):
+        monkeypatch.setattr("sql_bot.main.generate_sql", lambda q: sql)
+        return handle_query(f"question for {sql}")
+    return ask
+
+
+def test_cost_estimate_is_reported(ask):
+    res = ask("SELECT name FROM products WHERE price > 15")
+    assert "error" not in res
+    assert res["plan"]["action"] == "ok" and res["plan"]["cost"] > 0
+
+
+def test_large_row_estimates_get_a_limit_or_are_rejected(ask, monkeypatch):
+    install_change_counters(["orders", "products"])
+    monkeypatch.setattr(query_guard, "SQL_MAX_ROWS", 50)
+    monkeypatch.setattr(query_guard, "SQL_AUTO_LIMIT", 7)
+    res = ask(CROSS_JOIN)
+    assert res["plan"]["action"] == "limited" and len(res["table"]) == 7
+    again = ask(CROSS_JOIN)       # served from the result cache, still marked as limited
+    assert again["cached"] is True and again["plan"] == res["plan"] and len(again["table"]) == 7
+
+    monkeypatch.setattr(query_guard, "SQL_OVER_LIMIT", "reject")
+    res = ask(CROSS_JOIN + " WHERE c.quantity > 0")
+    assert "rejected" in res["error"] and res["plan"]["rows"] > 50
+
+
+def test_expensive_plans_are_rejected(ask, monkeypatch):
+    monkeypatch.setattr(query_guard, "SQL_MAX_COST", 1.0)
+    res = ask("SELECT name FROM products ORDER BY price")
+    assert "estimated cost" in res["error"] and res["plan"]["action"] == "rejected"
+
+
+def test_read_only_and_statement_timeout(ask, monkeypatch):
+    res = ask("SELECT nextval('products_id_seq')")
+    assert "read-only" in res["error"]
+
+    monkeypatch.setattr(query_guard, "SQL_STATEMENT_TIMEOUT_MS", 100)
+    res = ask("SELECT pg_sleep(2)")
+    assert "statement timeout" in res["error"]
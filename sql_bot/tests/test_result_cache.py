@@ -0,0 +1,90 @@
+# sql_bot/tests/test_result_cache.py
+import pandas as pd
+from sqlalchemy import text
+
+from sql_bot.database import SessionLocal, engine
+from sql_bot.main import handle_query
+from sql_bot.result_cache import (
+    ResultCache, _pack, _unpack, compact_change_counters, install_change_counters, normalize_sql,
+)
+
+SQL = "SELECT p.name, SUM(o.quantity) AS units FROM orders o JOIN products p ON p.id = o.product_id GROUP BY p.name"
+
+
+def test_normalisation_and_columnar_round_trip():
+    assert normalize_sql("SELECT  Name FROM products WHERE name = 'Widget';") == \
+        "select name from products where name = 'Widget'"
+    df = pd.DataFrame([[1, "a", 2.5], [2, "b", None]], columns=["id", "name", "id"])
+    pd.testing.assert_frame_equal(_unpack(_pack(df)), df)
+
+
+def test_volatile_or_unknown_sql_is_not_cached():
+    cache = ResultCache(known_tables=lambda: {"orders": [], "products": []})
+    assert cache.key(None, "SELECT * FROM orders WHERE order_date > now() - interval '1 day'") is None
+    assert cache.key(None, "SELECT 1") is None
+    assert cache.snapshot()["uncacheable"] == 2
+
+
+def test_tables_without_change_counters_are_not_cached():
+    install_change_counters(["orders", "products"])
+    cache = ResultCache(known_tables=lambda: {"orders": [], "products": [], "web_facts": []})
+    with SessionLocal() as session:
+        assert cache.key(session, "SELECT * FROM orders JOIN products ON products.id = orders.product_id")
+        assert cache.key(session, "SELECT question FROM web_facts") is None
+        assert cache.key(session, "SELECT * FROM orders, web_facts") is None
+    assert cache.snapshot()["uncacheable"] == 2
+
+
+def test_memory_budget_evicts_least_recently_used():
+    small = pd.DataFrame({"x": range(50)})
+    size = len(_pack(small))
+    cache = ResultCache(max_bytes=int(size * 4.5))
+    for i in range(3):
+        cache.put(("q", i), small, 0.1)
+    assert cache.get(("q", 0)) is not None       # 0 becomes most recently used
+    for i in range(3, 5):
+        cache.put(("q", i), small, 0.1)
+    stats = cache.snapshot()
+    assert stats["bytes"] <= size * 4.5 and stats["evictions"] == 1
+    assert cache.get(("q", 1)) is None and cache.get(("q", 0)) is not None
+
+
+def test_handle_query_serves_unchanged_tables_from_cache(monkeypatch):
+    install_change_counters(["orders", "products"])
+    monkeypatch.setattr("sql_bot.main.generate_sql", lambda q: SQL)
+    monkeypatch.setattr("sql_bot.main.summarize", lambda q, rows: "ok")
+
+    first = handle_query("Units sold per product")
+    second = handle_query("Units sold per product")
+    assert first["cached"] is False and second["cached"] is True
+    pd.testing.assert_frame_equal(first["table"], second["table"])
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE orders SET quantity = quantity + 1 WHERE id = 1"))
+    third = handle_query("Units sold per product")
+    assert third["cached"] is False
+    assert third["table"]["units"].sum() == first["table"]["units"].sum() + 1
+
+
+def test_change_counters_do_not_serialise_writers():
+    install_change_counters(["orders", "products"])
+    cache = ResultCache(known_tables=lambda: {"orders": [], "products": []})
+    with SessionLocal() as session:
+        before = cache.key(session, SQL)
+
+    with engine.connect() as first, engine.connect() as second:
+        first.execute(text("UPDATE orders SET quantity = quantity + 1 WHERE id = 1"))
+        # a second writer to the same table must not wait for the first to commit
+        second.execute(text("SET LOCAL lock_timeout = '1s'"))
+        second.execute(text("UPDATE orders SET quantity = quantity + 1 WHERE id = 2"))
+        with SessionLocal() as session:
+            assert cache.key(session, SQL) == before    # uncommitted writes are not visible
+        first.commit()
+        second.commit()
+
+    with SessionLocal() as session:
+        after = cache.key(session, SQL)
+        assert after != before
+        compact_change_counters()
+        session.rollback()
+        assert cache.key(session, SQL) == after          # compaction keeps the versions
@@ -0,0 +1,35 @@
+# sql_bot/tests/test_schema_catalog.py
+from sqlalchemy import text
+
+from sql_bot.database import engine
+from sql_bot.schema_catalog import SchemaCatalog
+
+
+def test_reflects_once_until_the_schema_changes():
+    catalog = SchemaCatalog(check_seconds=0)
+    info = catalog.table_info()
+    assert "products(id INTEGER, name TEXT, price NUMERIC(10, 2))" in info
+
+    catalog.table_info()
+    assert catalog.snapshot()["refreshes"] == 1 and catalog.snapshot()["checks"] == 2
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE catalog_probe (id INT, note TEXT)"))
+        assert "catalog_probe(id INTEGER, note TEXT)" in catalog.table_info()
+        assert catalog.snapshot()["refreshes"] == 2
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS catalog_probe"))
+    assert "catalog_probe" not in catalog.table_info()
+
+
+def test_check_interval_and_manual_refresh():
+    catalog = SchemaCatalog(check_seconds=3600)
+    catalog.table_info()
+    catalog.table_info()
+    stats = catalog.snapshot()
+    assert stats["hits"] == 1 and stats["checks"] == 1
+
+    catalog.refresh()
+    assert catalog.snapshot()["refreshes"] == 2
@@ -0,0 +1,86 @@
+# sql_bot/tests/test_schema_selector.py
+from sql_bot.schema_selector import SchemaIndex, SchemaSelector
+
+
+def _schema(n_filler=20):
+    tables = {
+        "customers": [("id", "INTEGER", None), ("full_name", "TEXT", None), ("email", "TEXT", None)],
+        "orders": [("id", "INTEGER", None), ("customer_id", "INTEGER", None), ("order_date", "DATE", None)],
+        "order_items": [("order_id", "INTEGER", None), ("sku", "TEXT", "stock keeping unit"),
+                        ("quantity", "INTEGER", None)],
+        "web_facts": [("question", "TEXT", None), ("answer", "TEXT", None)],
+    }
+    tables.update({f"audit_log_{i}": [("id", "INTEGER", None), ("payload", "JSONB", None)]
+                   for i in range(n_filler)})
+    foreign_keys = {t: set() for t in tables}
+    foreign_keys["orders"] |= {"customers", "order_items"}
+    foreign_keys["customers"].add("orders")
+    foreign_keys["order_items"].add("orders")
+    lines = {t: f"{t}({', '.join(f'{c} {ty}' for c, ty, _ in cols)})" for t, cols in tables.items()}
+    return {"fingerprint": "f1", "tables": tables, "foreign_keys": foreign_keys, "lines": lines}
+
+
+class _Catalog:
+    def __init__(self, schema):
+        self.schema = schema
+
+    def current(self):
+        return self.schema
+
+
+def test_lexical_selection_adds_fk_neighbours_and_always_tables():
+    index = SchemaIndex(_schema(), embed=None)
+    chosen = index.select("How many orders did each customer place?", top_n=1)
+    assert chosen[0] == "orders"
+    assert {"customers", "order_items", "web_facts"} <= set(chosen)
+    assert not any(t.startswith("audit_log") for t in chosen)
+
+    # column comments are searchable too
+    assert index.select("quantity per stock keeping unit", top_n=1)[0] == "order_items"
+
+
+def test_embeddings_are_fused_and_failures_fall_back():
+    def embed(texts):
+        return [[1.0, 0.0] if ("customer" in t.split(":")[0] or "buyer" in t) else [0.0, 1.0]
+                for t in texts]
+
+    index = SchemaIndex(_schema(), embed=embed)
+    assert index.select("list every buyer", top_n=1)[0] == "customers"
+
+    def broken(texts):
+        raise RuntimeError("no API key")
+
+    assert SchemaIndex(_schema(), embed=broken).select("orders by date", top_n=1)[0] == "orders"
+
+
+def test_question_matching_no_table_gets_the_whole_schema():
+    def embed(texts):
+        # table descriptions contain ":"; the question is unlike all of them
+        return [[1.0, 0.0] if ":" in t else [0.0, 1.0] for t in texts]
+
+    index = SchemaIndex(_schema(), embed=embed)
+    assert index.vector_ranking("what is the weather like") == []
+    assert index.select("what is the weather like", top_n=1) == index.names
+
+
+def test_index_is_built_outside_the_lock():
+    locked = []
+
+    def embed(texts):
+        locked.append(selector._lock.locked())
+        return [[1.0, 0.0]] * len(texts)
+
+    selector = SchemaSelector(_Catalog(_schema()), embed=embed)
+    first = selector.index()
+    assert locked == [False]
+    assert selector.index() is first
+
+
+def test_small_schema_is_sent_whole_and_stats_report_savings():
+    info, stats = SchemaSelector(_Catalog(_schema(n_filler=0)), embed=None).table_info("orders")
+    assert stats["tables"] == stats["total_tables"] == 4
+    assert stats["tokens"] == stats["full_tokens"]
+
+    info, stats = SchemaSelector(_Catalog(_schema()), embed=None).table_info("orders")
+    assert "orders(" in info and "audit_log_0(" not in info
+    assert stats["tokens"] < stats["full_tokens"]
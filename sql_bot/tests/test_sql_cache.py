@@ -0,0 +1,69 @@
+# sql_bot/tests/test_sql_cache.py
+from sql_bot.main import handle_query
+from sql_bot.sql_cache import SQLCache, normalize_question, question_literals
+
+SQL = "SELECT name FROM products ORDER BY price DESC LIMIT 1"
+
+
+def test_normalisation_keeps_values():
+    assert normalize_question("  What is the  PRICIEST product?? ") == "what is the priciest product"
+    assert normalize_question("orders over 15") != normalize_question("orders over 20")
+
+
+def test_exact_hits_and_schema_invalidation():
+    schema = {"fp": "v1"}
+    cache = SQLCache(fingerprint=lambda: schema["fp"])
+    assert cache.lookup("Priciest product?") is None
+    cache.store("Priciest product?", SQL)
+    assert cache.lookup("priciest   PRODUCT") == SQL
+
+    schema["fp"] = "v2"  # DDL happened
+    assert cache.lookup("Priciest product?") is None
+    stats = cache.snapshot()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["hit_rate"] == 1 / 3
+
+
+def test_ttl_and_lru_bounds():
+    cache = SQLCache(fingerprint=lambda: "v1", max_items=2)
+    cache.store("q1", SQL)
+    cache.store("q2", SQL)
+    assert cache.lookup("q1") == SQL     # q1 is now the most recently used
+    cache.store("q3", SQL)
+    assert cache.lookup("q2") is None
+    assert cache.snapshot()["evictions"] == 1
+
+    expired = SQLCache(fingerprint=lambda: "v1", ttl=0)
+    assert expired.lookup("q1") is None
+
+
+def test_paraphrase_lookup():
+    vectors = {"how many orders were placed": [1.0, 0.0], "number of orders placed": [0.99, 0.05],
+               "cheapest product": [0.0, 1.0]}
+    cache = SQLCache(fingerprint=lambda: "v1", paraphrase_similarity=0.95, embed=lambda q: vectors[q])
+    cache.store("how many orders were placed", "SELECT COUNT(*) FROM orders")
+    assert cache.lookup("number of orders placed") == "SELECT COUNT(*) FROM orders"
+    assert cache.lookup("cheapest product") is None
+    assert cache.snapshot()["paraphrase_hits"] == 1
+
+
+def test_paraphrase_needs_the_same_literals():
+    assert question_literals("Orders over 15 since '2024-03-01'?") == ("15", "'2024-03-01'")
+    vectors = {"orders over 15": [1.0, 0.0], "orders over 20": [1.0, 0.0],
+               "orders above 20": [0.99, 0.05], "orders over 15 by 'Ann'": [1.0, 0.0]}
+    cache = SQLCache(fingerprint=lambda: "v1", paraphrase_similarity=0.95, embed=lambda q: vectors[q])
+    cache.store("orders over 15", "SELECT * FROM orders WHERE quantity > 15")
+    assert cache.lookup("orders over 20") is None
+    assert cache.lookup("orders over 15 by 'Ann'") is None
+    cache.store("orders over 20", "SELECT * FROM orders WHERE quantity > 20")
+    assert cache.lookup("orders above 20") == "SELECT * FROM orders WHERE quantity > 20"
+
+
+def test_handle_query_skips_the_llm_on_a_repeat(monkeypatch):
+    calls = []
+    monkeypatch.setattr("sql_bot.main.generate_sql", lambda q: calls.append(q) or SQL)
+    monkeypatch.setattr("sql_bot.main.summarize", lambda q, rows: "ok")
+
+    first = handle_query("Which product is the most expensive?")
+    second = handle_query("which product is the most expensive")
+    assert calls == ["Which product is the most expensive?"]
+    assert second["sql"] == first["sql"] == SQL
@@ -0,0 +1,48 @@
+# token_count.py
+"""
+Token counting shared by both bots' prompt budgets (pdf_bot's context packer,
+sql_bot's schema selector).
+
+Tokens are counted locally with tiktoken, or estimated at ~CHARS_PER_TOKEN
+characters per token when it is not installed or cannot load the encoding
+(its first use downloads it, which fails offline).
+"""
+from functools import lru_cache
+
+DEFAULT_ENCODING = "o200k_base"   # gpt-4o's tokenizer
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name):
+    """The tiktoken encoding `name`, or None (estimate instead); a failure is logged once."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        print(f"tiktoken encoding {name} unavailable, estimating {CHARS_PER_TOKEN} chars/token: {e}")
+        return None
+
+
+def count_tokens(text, encoding_name=DEFAULT_ENCODING):
+    enc = get_encoding(encoding_name)
+    if enc is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text, max_tokens, encoding_name=DEFAULT_ENCODING):
+    """The longest prefix of `text` within `max_tokens`, ending on a word break if there is one."""
+    enc = get_encoding(encoding_name)
+    if enc is None:
+        cut = text[:max(0, max_tokens) * CHARS_PER_TOKEN]
+    else:
+        cut = enc.decode(enc.encode(text, disallowed_special=())[:max(0, max_tokens)])
+    if len(cut) < len(text):
+        space = cut.rfind(" ", len(cut) // 2)
+        if space != -1:
+            cut = cut[:space]
+    return cut.rstrip()